@@ -0,0 +1,393 @@
+"""
+Chapter-split conversion: one audio file per chapter, plus an optional
+chaptered MP3 that players can seek through by chapter.
+
+Chapters come from a PDF's outline, an EPUB's table of contents, or a
+Markdown file's top-level headings. Each chapter is its own conversion, so
+several run at once under the shared scheduler, and a failed or cancelled
+book keeps the chapters that were finished. Chapter durations are counted
+from MP3 frame headers as the audio streams in, so the chaptered file's
+ID3 chapter table (CHAP/CTOC frames) is written without decoding anything.
+"""
+import os
+import re
+import bisect
+import shutil
+import asyncio
+import struct
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Callable, List, Optional, Tuple
+from pypdf import PdfReader
+
+import documents
+import ingest
+import pdf_backends
+from formats import DEFAULT_FORMAT, extension_for
+from logic import TextProcessor, TTSManager
+from mdtext import markdown_to_speech
+
+# Fewer chapters than this and the document is converted as one file
+MIN_CHAPTERS = 2
+# Chapters converted at once; each one already synthesizes many chunks in parallel
+CHAPTER_PARALLELISM = 2
+# Only plain MP3 is concatenated as-is: ffmpeg output carries its own headers
+CONTAINER_FORMATS = ("mp3",)
+# Entries one ID3 CTOC frame can list; longer books get a second level of CTOCs
+TOC_ENTRIES = 255
+MAX_TAG_CHAPTERS = TOC_ENTRIES * TOC_ENTRIES
+
+_MD_FENCE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+_MD_HEADING = re.compile(r'^ {0,3}(#{1,2})\s+(.*?)(?:\s+#+)?\s*$')
+
+XHTML_NS = "{http://www.w3.org/1999/xhtml}"
+OPS_TYPE = "{http://www.idpf.org/2007/ops}type"
+NCX_NS = "{http://www.daisy.org/z3986/2005/ncx/}"
+
+
+class Chapter:
+    def __init__(self, title: str, text: str):
+        self.title = title
+        self.text = text
+
+    def __repr__(self):
+        return f"Chapter({self.title!r}, {len(self.text)} chars)"
+
+
+# Detection
+
+def pdf_chapters(path: str) -> List[Chapter]:
+    """One chapter per top-level outline entry, running to the next entry's page."""
+    reader = PdfReader(path)
+    try:
+        outline = reader.outline
+    except Exception:
+        # A damaged outline only costs the chapter split
+        return []
+    starts = {}
+    for item in outline:
+        # Nested lists are the sections of the entry before them
+        if isinstance(item, list):
+            continue
+        try:
+            page = reader.get_destination_page_number(item)
+        except Exception:
+            continue
+        if page is not None and page >= 0:
+            starts.setdefault(page, str(item.title).strip())
+    if len(starts) < MIN_CHAPTERS:
+        return []
+
+    pages = list(pdf_backends.page_texts(path))
+    boundaries = sorted(starts)
+    chapters = []
+    for n, first_page in enumerate(boundaries):
+        # Pages before the first entry (cover, contents) belong to it
+        first = 0 if n == 0 else first_page
+        last = boundaries[n + 1] if n + 1 < len(boundaries) else len(pages)
+        text = TextProcessor.clean_pdf_text("\n".join(pages[first:last]))
+        chapters.append(Chapter(starts[first_page], text))
+    return chapters
+
+
+def _markdown_headings(path: str):
+    """(line number, level, title) of every ATX heading outside code fences."""
+    fence = None
+    for number, line in enumerate(ingest.iter_lines(path)):
+        opening = _MD_FENCE.match(line)
+        if fence:
+            if opening and opening.group(1)[0] == fence[0] and len(opening.group(1)) >= len(fence):
+                fence = None
+            continue
+        if opening:
+            fence = opening.group(1)
+            continue
+        heading = _MD_HEADING.match(line)
+        if heading:
+            yield number, len(heading.group(1)), heading.group(2)
+
+
+def markdown_chapters(path: str) -> List[Chapter]:
+    """Split at level-1 headings, or level-2 if the file has fewer than two of those."""
+    headings = list(_markdown_headings(path))
+    level = 1 if sum(1 for h in headings if h[1] == 1) >= MIN_CHAPTERS else 2
+    starts = [(number, title) for number, heading_level, title in headings if heading_level == level]
+    if len(starts) < MIN_CHAPTERS:
+        return []
+
+    chapters = []
+    lines = []
+    index = 0
+    for number, line in enumerate(ingest.iter_lines(path)):
+        # Text before the first heading belongs to the first chapter
+        if index + 1 < len(starts) and number == starts[index + 1][0]:
+            chapters.append(Chapter(starts[index][1], markdown_to_speech("\n".join(lines))))
+            lines = []
+            index += 1
+        lines.append(line)
+    chapters.append(Chapter(starts[index][1], markdown_to_speech("\n".join(lines))))
+    return chapters
+
+
+def _element_text(element: ET.Element) -> str:
+    return re.sub(r'\s+', ' ', "".join(element.itertext())).strip()
+
+
+def epub_toc(archive: zipfile.ZipFile) -> List[Tuple[str, str]]:
+    """(title, archive path) of each top-level table of contents entry."""
+    package_path, package = documents.epub_package(archive)
+    items = list(package.iterfind("opf:manifest/opf:item", documents.OPF_NS))
+
+    # EPUB 3: the navigation document's toc nav
+    nav = next((i for i in items if "nav" in (i.get("properties") or "").split()), None)
+    root = None
+    if nav is not None:
+        nav_path = documents.resolve_href(package_path, nav.get("href"))
+        try:
+            root = ET.fromstring(archive.read(nav_path))
+        except ET.ParseError:
+            # Not well-formed (HTML entities): fall back to the NCX, if any
+            pass
+    if root is not None:
+        for element in root.iter(XHTML_NS + "nav"):
+            if element.get(OPS_TYPE) == "toc":
+                entries = []
+                for li in element.iterfind(f"{XHTML_NS}ol/{XHTML_NS}li"):
+                    link = li.find(XHTML_NS + "a")
+                    if link is not None and link.get("href"):
+                        entries.append((_element_text(link), documents.resolve_href(nav_path, link.get("href"))))
+                return entries
+
+    # EPUB 2: the NCX named by the spine
+    spine = package.find("opf:spine", documents.OPF_NS)
+    ncx = next((i for i in items if spine is not None and i.get("id") == spine.get("toc")), None)
+    if ncx is None:
+        return []
+    ncx_path = documents.resolve_href(package_path, ncx.get("href"))
+    root = ET.fromstring(archive.read(ncx_path))
+    entries = []
+    for point in root.iterfind(f"{NCX_NS}navMap/{NCX_NS}navPoint"):
+        label = point.find(f"{NCX_NS}navLabel/{NCX_NS}text")
+        content = point.find(NCX_NS + "content")
+        if content is not None and content.get("src"):
+            title = _element_text(label) if label is not None else ""
+            entries.append((title, documents.resolve_href(ncx_path, content.get("src"))))
+    return entries
+
+
+def epub_chapters(path: str) -> List[Chapter]:
+    """One chapter per TOC entry, spanning spine documents up to the next entry's."""
+    with zipfile.ZipFile(path) as archive:
+        toc = epub_toc(archive)
+        spine = documents.epub_spine(archive)
+    starts = {}
+    for title, document in toc:
+        # Entries pointing into the same document (sections) merge into the first
+        if document in spine:
+            starts.setdefault(spine.index(document), title)
+    if len(starts) < MIN_CHAPTERS:
+        return []
+
+    boundaries = sorted(starts)
+    paragraphs = [[] for _ in boundaries]
+    for index, (_, document_paragraphs) in enumerate(documents.iter_epub_chapters(path)):
+        # Documents before the first entry (cover, title page) belong to it
+        chapter = max(0, bisect.bisect_right(boundaries, index) - 1)
+        paragraphs[chapter].extend(document_paragraphs)
+    return [Chapter(starts[start], "\n".join(paragraphs[n])) for n, start in enumerate(boundaries)]
+
+
+def detect_chapters(path: str) -> List[Chapter]:
+    """The document's chapters, or [] if it has no usable chapter structure."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        chapters = pdf_chapters(path)
+    elif extension == ".md":
+        chapters = markdown_chapters(path)
+    elif extension == ".epub":
+        chapters = epub_chapters(path)
+    else:
+        return []
+    # Chapters with nothing to say (a part title page) are dropped
+    return [chapter for chapter in chapters if chapter.text.strip()]
+
+
+# Durations
+
+_MPEG1_BITRATES = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_MPEG2_BITRATES = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _mp3_frame(header: bytes) -> Optional[Tuple[int, float]]:
+    """(length in bytes, duration in seconds) of the MPEG layer III frame starting here."""
+    if header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 3
+    layer = (header[1] >> 1) & 3
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = (_MPEG1_BITRATES if mpeg1 else _MPEG2_BITRATES)[bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    length = (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+    return length, (1152 if mpeg1 else 576) / sample_rate
+
+
+class Mp3Duration:
+    """Adds up frame durations of an MP3 stream fed in arbitrary pieces."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._tail = b""
+        self._skip = 0
+
+    def feed(self, data: bytes):
+        if self._skip:
+            skipped = min(self._skip, len(data))
+            data = data[skipped:]
+            self._skip -= skipped
+        buffer = self._tail + data
+        position = 0
+        while True:
+            if buffer[position:position + 3] == b"ID3":
+                if len(buffer) - position < 10:
+                    break
+                position += 10 + _syncsafe(buffer[position + 6:position + 10])
+                if position > len(buffer):
+                    self._skip = position - len(buffer)
+                    position = len(buffer)
+                continue
+            if len(buffer) - position < 4:
+                break
+            frame = _mp3_frame(buffer[position:position + 4])
+            if frame is None:
+                # Not a frame header: resynchronize byte by byte
+                position += 1
+                continue
+            length, seconds = frame
+            if len(buffer) - position < length:
+                break
+            self.seconds += seconds
+            position += length
+        self._tail = buffer[position:]
+
+
+# Chaptered container
+
+def _id3_frame(frame_id: str, body: bytes) -> bytes:
+    # ID3v2.3 frame sizes are plain big-endian integers
+    return frame_id.encode("ascii") + struct.pack(">IH", len(body), 0) + body
+
+
+def _id3_text(frame_id: str, text: str) -> bytes:
+    # Encoding 1: UTF-16 with BOM, for titles in any script
+    return _id3_frame(frame_id, b"\x01" + text.encode("utf-16"))
+
+
+def _ctoc(element_id: bytes, flags: int, children: List[bytes], title: str) -> bytes:
+    body = element_id + b"\x00" + bytes([flags, len(children)]) + b"".join(c + b"\x00" for c in children)
+    return _id3_frame("CTOC", body + _id3_text("TIT2", title))
+
+
+def chapter_tag(title: str, chapters: List[Tuple[str, float]]) -> bytes:
+    """
+    An ID3v2.3 tag with a CHAP frame per (title, seconds) chapter and a CTOC listing them.
+
+    A CTOC lists at most TOC_ENTRIES elements, so beyond that the top-level
+    CTOC lists nested CTOCs of up to TOC_ENTRIES chapters each.
+    """
+    if len(chapters) > MAX_TAG_CHAPTERS:
+        raise ValueError(f"An ID3 table of contents holds at most {MAX_TAG_CHAPTERS} chapters")
+    frames = [_id3_text("TIT2", title)]
+    element_ids = [f"chp{n}".encode("ascii") for n in range(len(chapters))]
+    # Flags: 0x01 ordered, 0x02 top-level
+    if len(chapters) <= TOC_ENTRIES:
+        frames.append(_ctoc(b"toc", 0x03, element_ids, title))
+    else:
+        groups = range(0, len(element_ids), TOC_ENTRIES)
+        frames.append(_ctoc(b"toc", 0x03, [f"toc{n}".encode("ascii") for n in range(len(groups))], title))
+        for n, first in enumerate(groups):
+            children = element_ids[first:first + TOC_ENTRIES]
+            frames.append(_ctoc(f"toc{n}".encode("ascii"), 0x01, children,
+                                f"Chapters {first + 1}-{first + len(children)}"))
+    start = 0.0
+    for element_id, (chapter_title, seconds) in zip(element_ids, chapters):
+        end = start + seconds
+        # Byte offsets unused (0xFFFFFFFF): players seek by time
+        times = struct.pack(">IIII", round(start * 1000), round(end * 1000), 0xFFFFFFFF, 0xFFFFFFFF)
+        frames.append(_id3_frame("CHAP", element_id + b"\x00" + times + _id3_text("TIT2", chapter_title)))
+        start = end
+    body = b"".join(frames)
+    size = bytes([(len(body) >> shift) & 0x7F for shift in (21, 14, 7, 0)])
+    return b"ID3\x03\x00\x00" + size + body
+
+
+def write_chaptered_mp3(output_path: str, title: str, parts: List[Tuple[str, str, float]]):
+    """Join (title, mp3 path, seconds) parts into one MP3 headed by their chapter table."""
+    with open(output_path, "wb") as out:
+        out.write(chapter_tag(title, [(part_title, seconds) for part_title, _, seconds in parts]))
+        for _, path, _ in parts:
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, out)
+
+
+# Conversion
+
+def chapter_file_name(number: int, title: str) -> str:
+    # Characters Windows forbids in file names
+    safe = re.sub(r'[\\/:*?"<>|\x00-\x1f]+', '_', title).strip(" ._")[:80]
+    return f"{number:02d} - {safe}" if safe else f"{number:02d}"
+
+
+async def convert_chapters(manager: TTSManager, chapters: List[Chapter], voice: str, output_dir: str,
+                           fmt: str = DEFAULT_FORMAT, cancel_event=None, container_path: Optional[str] = None,
+                           title: str = "", parallel: int = CHAPTER_PARALLELISM,
+                           on_chapter: Optional[Callable[[int, int, str], None]] = None) -> Tuple[str, List[str]]:
+    """
+    Convert each chapter to its own file in output_dir, `parallel` at a time.
+    With container_path (MP3 only), also join them into one chaptered MP3.
+    on_chapter, if given, receives (number, total, title) as each chapter starts.
+
+    Returns: ('success', 'cancelled' or 'error', paths of the chapter files written)
+    """
+    if container_path and len(chapters) > MAX_TAG_CHAPTERS:
+        # Checked before synthesis, so the chapter files are still written
+        print(f"Chaptered file skipped: more than {MAX_TAG_CHAPTERS} chapters")
+        container_path = None
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [os.path.join(output_dir, chapter_file_name(n, chapter.title) + extension_for(fmt))
+             for n, chapter in enumerate(chapters, 1)]
+    durations = [Mp3Duration() for _ in chapters]
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def convert_one(n: int) -> str:
+        async with semaphore:
+            if cancel_event and cancel_event.is_set():
+                return "cancelled"
+            if on_chapter:
+                on_chapter(n + 1, len(chapters), chapters[n].title)
+            return await manager.convert(chapters[n].text, voice, paths[n], cancel_event,
+                                         fmt=fmt, on_audio=durations[n].feed)
+
+    results = await asyncio.gather(*(convert_one(n) for n in range(len(chapters))))
+    written = [path for path, result in zip(paths, results) if result == "success"]
+    for outcome in ("cancelled", "error"):
+        if outcome in results:
+            return outcome, written
+
+    if container_path and fmt in CONTAINER_FORMATS:
+        parts = [(chapter.title, path, duration.seconds) for chapter, path, duration in zip(chapters, paths, durations)]
+        try:
+            await asyncio.to_thread(write_chaptered_mp3, container_path, title, parts)
+        except (OSError, ValueError) as e:
+            print(f"Chaptered file error: {e}")
+            return "error", written
+    return "success", written
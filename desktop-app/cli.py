@@ -0,0 +1,294 @@
+import os
+import re
+import sys
+import json
+import asyncio
+import argparse
+import itertools
+from typing import List, Tuple
+
+import ingest
+import pdf_backends
+import gateway
+import hedging
+import profiling
+from logic import CHUNK_MAX_BYTES, TextProcessor, TTSManager
+from formats import AUDIO_FORMATS, DEFAULT_FORMAT, extension_for, open_encoder
+from textcache import ExtractedTextCache
+from watcher import FolderWatcher
+from distributed import ChunkWorker, Coordinator
+from chapters import CONTAINER_FORMATS, Chapter, convert_chapters, detect_chapters
+from gateway import Gateway, connect_manager
+
+DEFAULT_VOICE = "vi-VN-HoaiMyNeural"
+
+
+def convert_chapter_files(args, chapters: List[Chapter]) -> int:
+    manager = connect_manager()
+    base_name = os.path.splitext(os.path.basename(args.input))[0]
+    output_dir = args.output or os.path.join(manager.output_dir, base_name)
+    container_path = None
+    if args.format in CONTAINER_FORMATS and not args.no_container:
+        container_path = os.path.join(output_dir, f"{base_name}{extension_for(args.format)}")
+
+    print(f"Converting {len(chapters)} chapters of {args.input} -> {output_dir} ({args.voice})")
+    result, written = asyncio.run(convert_chapters(
+        manager, chapters, args.voice, output_dir, fmt=args.format, container_path=container_path, title=base_name,
+        on_chapter=lambda number, total, title: print(f"[chapters] {number}/{total}: {title}")
+    ))
+    if result != "success":
+        print(f"Conversion failed: {result} ({len(written)} of {len(chapters)} chapters written)", file=sys.stderr)
+        return 1
+
+    if container_path:
+        print(f"Chaptered file: {container_path}")
+    print("Done.")
+    return 0
+
+
+def cmd_convert(args) -> int:
+    if args.chapters:
+        chapters = detect_chapters(args.input)
+        if chapters:
+            return convert_chapter_files(args, chapters)
+        print("No chapters found; converting as one file.")
+
+    if ingest.should_stream(args.input):
+        # Too large to extract at once: chunks are planned as the file is read
+        chunks = TextProcessor.iter_chunks(args.input)
+        text = next(chunks, "")
+        chunks = itertools.chain([text], chunks)
+    elif args.no_cache:
+        chunks = None
+        text = TextProcessor.process_file(args.input)
+    else:
+        chunks = ExtractedTextCache().get_chunks(args.input, CHUNK_MAX_BYTES, TextProcessor.process_file)
+        text = "\n".join(chunks)
+    if not text:
+        print(f"No text extracted from {args.input}", file=sys.stderr)
+        return 1
+
+    manager = connect_manager()
+    output_path = args.output
+    if not output_path:
+        base_name = os.path.splitext(os.path.basename(args.input))[0]
+        output_path = os.path.join(manager.output_dir, f"{base_name}{extension_for(args.format)}")
+
+    print(f"Converting {args.input} -> {output_path} ({args.voice})")
+    result = asyncio.run(manager.convert(text, args.voice, output_path, fmt=args.format, chunks=chunks))
+    if result != "success":
+        print(f"Conversion failed: {result}", file=sys.stderr)
+        return 1
+
+    print("Done.")
+    return 0
+
+
+def read_bulk_items(path: str, default_voice: str) -> List[Tuple[str, str, str]]:
+    """Items come as JSON lines: {"id": ..., "text": ..., "voice": optional}."""
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "id" not in record or not str(record.get("text", "")).strip():
+                raise ValueError(f"{path}:{line_number}: each item needs an id and text")
+            items.append((str(record["id"]), record["text"], record.get("voice") or default_voice))
+    return items
+
+
+def bulk_file_name(item_id: str) -> str:
+    return re.sub(r'[^\w.-]', '_', item_id)
+
+
+async def run_bulk(manager: TTSManager, items, output_dir: str, fmt: str) -> int:
+    failed = 0
+    async for item_id, audio, error in manager.synthesize_many(items):
+        if error is not None:
+            failed += 1
+            print(f"{item_id}: failed: {error}", file=sys.stderr)
+            continue
+        encoder = await open_encoder(fmt, os.path.join(output_dir, bulk_file_name(item_id) + extension_for(fmt)))
+        await encoder.write(audio)
+        await encoder.close()
+    return failed
+
+
+def cmd_bulk(args) -> int:
+    items = read_bulk_items(args.input, args.voice)
+    os.makedirs(args.output, exist_ok=True)
+    extension = extension_for(args.format)
+    # Re-running after an interruption only synthesizes what is missing
+    todo = [item for item in items
+            if not os.path.exists(os.path.join(args.output, bulk_file_name(item[0]) + extension))]
+    print(f"Synthesizing {len(todo)} of {len(items)} items -> {args.output}")
+
+    failed = asyncio.run(run_bulk(connect_manager(), todo, args.output, args.format))
+    print(f"Done: {len(todo) - failed} written, {failed} failed.")
+    return 1 if failed else 0
+
+
+def cmd_watch(args) -> int:
+    output_dir = args.output or os.path.join(args.folder, "audio")
+    watcher = FolderWatcher(args.folder, output_dir, args.voice, fmt=args.format, workers=args.workers,
+                            manager=connect_manager())
+    print(f"Watching {watcher.root} -> {watcher.output_dir} ({args.voice}); Ctrl+C to stop")
+    try:
+        watcher.run(interval=args.interval, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    print("Stopped.")
+    return 0
+
+
+def cmd_distribute(args) -> int:
+    coordinator = Coordinator(args.queue)
+    output_dir = args.output or TTSManager().output_dir
+    doc_ids = []
+    for path in args.inputs:
+        base_name = os.path.splitext(os.path.basename(path))[0]
+        output_path = os.path.join(output_dir, f"{base_name}{extension_for(args.format)}")
+        doc_ids.append(coordinator.publish(path, args.voice, output_path, args.format))
+        print(f"Queued {path} -> {output_path}")
+    if args.no_wait:
+        coordinator.close()
+        return 0
+
+    print(f"Waiting for workers on {args.queue}; Ctrl+C to stop (queued work is kept)")
+    try:
+        statuses = asyncio.run(coordinator.wait(doc_ids))
+    except KeyboardInterrupt:
+        return 1
+    finally:
+        coordinator.close()
+    failed = [doc_id for doc_id, status in statuses.items() if status != "done"]
+    print(f"Done: {len(doc_ids) - len(failed)} stitched, {len(failed)} failed or empty.")
+    return 1 if failed else 0
+
+
+def cmd_work(args) -> int:
+    worker = ChunkWorker(args.queue, manager=connect_manager(), concurrency=args.concurrency)
+    print(f"Working on {args.queue}; Ctrl+C to stop")
+    try:
+        asyncio.run(worker.run(drain=args.drain))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.close()
+    print(f"Stopped after {worker.completed} chunks.")
+    return 0
+
+
+def cmd_serve(args) -> int:
+    # The daemon always synthesizes in-process; it is what clients connect to
+    server = Gateway(TTSManager(), cache_bytes=args.cache_mb * 1024 * 1024)
+    try:
+        asyncio.run(server.serve_forever(args.address))
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    print("Stopped.")
+    return 0
+
+
+def cmd_bench_pdf(args) -> int:
+    missing = [b for b in args.backend or [] if not pdf_backends.BACKENDS[b].available()]
+    if missing:
+        print(f"Not installed: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    print(pdf_backends.format_report(pdf_backends.compare_backends(args.files, args.backend)))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="lito", description="Lito: Simple & Lightweight Text to Speech")
+    parser.add_argument("--profile", nargs="?", type=float, const=1.0, metavar="RATE",
+                        help="Profile extraction and conversion: all calls, or this fraction of them")
+    parser.add_argument("--profile-dir", help=f"Where profiles are written (default: ${profiling.PROFILE_DIR_ENV} or <tmp>/lito-profiles)")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Duplicate synthesis requests that run past the recent p95 latency (within a 5%% budget)")
+    parser.add_argument("--no-gateway", action="store_true",
+                        help="Synthesize in this process even if a gateway (lito serve) is running")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Convert a .pdf, .md, .txt, .epub, .docx or .html file to audio")
+    convert.add_argument("input", help="Path to the source document")
+    convert.add_argument("-o", "--output", help="Output audio path (default: Documents/Lito/<name>.<ext>)")
+    convert.add_argument("-v", "--voice", default=DEFAULT_VOICE, help=f"Voice short name (default: {DEFAULT_VOICE})")
+    convert.add_argument("-f", "--format", choices=list(AUDIO_FORMATS), default=DEFAULT_FORMAT,
+                         help="Output format; mp3-low and opus need ffmpeg (default: mp3)")
+    convert.add_argument("--no-cache", action="store_true", help="Re-extract text even if a cached copy exists")
+    convert.add_argument("--chapters", action="store_true",
+                         help="One file per chapter (PDF outline, EPUB contents, Markdown headings); "
+                              "-o is then a directory")
+    convert.add_argument("--no-container", action="store_true",
+                         help="With --chapters, skip the single chaptered MP3")
+    convert.set_defaults(func=cmd_convert)
+
+    bulk = subparsers.add_parser("bulk", help="Synthesize many short texts (prompts, flashcards) into separate files")
+    bulk.add_argument("input", help='JSON lines file of {"id": ..., "text": ..., "voice": optional}')
+    bulk.add_argument("-o", "--output", required=True, help="Directory for <id>.<ext> files")
+    bulk.add_argument("-v", "--voice", default=DEFAULT_VOICE, help=f"Voice for items without one (default: {DEFAULT_VOICE})")
+    bulk.add_argument("-f", "--format", choices=list(AUDIO_FORMATS), default=DEFAULT_FORMAT,
+                      help="Output format; mp3-low and opus need ffmpeg (default: mp3)")
+    bulk.set_defaults(func=cmd_bulk)
+
+    bench = subparsers.add_parser("bench-pdf", help="Compare PDF extraction backends on a set of files")
+    bench.add_argument("files", nargs="+", help="PDF files to extract")
+    bench.add_argument("-b", "--backend", action="append", choices=list(pdf_backends.PREFERENCE),
+                       help="Backend to include (repeatable; default: all installed)")
+    bench.set_defaults(func=cmd_bench_pdf)
+
+    watch = subparsers.add_parser("watch", help="Convert documents as they appear in a folder")
+    watch.add_argument("folder", help="Folder to watch, including subfolders")
+    watch.add_argument("-o", "--output", help="Where audio is written (default: <folder>/audio)")
+    watch.add_argument("-v", "--voice", default=DEFAULT_VOICE, help=f"Voice short name (default: {DEFAULT_VOICE})")
+    watch.add_argument("-f", "--format", choices=list(AUDIO_FORMATS), default=DEFAULT_FORMAT,
+                       help="Output format; mp3-low and opus need ffmpeg (default: mp3)")
+    watch.add_argument("-w", "--workers", type=int, default=2, help="Documents converted at once (default: 2)")
+    watch.add_argument("--interval", type=float, default=5.0, help="Seconds between scans (default: 5)")
+    watch.add_argument("--once", action="store_true", help="Scan once, convert what is new, then exit")
+    watch.set_defaults(func=cmd_watch)
+
+    distribute = subparsers.add_parser("distribute", help="Queue documents for workers on other machines and stitch their audio")
+    distribute.add_argument("queue", help="Queue directory shared with the workers")
+    distribute.add_argument("inputs", nargs="+", help="Documents to convert")
+    distribute.add_argument("-o", "--output", help="Output directory (default: Documents/Lito)")
+    distribute.add_argument("-v", "--voice", default=DEFAULT_VOICE, help=f"Voice short name (default: {DEFAULT_VOICE})")
+    distribute.add_argument("-f", "--format", choices=list(AUDIO_FORMATS), default=DEFAULT_FORMAT,
+                            help="Output format; mp3-low and opus need ffmpeg (default: mp3)")
+    distribute.add_argument("--no-wait", action="store_true", help="Only queue; stitch on a later run")
+    distribute.set_defaults(func=cmd_distribute)
+
+    work = subparsers.add_parser("work", help="Synthesize chunks from a shared queue directory")
+    work.add_argument("queue", help="Queue directory shared with the coordinator")
+    work.add_argument("-c", "--concurrency", type=int, default=8, help="Chunks synthesized at once (default: 8)")
+    work.add_argument("--drain", action="store_true", help="Exit once the queue has nothing left to lease")
+    work.set_defaults(func=cmd_work)
+
+    serve = subparsers.add_parser("serve", help="Run the local gateway that other Lito clients synthesize through")
+    serve.add_argument("--address", help=f"host:port or Unix socket path (default: ${gateway.GATEWAY_ENV} or {gateway.default_address()})")
+    serve.add_argument("--cache-mb", type=int, default=gateway.DEFAULT_CACHE_BYTES // (1024 * 1024),
+                       help="Audio kept in memory for repeated requests (default: 128)")
+    serve.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.hedge:
+        # Read by every TTSManager this run creates
+        os.environ[hedging.HEDGE_ENV] = "1"
+    if args.no_gateway:
+        os.environ[gateway.GATEWAY_ENV] = "off"
+    if args.profile is not None:
+        profiling.profiler.configure(args.profile, args.profile_dir or profiling.profiler.directory)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+Coordinator/worker mode: spread one backlog's synthesis over several machines.
+
+The coordinator extracts and chunks documents and publishes one task per
+chunk to a queue directory that every node can reach. Workers lease tasks,
+synthesize them and write each chunk's audio as a segment file next to the
+queue; the coordinator stitches a document once all its segments are in.
+
+Delivery is at least once: a lease that runs out (a worker died or stalled)
+returns its task to the queue. Results are idempotent, since a segment's
+path depends only on its document and position and is written by atomic
+rename, so a chunk synthesized twice leaves the same file. Workers share
+nothing but the queue, so throughput grows with their number until the
+queue itself (one short SQLite transaction per lease) becomes the limit.
+"""
+import os
+import time
+import shutil
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from logic import TextProcessor, TTSManager
+from formats import DEFAULT_FORMAT, open_encoder
+from scheduler import BULK
+from textcache import hash_file
+
+QUEUE_NAME = "queue.sqlite"
+SEGMENTS_NAME = "segments"
+# A task not completed within this long is handed to another worker
+LEASE_SECONDS = 120.0
+# Synthesis failures before a chunk, and its document, are given up on
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 1.0
+# Chunks written per transaction while publishing
+PUBLISH_BATCH = 500
+# Document states the coordinator stops waiting at
+FINISHED_STATES = ("done", "failed", "empty")
+
+
+class ChunkQueue:
+    """Documents and their chunk tasks, in a SQLite file shared by all nodes."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        # Other nodes hold the write lock briefly; wait rather than fail
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS documents (
+                id TEXT PRIMARY KEY, source TEXT, voice TEXT, format TEXT, output TEXT,
+                total INTEGER, status TEXT, created REAL
+            );
+            CREATE TABLE IF NOT EXISTS tasks (
+                doc_id TEXT, seq INTEGER, text TEXT, voice TEXT,
+                status TEXT, lease_until REAL, attempts INTEGER DEFAULT 0, error TEXT,
+                PRIMARY KEY (doc_id, seq)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_status ON tasks(status, lease_until);
+        """)
+
+    def publish(self, doc_id: str, source: str, chunks: Iterable[str], voice: str, fmt: str, output: str) -> bool:
+        """
+        Queue a document's chunks. Returns False if it was already published.
+
+        chunks may be a lazy extraction (TextProcessor.iter_chunks); it is
+        consumed between short transactions of PUBLISH_BATCH chunks, so
+        workers are never locked out while a large document is extracted.
+        """
+        if self.status(doc_id) is not None:
+            return False
+        total = 0
+        batch = []
+        for text in chunks:
+            batch.append((doc_id, total, text, voice))
+            total += 1
+            if len(batch) == PUBLISH_BATCH:
+                self._insert_tasks(batch)
+                batch = []
+        self._insert_tasks(batch)
+        # Tasks are only leased once their document row exists, so writing it
+        # last means a document is never half-published
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (doc_id, source, voice, fmt, output, total, "pending" if total else "empty", time.time()),
+            )
+        return cursor.rowcount == 1
+
+    def _insert_tasks(self, rows: List[Tuple[str, int, str, str]]):
+        if not rows:
+            return
+        with self._lock, self._db:
+            # REPLACE: tasks left behind by a publisher that died part way
+            self._db.executemany(
+                "INSERT OR REPLACE INTO tasks (doc_id, seq, text, voice, status, lease_until) "
+                "VALUES (?, ?, ?, ?, 'queued', 0)",
+                rows,
+            )
+
+    def lease(self, limit: int, lease_seconds: float = LEASE_SECONDS) -> List[Tuple[str, int, str, str]]:
+        """
+        Take up to limit queued or expired tasks, oldest document first: (doc_id, seq, text, voice).
+        Tasks of a document that has already failed are left alone.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "UPDATE tasks SET status = 'leased', lease_until = ? WHERE rowid IN ("
+                "SELECT tasks.rowid FROM tasks JOIN documents ON documents.id = tasks.doc_id "
+                "WHERE documents.status = 'pending' AND "
+                "(tasks.status = 'queued' OR (tasks.status = 'leased' AND tasks.lease_until < ?)) "
+                "ORDER BY documents.created, tasks.seq LIMIT ?) "
+                "RETURNING doc_id, seq, text, voice",
+                (now + lease_seconds, now, limit),
+            ).fetchall()
+        return rows
+
+    def complete(self, doc_id: str, seq: int):
+        # A duplicate completion (lease expired, then both workers finished) changes nothing
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE tasks SET status = 'done', text = '' WHERE doc_id = ? AND seq = ? AND status != 'done'",
+                (doc_id, seq),
+            )
+
+    def retry(self, doc_id: str, seq: int, error: str):
+        """Return a failed task to the queue, or fail its document after MAX_ATTEMPTS."""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE tasks SET attempts = attempts + 1, error = ?, lease_until = 0, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'queued' END "
+                "WHERE doc_id = ? AND seq = ? AND status = 'leased'",
+                (error, MAX_ATTEMPTS, doc_id, seq),
+            )
+            self._db.execute(
+                "UPDATE documents SET status = 'failed' WHERE id = ? AND EXISTS "
+                "(SELECT 1 FROM tasks WHERE doc_id = ? AND status = 'failed')",
+                (doc_id, doc_id),
+            )
+
+    def ready(self) -> List[Dict]:
+        """Pending documents whose every chunk is done."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, source, format, output, total FROM documents WHERE status = 'pending' AND total = "
+                "(SELECT COUNT(*) FROM tasks WHERE doc_id = documents.id AND status = 'done')"
+            ).fetchall()
+        return [dict(zip(("id", "source", "format", "output", "total"), row)) for row in rows]
+
+    def set_status(self, doc_id: str, status: str):
+        with self._lock, self._db:
+            self._db.execute("UPDATE documents SET status = ? WHERE id = ?", (status, doc_id))
+
+    def status(self, doc_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT status FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        return row[0] if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def segment_path(segments_dir: str, doc_id: str, seq: int) -> str:
+    return os.path.join(segments_dir, doc_id, f"{seq:06d}.mp3")
+
+
+def document_id(path: str, voice: str, fmt: str, output: str) -> str:
+    """Same content, voice, format and output: same document, however often it is published."""
+    key = f"{hash_file(path)}\0{voice}\0{fmt}\0{os.path.abspath(output)}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+class Coordinator:
+    def __init__(self, queue_dir: str):
+        os.makedirs(queue_dir, exist_ok=True)
+        self.queue = ChunkQueue(os.path.join(queue_dir, QUEUE_NAME))
+        self.segments_dir = os.path.join(queue_dir, SEGMENTS_NAME)
+
+    def publish(self, path: str, voice: str, output: str, fmt: str = DEFAULT_FORMAT) -> str:
+        """Extract and chunk path, queue its chunks, and return the document id."""
+        doc_id = document_id(path, voice, fmt, output)
+        if self.queue.status(doc_id) is None:
+            self.queue.publish(doc_id, path, TextProcessor.iter_chunks(path), voice, fmt, os.path.abspath(output))
+        return doc_id
+
+    async def stitch(self, document: Dict) -> str:
+        """Join a finished document's segments in order into its output file."""
+        os.makedirs(os.path.dirname(document["output"]) or ".", exist_ok=True)
+        encoder = await open_encoder(document["format"], document["output"])
+        try:
+            for seq in range(document["total"]):
+                with open(segment_path(self.segments_dir, document["id"], seq), "rb") as f:
+                    await encoder.write(f.read())
+            await encoder.close()
+        except Exception:
+            await encoder.abort()
+            raise
+        self.queue.set_status(document["id"], "done")
+        shutil.rmtree(os.path.join(self.segments_dir, document["id"]), ignore_errors=True)
+        return document["output"]
+
+    async def stitch_ready(self) -> List[str]:
+        stitched = []
+        for document in self.queue.ready():
+            try:
+                stitched.append(await self.stitch(document))
+                print(f"[coordinator] {document['source']} -> {document['output']}")
+            except Exception as e:
+                print(f"[coordinator] {document['source']}: stitch error: {e}")
+                self.queue.set_status(document["id"], "failed")
+        return stitched
+
+    async def wait(self, doc_ids: List[str], poll_interval: float = POLL_INTERVAL) -> Dict[str, str]:
+        """Stitch documents as they complete until every one of doc_ids is finished."""
+        while True:
+            await self.stitch_ready()
+            statuses = {doc_id: self.queue.status(doc_id) for doc_id in doc_ids}
+            if all(status in FINISHED_STATES for status in statuses.values()):
+                return statuses
+            await asyncio.sleep(poll_interval)
+
+    def close(self):
+        self.queue.close()
+
+
+class ChunkWorker:
+    """Leases chunk tasks and keeps up to `concurrency` of them synthesizing."""
+
+    def __init__(self, queue_dir: str, manager: Optional[TTSManager] = None, concurrency: int = 8,
+                 lease_seconds: float = LEASE_SECONDS):
+        self.queue = ChunkQueue(os.path.join(queue_dir, QUEUE_NAME))
+        self.segments_dir = os.path.join(queue_dir, SEGMENTS_NAME)
+        self.manager = manager or TTSManager()
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.completed = 0
+
+    async def _process(self, doc_id: str, seq: int, text: str, voice: str):
+        try:
+            try:
+                audio = await self.manager.synthesize(text, voice, BULK)
+                path = segment_path(self.segments_dir, doc_id, seq)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                partial = f"{path}.{os.getpid()}-{id(self)}.part"
+                with open(partial, "wb") as f:
+                    f.write(audio)
+                os.replace(partial, path)
+            except Exception as e:
+                print(f"[worker] {doc_id}#{seq}: {e}")
+                await asyncio.to_thread(self.queue.retry, doc_id, seq, str(e))
+                return
+            await asyncio.to_thread(self.queue.complete, doc_id, seq)
+            self.completed += 1
+        except sqlite3.OperationalError as e:
+            # Queue locked past its timeout: the lease runs out and the task is redelivered
+            print(f"[worker] {doc_id}#{seq}: queue unavailable: {e}")
+
+    async def run(self, drain: bool = False, stop_event: Optional[threading.Event] = None,
+                  poll_interval: float = POLL_INTERVAL):
+        """Work until stop_event is set, or with drain, until the queue has nothing left to lease."""
+        running = set()
+        while not (stop_event and stop_event.is_set()):
+            room = self.concurrency - len(running)
+            try:
+                leased = await asyncio.to_thread(self.queue.lease, room, self.lease_seconds) if room else []
+            except sqlite3.OperationalError as e:
+                # Another node held the queue past the lock timeout; back off and try again
+                print(f"[worker] queue unavailable: {e}")
+                await asyncio.sleep(poll_interval)
+                continue
+            running.update(asyncio.create_task(self._process(*task)) for task in leased)
+            if running:
+                _, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            elif drain:
+                break
+            else:
+                await asyncio.sleep(poll_interval)
+        await asyncio.gather(*running)
+
+    def close(self):
+        self.queue.close()
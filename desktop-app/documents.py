@@ -0,0 +1,188 @@
+"""
+Streaming text extraction from EPUB, HTML and Word (.docx) files.
+
+Nothing is parsed whole: HTML is tokenized as it is decoded, Word's
+document.xml is read with iterparse and each paragraph element cleared once
+read, and an EPUB is read one spine document at a time, a few in parallel.
+Paragraphs are yielded as they are found, so they can go straight into
+ingest.plan_stream.
+"""
+import io
+import os
+import re
+import zipfile
+import posixpath
+import collections
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+from urllib.parse import unquote
+
+import ingest
+
+DOCUMENT_EXTENSIONS = (".epub", ".docx", ".html", ".htm", ".xhtml")
+TEXT_BLOCK_CHARS = 64 * 1024
+# EPUB spine documents parsed at once
+EPUB_WORKERS = 4
+
+# Elements that end one paragraph and start the next
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "dt", "dd", "tr", "pre", "blockquote", "figcaption",
+    "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "header", "footer", "aside",
+}
+# Elements whose text is never spoken
+SKIP_TAGS = {"head", "script", "style", "noscript", "svg", "math", "nav", "template"}
+
+CONTAINER_NS = "{urn:oasis:names:tc:opendocument:xmlns:container}"
+OPF_NS = {"opf": "http://www.idpf.org/2007/opf"}
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class _ParagraphParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs: List[str] = []
+        self._parts: List[str] = []
+        self._size = 0
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        self._parts.append(data)
+        self._size += len(data)
+        if self._size >= ingest.MAX_PARAGRAPH_CHARS:
+            self._flush()
+
+    def _flush(self):
+        text = re.sub(r'\s+', ' ', "".join(self._parts)).strip()
+        if text:
+            self.paragraphs.append(text)
+        self._parts, self._size = [], 0
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def drain(self) -> List[str]:
+        paragraphs, self.paragraphs = self.paragraphs, []
+        return paragraphs
+
+
+def iter_html(blocks: Iterable[str]) -> Iterator[str]:
+    """Paragraphs of an HTML document arriving as blocks of text."""
+    parser = _ParagraphParser()
+    for block in blocks:
+        parser.feed(block)
+        yield from parser.drain()
+    parser.close()
+    yield from parser.drain()
+
+
+def _text_blocks(raw: BinaryIO) -> Iterator[str]:
+    text = io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+    return iter(lambda: text.read(TEXT_BLOCK_CHARS), "")
+
+
+def iter_docx_paragraphs(path: str) -> Iterator[str]:
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+        parts = []
+        # Open elements, so finished paragraphs can be detached from their parent
+        open_elements = []
+        for event, element in ET.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                open_elements.append(element)
+                continue
+            open_elements.pop()
+            tag = element.tag
+            if tag == W_NS + "t":
+                parts.append(element.text or "")
+            elif tag in (W_NS + "tab", W_NS + "br", W_NS + "cr"):
+                parts.append(" ")
+            elif tag == W_NS + "p":
+                text = re.sub(r'\s+', ' ', "".join(parts)).strip()
+                if text:
+                    yield text
+                parts = []
+            if tag in (W_NS + "p", W_NS + "tbl") and open_elements:
+                # Read: drop it from the tree so memory stays flat
+                open_elements[-1].remove(element)
+
+
+def epub_package(archive: zipfile.ZipFile) -> Tuple[str, ET.Element]:
+    """The archive path and parsed root of the EPUB's package (.opf) document."""
+    container = ET.fromstring(archive.read("META-INF/container.xml"))
+    package_path = container.find(f".//{CONTAINER_NS}rootfile").get("full-path")
+    return package_path, ET.fromstring(archive.read(package_path))
+
+
+def resolve_href(base_path: str, href: str) -> str:
+    """Archive path of an href found in the document at base_path, without its #fragment."""
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_path), unquote(href.split("#")[0])))
+
+
+def epub_spine(archive: zipfile.ZipFile) -> List[str]:
+    """Archive paths of the EPUB's reading-order documents."""
+    package_path, package = epub_package(archive)
+    manifest = {item.get("id"): item for item in package.iterfind("opf:manifest/opf:item", OPF_NS)}
+    documents = []
+    for itemref in package.iterfind("opf:spine/opf:itemref", OPF_NS):
+        item = manifest.get(itemref.get("idref"))
+        # Non-linear items are notes and pop-ups, not part of the reading order
+        if item is None or itemref.get("linear") == "no" or "html" not in item.get("media-type", ""):
+            continue
+        documents.append(resolve_href(package_path, item.get("href")))
+    return documents
+
+
+def _epub_document_paragraphs(path: str, name: str) -> List[str]:
+    # Each worker reads through its own handle on the archive
+    with zipfile.ZipFile(path) as archive, archive.open(name) as raw:
+        return list(iter_html(_text_blocks(raw)))
+
+
+def iter_epub_chapters(path: str, workers: int = EPUB_WORKERS) -> Iterator[Tuple[str, List[str]]]:
+    """
+    (spine document, its paragraphs) in reading order. Up to `workers`
+    documents are parsed ahead of the one being consumed, so only that many
+    chapters are ever held in memory.
+    """
+    with zipfile.ZipFile(path) as archive:
+        names = epub_spine(archive)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lito-epub")
+    pending = collections.deque()
+    try:
+        for name in names:
+            pending.append((name, pool.submit(_epub_document_paragraphs, path, name)))
+            if len(pending) > workers:
+                name, future = pending.popleft()
+                yield name, future.result()
+        while pending:
+            name, future = pending.popleft()
+            yield name, future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_paragraphs(path: str, workers: int = EPUB_WORKERS) -> Iterator[str]:
+    extension = os.path.splitext(path.lower())[1]
+    if extension == ".epub":
+        for _, paragraphs in iter_epub_chapters(path, workers):
+            yield from paragraphs
+    elif extension == ".docx":
+        yield from iter_docx_paragraphs(path)
+    elif extension in DOCUMENT_EXTENSIONS:
+        yield from iter_html(ingest.iter_decoded(path))
@@ -0,0 +1,102 @@
+"""
+Output audio formats.
+
+edge-tts always returns 48 kbps mono MP3; other formats are produced by
+piping that stream through ffmpeg when it is installed.
+"""
+import os
+import shutil
+import asyncio
+from typing import List
+
+DEFAULT_FORMAT = "mp3"
+
+AUDIO_FORMATS = {
+    "mp3": {"label": "MP3 (48 kbps)", "extension": ".mp3", "media_type": "audio/mpeg", "ffmpeg_args": None},
+    "mp3-low": {
+        "label": "MP3 (24 kbps, smaller)", "extension": ".mp3", "media_type": "audio/mpeg",
+        "ffmpeg_args": ["-c:a", "libmp3lame", "-b:a", "24k", "-ac", "1", "-ar", "22050", "-f", "mp3"],
+    },
+    "opus": {
+        "label": "Opus (16 kbps, smallest)", "extension": ".ogg", "media_type": "audio/ogg",
+        "ffmpeg_args": ["-c:a", "libopus", "-b:a", "16k", "-application", "voip", "-f", "ogg"],
+    },
+}
+
+
+def ffmpeg_path():
+    return shutil.which("ffmpeg")
+
+
+def available_formats() -> List[str]:
+    """Formats this machine can produce: MP3 always, the rest need ffmpeg."""
+    if ffmpeg_path():
+        return list(AUDIO_FORMATS)
+    return [name for name, spec in AUDIO_FORMATS.items() if not spec["ffmpeg_args"]]
+
+
+def extension_for(fmt: str) -> str:
+    return AUDIO_FORMATS[fmt]["extension"]
+
+
+class FileEncoder:
+    """Writes the edge-tts MP3 stream as-is."""
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self._file = open(output_path, "wb")
+
+    async def write(self, data: bytes):
+        self._file.write(data)
+
+    async def close(self):
+        self._file.close()
+
+    async def abort(self):
+        self._file.close()
+
+
+class FfmpegEncoder:
+    """Transcodes the MP3 stream on the fly through an ffmpeg subprocess."""
+
+    def __init__(self, process, output_path: str):
+        self.process = process
+        self.output_path = output_path
+
+    @classmethod
+    async def start(cls, fmt: str, output_path: str) -> "FfmpegEncoder":
+        args = [ffmpeg_path(), "-hide_banner", "-loglevel", "error", "-y", "-f", "mp3", "-i", "pipe:0"]
+        args += AUDIO_FORMATS[fmt]["ffmpeg_args"] + [output_path]
+        process = await asyncio.create_subprocess_exec(
+            *args, stdin=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        return cls(process, output_path)
+
+    async def write(self, data: bytes):
+        self.process.stdin.write(data)
+        await self.process.stdin.drain()
+
+    async def close(self):
+        self.process.stdin.close()
+        _, stderr = await self.process.communicate()
+        if self.process.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+
+    async def abort(self):
+        if self.process.returncode is None:
+            self.process.kill()
+        await self.process.wait()
+
+
+async def open_encoder(fmt: str, output_path: str):
+    if fmt not in AUDIO_FORMATS:
+        raise ValueError(f"Unknown audio format: {fmt}")
+    if not AUDIO_FORMATS[fmt]["ffmpeg_args"]:
+        return FileEncoder(output_path)
+    if not ffmpeg_path():
+        raise RuntimeError(f"The {fmt} format requires ffmpeg on PATH")
+    return await FfmpegEncoder.start(fmt, output_path)
+
+
+def replace_extension(path: str, fmt: str) -> str:
+    return os.path.splitext(path)[0] + extension_for(fmt)
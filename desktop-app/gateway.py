@@ -0,0 +1,377 @@
+"""
+Local TTS gateway: one long-running process that owns a TTSManager and
+serves it to every Lito client on the machine.
+
+The desktop app and the CLI start cold each run: a fresh voice list, an
+empty audio cache, and their own scheduler and concurrency controller
+relearning the upstream limit. With `lito serve` running they become thin
+clients instead. Their requests share the daemon's warm voice list, its
+in-memory audio cache, one priority scheduler and one AIMD limit, so a
+preview in the app still jumps ahead of a bulk job started from the CLI.
+
+The daemon listens on a Unix socket in the user's cache directory
+(127.0.0.1:47863 on Windows), or wherever LITO_GATEWAY points ("host:port"
+or a socket path). LITO_GATEWAY=off, or no daemon answering, means
+synthesis runs in-process as before.
+
+Requests must carry a per-user token. The daemon writes a fresh random one
+to a file only its user can read (next to the socket, or in the user's
+cache directory for TCP) and clients send it in the X-Lito-Token header,
+so other local users cannot synthesize through it or read /health.
+"""
+import os
+import re
+import hmac
+import time
+import atexit
+import socket
+import asyncio
+import collections
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from logic import TTSManager
+from scheduler import NORMAL, PRIORITIES
+from singleflight import normalize_text
+
+GATEWAY_ENV = "LITO_GATEWAY"
+DEFAULT_PORT = 47863
+# The voice list barely changes; refetched at most this often
+VOICES_TTL = 3600
+DEFAULT_CACHE_BYTES = 128 * 1024 * 1024
+# How long a client waits for the daemon to accept before running in-process
+CONNECT_TIMEOUT = 0.5
+TOKEN_HEADER = "X-Lito-Token"
+
+
+class GatewayError(Exception):
+    """The gateway answered, but could not synthesize."""
+
+
+def user_dir() -> str:
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "Lito")
+
+
+def default_address() -> str:
+    if os.name == "nt":
+        return f"127.0.0.1:{DEFAULT_PORT}"
+    return os.path.join(user_dir(), "gateway.sock")
+
+
+def configured_address() -> Optional[str]:
+    """LITO_GATEWAY, or the default address if unset; None if it is "off"."""
+    address = os.environ.get(GATEWAY_ENV) or default_address()
+    return None if address.lower() == "off" else address
+
+
+def parse_address(address: str) -> Tuple[Optional[str], Optional[int]]:
+    """(host, port) for a TCP address, or (None, None) for a Unix socket path."""
+    match = re.fullmatch(r'([\w.-]+):(\d+)', address)
+    return (match.group(1), int(match.group(2))) if match else (None, None)
+
+
+def token_path(address: str) -> str:
+    """Where the daemon at address keeps its access token."""
+    host, port = parse_address(address)
+    if host is None:
+        return address + ".token"
+    return os.path.join(user_dir(), f"gateway-{host}-{port}.token")
+
+
+def write_token(path: str) -> str:
+    """A fresh random token, written to path readable by this user only."""
+    token = os.urandom(32).hex()
+    os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    os.replace(tmp_path, path)
+    return token
+
+
+def read_token(address: str) -> Optional[str]:
+    try:
+        with open(token_path(address), encoding="ascii") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def reachable(address: str, timeout: float = CONNECT_TIMEOUT) -> bool:
+    host, port = parse_address(address)
+    try:
+        if host is None:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect(address)
+        else:
+            socket.create_connection((host, port), timeout).close()
+        return True
+    except (OSError, AttributeError):
+        # AttributeError: no AF_UNIX on this platform
+        return False
+
+
+class AudioCache:
+    """Synthesized audio by (text, voice), evicted least-recently-used past max_bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def put(self, key, audio: bytes):
+        if len(audio) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = audio
+            self._size += len(audio)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+
+class Gateway:
+    def __init__(self, manager: Optional[TTSManager] = None, cache_bytes: int = DEFAULT_CACHE_BYTES):
+        self.manager = manager or TTSManager()
+        self.cache = AudioCache(cache_bytes)
+        self.started = time.time()
+        self.requests = 0
+        self._voices: Optional[List[Dict]] = None
+        self._voices_at = 0.0
+        self._runner: Optional[web.AppRunner] = None
+        self._token: Optional[str] = None
+        self._token_path: Optional[str] = None
+
+    @web.middleware
+    async def _authorize(self, request: web.Request, handler):
+        supplied = request.headers.get(TOKEN_HEADER, "")
+        if not self._token or not hmac.compare_digest(supplied.encode("utf-8"), self._token.encode("utf-8")):
+            return web.json_response({"error": "Missing or wrong gateway token"}, status=401)
+        return await handler(request)
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._authorize])
+        app.add_routes([
+            web.get("/health", self.health),
+            web.get("/voices", self.voices),
+            web.post("/synthesize", self.synthesize),
+        ])
+        return app
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started),
+            "requests": self.requests,
+            "cache": self.cache.stats(),
+            "scheduler": self.manager.scheduler.stats(),
+            "concurrency": self.manager.controller.stats(),
+            "hedging": self.manager.hedger.stats(),
+        })
+
+    async def voices(self, request: web.Request) -> web.Response:
+        if self._voices is None or time.time() - self._voices_at > VOICES_TTL:
+            try:
+                self._voices = await self.manager.get_voices()
+                self._voices_at = time.time()
+            except Exception as e:
+                if self._voices is None:
+                    return web.json_response({"error": str(e)}, status=502)
+                # A stale list beats none
+        return web.json_response(self._voices)
+
+    async def synthesize(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            return web.json_response({"error": "Expected a JSON object"}, status=400)
+        text, voice = body.get("text"), body.get("voice")
+        priority = body.get("priority") or NORMAL
+        if not isinstance(text, str) or not text.strip() or not isinstance(voice, str) or not voice:
+            return web.json_response({"error": "text and voice are required"}, status=400)
+        if priority not in PRIORITIES:
+            return web.json_response({"error": f"priority must be one of {', '.join(PRIORITIES)}"}, status=400)
+
+        self.requests += 1
+        key = (normalize_text(text), voice)
+        audio = self.cache.get(key)
+        if audio is None:
+            try:
+                audio = await self.manager.synthesize(text, voice, priority)
+            except Exception as e:
+                return web.json_response({"error": str(e)}, status=502)
+            if audio:
+                self.cache.put(key, audio)
+        return web.Response(body=audio, content_type="audio/mpeg")
+
+    async def start(self, address: Optional[str] = None) -> str:
+        address = address or configured_address() or default_address()
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        host, port = parse_address(address)
+        if host is None:
+            if os.path.exists(address):
+                if reachable(address):
+                    await self._runner.cleanup()
+                    raise RuntimeError(f"A gateway is already running at {address}")
+                # Left behind by a daemon that did not shut down cleanly
+                os.remove(address)
+            # Only this user can reach the socket
+            os.makedirs(os.path.dirname(address), mode=0o700, exist_ok=True)
+            site = web.UnixSite(self._runner, address)
+        else:
+            site = web.TCPSite(self._runner, host, port)
+        self._token_path = token_path(address)
+        self._token = write_token(self._token_path)
+        await site.start()
+        return address
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._token_path:
+            try:
+                os.remove(self._token_path)
+            except OSError:
+                pass
+            self._token_path = self._token = None
+
+    async def serve_forever(self, address: Optional[str] = None, stop_event: Optional[asyncio.Event] = None):
+        address = await self.start(address)
+        print(f"Lito gateway listening on {address}")
+        try:
+            await (stop_event or asyncio.Event()).wait()
+        finally:
+            await self.stop()
+
+
+class GatewayManager(TTSManager):
+    """
+    A TTSManager whose synthesis and voice list come from a running gateway.
+    Chunk planning, ordering and encoding stay in the client; scheduling,
+    caching and the upstream limit are the daemon's. If the daemon goes away
+    mid-run, requests fall back to in-process synthesis.
+
+    Requests share one aiohttp session, opened on the first request and
+    closed by close() (or at exit).
+    """
+
+    def __init__(self, address: str):
+        super().__init__()
+        self.address = address
+        host, port = parse_address(address)
+        self._base_url = f"http://{host}:{port}" if host else "http://lito"
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[aiohttp.ClientSession] = None
+        self._start_lock = threading.Lock()
+
+    async def _open(self) -> aiohttp.ClientSession:
+        host, _ = parse_address(self.address)
+        connector = aiohttp.TCPConnector() if host else aiohttp.UnixConnector(path=self.address)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    def _headers(self) -> Dict[str, str]:
+        # Read per request: a restarted daemon writes a new token
+        return {TOKEN_HEADER: read_token(self.address) or ""}
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        loop.run_forever()
+        loop.close()
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        # Sessions are bound to their event loop, and the app and the
+        # watch-folder mode run conversions on loops of their own, so one
+        # session lives on a loop thread of its own and every caller shares it
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=self._run_loop, args=(loop,), name="lito-gateway-client", daemon=True).start()
+                self._client = asyncio.run_coroutine_threadsafe(self._open(), loop).result()
+                self._loop = loop
+                atexit.register(self.close)
+            return self._loop
+
+    async def _request(self, call):
+        """Run call(session) on the shared session's loop and await its result here."""
+        loop = self._start()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(call(self._client), loop))
+
+    def close(self):
+        """Close the shared session; the next request opens a new one."""
+        with self._start_lock:
+            loop, client = self._loop, self._client
+            self._loop = self._client = None
+        if loop is None:
+            return
+        atexit.unregister(self.close)
+        asyncio.run_coroutine_threadsafe(client.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    async def get_voices(self) -> List[Dict]:
+        async def fetch(session: aiohttp.ClientSession):
+            async with session.get(f"{self._base_url}/voices", headers=self._headers()) as response:
+                if response.status == 200:
+                    return await response.json()
+
+        try:
+            voices = await self._request(fetch)
+            if voices is not None:
+                return voices
+        except aiohttp.ClientConnectionError:
+            pass
+        return await super().get_voices()
+
+    async def _synthesize(self, text: str, voice: str, priority: str = NORMAL) -> bytes:
+        payload = {"text": text, "voice": voice, "priority": priority}
+
+        async def post(session: aiohttp.ClientSession) -> bytes:
+            async with session.post(f"{self._base_url}/synthesize", json=payload, headers=self._headers()) as response:
+                if response.status != 200:
+                    error = (await response.json(content_type=None)).get("error")
+                    raise GatewayError(error or f"HTTP {response.status}")
+                return await response.read()
+
+        try:
+            return await self._request(post)
+        except aiohttp.ClientConnectionError:
+            return await super()._synthesize(text, voice, priority)
+
+
+def connect_manager(address: Optional[str] = None) -> TTSManager:
+    """A client of the running gateway if one answers, else an in-process TTSManager."""
+    address = address or configured_address()
+    if address and reachable(address) and read_token(address):
+        return GatewayManager(address)
+    return TTSManager()
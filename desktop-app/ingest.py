@@ -0,0 +1,151 @@
+"""
+Streaming ingestion for text files of any size.
+
+Files are memory-mapped and decoded block by block with an incremental
+decoder, after sniffing the encoding from a BOM or the first block. Lines
+become normalized paragraphs, and paragraphs are planned into chunks a window
+at a time, so memory use does not grow with the file.
+"""
+import os
+import re
+import mmap
+import codecs
+from typing import Iterable, Iterator, Optional
+
+from chunking import plan_chunks, utf8_len
+from mdtext import iter_speech_paragraphs
+
+BLOCK_SIZE = 1024 * 1024
+SNIFF_BYTES = 64 * 1024
+# Text with no blank lines is still cut into paragraphs of about this size
+MAX_PARAGRAPH_CHARS = 64 * 1024
+# Paragraphs are chunked this many bytes at a time
+PLAN_WINDOW_BYTES = 256 * 1024
+# Files above this size are streamed instead of extracted into one string
+STREAM_THRESHOLD_BYTES = 32 * 1024 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# Tried in order when the text is not UTF-8; latin-1 accepts any byte
+FALLBACK_ENCODINGS = ("cp1252", "latin-1")
+# cp1258 (Vietnamese) and cp1252 (Western) decode nearly the same bytes, so
+# cp1258 is only chosen on evidence: its combining tone marks, which in
+# cp1252 are the accented letters Ì Ò Þ ì ò, written right after a vowel
+CP1258_TONE_MARKS = frozenset(b"\xcc\xd2\xde\xec\xf2")
+# ASCII vowels and cp1258's â ê ô ă ơ ư, both cases
+CP1258_VOWELS = frozenset(b"aeiouyAEIOUY\xe2\xea\xf4\xe3\xf5\xfd\xc2\xca\xd4\xc3\xd5\xdd")
+
+
+def looks_vietnamese(head: bytes) -> bool:
+    """True if most tone-mark bytes in a legacy-encoded sample follow a vowel, as cp1258 writes them."""
+    marks = after_vowel = 0
+    for previous, byte in zip(head, head[1:]):
+        if byte in CP1258_TONE_MARKS:
+            marks += 1
+            after_vowel += previous in CP1258_VOWELS
+    return after_vowel > 0 and after_vowel * 2 > marks
+
+
+def sniff_encoding(head: bytes) -> str:
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    # BOM-less UTF-16: every other byte of mostly-ASCII text is zero
+    if len(head) >= 4 and head[1::2].count(0) > len(head) // 4:
+        return "utf-16-le"
+    if len(head) >= 4 and head[0::2].count(0) > len(head) // 4:
+        return "utf-16-be"
+    try:
+        # Not final: the sample may end inside a multi-byte character
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    encodings = ("cp1258",) + FALLBACK_ENCODINGS if looks_vietnamese(head) else FALLBACK_ENCODINGS
+    for encoding in encodings:
+        try:
+            head.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def should_stream(path: str) -> bool:
+    return os.path.getsize(path) > STREAM_THRESHOLD_BYTES
+
+
+def iter_decoded(path: str, encoding: Optional[str] = None, block_size: int = BLOCK_SIZE) -> Iterator[str]:
+    """Decoded text of a file, one block at a time."""
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        encoding = encoding or sniff_encoding(mapped[:SNIFF_BYTES])
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        for start in range(0, len(mapped), block_size):
+            text = decoder.decode(mapped[start:start + block_size])
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+def iter_lines(path: str, encoding: Optional[str] = None) -> Iterator[str]:
+    partial = ""
+    for block in iter_decoded(path, encoding):
+        lines = (partial + block).split("\n")
+        # The last line may continue in the next block
+        partial = lines.pop()
+        while len(partial) > MAX_PARAGRAPH_CHARS:
+            # No line breaks at all: hand over what we have at a space
+            cut = partial.rfind(" ", 0, MAX_PARAGRAPH_CHARS) + 1 or MAX_PARAGRAPH_CHARS
+            lines.append(partial[:cut])
+            partial = partial[cut:]
+        for line in lines:
+            yield line.rstrip("\r")
+    if partial:
+        yield partial.rstrip("\r")
+
+
+def iter_text_paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    """Plain text: blank lines separate paragraphs; lines within one are joined."""
+    pending = []
+    size = 0
+    for line in lines:
+        line = line.strip()
+        if line:
+            pending.append(line)
+            size += len(line)
+        if pending and (not line or size >= MAX_PARAGRAPH_CHARS):
+            yield re.sub(r'\s+', ' ', " ".join(pending))
+            pending, size = [], 0
+    if pending:
+        yield re.sub(r'\s+', ' ', " ".join(pending))
+
+
+def iter_paragraphs(path: str, encoding: Optional[str] = None) -> Iterator[str]:
+    lines = iter_lines(path, encoding)
+    if path.lower().endswith(".md"):
+        return iter_speech_paragraphs(lines)
+    return iter_text_paragraphs(lines)
+
+
+def plan_stream(paragraphs: Iterable[str], max_bytes: int,
+                window_bytes: int = PLAN_WINDOW_BYTES) -> Iterator[str]:
+    """Chunks for a stream of paragraphs, planned one window of paragraphs at a time."""
+    window = []
+    size = 0
+    for paragraph in paragraphs:
+        window.append(paragraph)
+        size += utf8_len(paragraph)
+        if size >= window_bytes:
+            yield from plan_chunks("\n".join(window), max_bytes)
+            window, size = [], 0
+    if window:
+        yield from plan_chunks("\n".join(window), max_bytes)
@@ -1,8 +1,40 @@
 import os
 import re
-from typing import List, Dict
+import asyncio
+import collections
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
 import edge_tts
-from pypdf import PdfReader
+
+import documents
+import ingest
+import pdf_backends
+from chunking import plan_chunks, split_sentences
+from concurrency import AIMDController
+from formats import DEFAULT_FORMAT, open_encoder
+from hedging import Hedger
+from mdtext import markdown_to_speech
+from profiling import profiled
+from scheduler import BULK, INTERACTIVE, NORMAL, PriorityScheduler
+from singleflight import SingleFlight, normalize_text
+
+# Chunks stay well under edge-tts's 4096-byte request limit so long
+# documents split into many similarly sized requests
+CHUNK_MAX_BYTES = 2048
+
+# How often a running conversion checks its cancel event
+CANCEL_POLL_INTERVAL = 0.05
+
+# Chunks synthesized ahead of the one being written; bounds memory for huge inputs
+CONVERT_WINDOW = 64
+
+class ConversionCancelled(Exception):
+    """Raised by extraction when the cancel event is set."""
+
+
+def check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise ConversionCancelled()
+
 
 class TextProcessor:
     @staticmethod
@@ -12,24 +44,21 @@ class TextProcessor:
 
     @staticmethod
     def extract_from_md(content: str) -> str:
-        text = content
-        text = re.sub(r'^#+\s+', '', text, flags=re.MULTILINE)
-        text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-        text = re.sub(r'\*(.*?)\*', r'\1', text)
-        text = re.sub(r'\[(.*?)\]\(.*?\)', r'\1', text)
-        text = re.sub(r'^-{3,}', '', text, flags=re.MULTILINE)
-        text = re.sub(r'http[s]?://\S+', '', text)
-        return TextProcessor.clean_text(text)
+        # One paragraph, heading or list item per line; code, tables and HTML are dropped
+        return markdown_to_speech(content)
 
     @staticmethod
-    def extract_from_pdf(file_path: str) -> str:
-        reader = PdfReader(file_path)
+    def extract_from_pdf(file_path: str, cancel_event=None) -> str:
         full_text = ""
-        for page in reader.pages:
-            text = page.extract_text()
+        for text in pdf_backends.page_texts(file_path):
+            check_cancelled(cancel_event)
             if text:
                 full_text += text + "\n"
-        
+        return TextProcessor.clean_pdf_text(full_text)
+
+    @staticmethod
+    def clean_pdf_text(full_text: str) -> str:
+        """Rejoin lines a PDF broke mid-sentence and collapse whitespace."""
         full_text = full_text.replace('\u200b', '')
         lines = full_text.split('\n')
         cleaned_text = ""
@@ -44,22 +73,53 @@ class TextProcessor:
         return TextProcessor.clean_text(cleaned_text)
 
     @classmethod
-    def process_file(cls, file_path: str) -> str:
+    @profiled("process_file")
+    def process_file(cls, file_path: str, cancel_event=None) -> str:
+        """Raises ConversionCancelled if cancel_event is set part way through."""
         _, ext = os.path.splitext(file_path)
         ext = ext.lower()
         
         if ext == '.pdf':
-            return cls.extract_from_pdf(file_path)
-        elif ext in ['.md', '.txt']:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                return cls.extract_from_md(content) if ext == '.md' else cls.clean_text(content)
+            return cls.extract_from_pdf(file_path, cancel_event)
+        elif ext in ['.md', '.txt'] or ext in documents.DOCUMENT_EXTENSIONS:
+            # Parsed incrementally; one paragraph per line
+            paragraphs = []
+            for paragraph in cls.iter_paragraphs(file_path):
+                check_cancelled(cancel_event)
+                paragraphs.append(paragraph)
+            return "\n".join(paragraphs)
         return ""
 
+    @staticmethod
+    def iter_paragraphs(file_path: str) -> Iterator[str]:
+        """Paragraphs of a text, Markdown, HTML, EPUB or Word file, read incrementally."""
+        if file_path.lower().endswith(documents.DOCUMENT_EXTENSIONS):
+            return documents.iter_paragraphs(file_path)
+        return ingest.iter_paragraphs(file_path)
+
+    @classmethod
+    def iter_chunks(cls, file_path: str, max_bytes: Optional[int] = None) -> Iterator[str]:
+        """Chunks of a file without holding its whole text; for files too large to extract at once."""
+        max_bytes = max_bytes or CHUNK_MAX_BYTES
+        if file_path.lower().endswith('.pdf'):
+            return iter(plan_chunks(cls.extract_from_pdf(file_path), max_bytes))
+        return ingest.plan_stream(cls.iter_paragraphs(file_path), max_bytes)
+
 class TTSManager:
     def __init__(self):
         self.output_dir = os.path.join(os.path.expanduser("~"), "Documents", "Lito")
         os.makedirs(self.output_dir, exist_ok=True)
+        # Shared by every conversion so the learned upstream limit carries over
+        self.controller = AIMDController()
+        # Identical chunks in flight at once (repeated headings, parallel
+        # conversions of the same text) share one upstream request
+        self.flights = SingleFlight()
+        # Orders requests for the controller's slots: previews ahead of
+        # conversions, conversions ahead of bulk and watch-folder work
+        self.scheduler = PriorityScheduler(lambda: self.controller.limit)
+        self.controller.on_limit_change(self.scheduler.poke)
+        # Duplicates calls stuck past the p95 latency (LITO_HEDGE, off by default)
+        self.hedger = Hedger()
 
     async def get_voices(self) -> List[Dict]:
         voices = await edge_tts.list_voices()
@@ -93,26 +153,133 @@ class TTSManager:
         
         return filtered_voices
 
-    async def convert(self, text: str, voice: str, output_path: str, cancel_event=None) -> str:
+    async def synthesize(self, text: str, voice: str, priority: str = NORMAL) -> bytes:
+        return await self.flights.do((normalize_text(text), voice), lambda: self._synthesize(text, voice, priority))
+
+    async def preview(self, text: str, voice: str) -> bytes:
+        """Audio for the first sentence of text, ahead of any running conversion."""
+        sentences = split_sentences(text.strip())
+        first = plan_chunks(sentences[0] if sentences else text, CHUNK_MAX_BYTES)
+        return await self.synthesize(first[0], voice, INTERACTIVE) if first else b""
+
+    async def _synthesize(self, text: str, voice: str, priority: str = NORMAL) -> bytes:
+        async with self.scheduler.slot(priority), self.controller.slot():
+            # A hedge shares this slot; the hedge budget keeps such extras rare
+            return await self.hedger.run(lambda: self._stream(text, voice))
+
+    @staticmethod
+    async def _stream(text: str, voice: str) -> bytes:
+        communicate = edge_tts.Communicate(text, voice)
+        audio = bytearray()
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio.extend(chunk["data"])
+        return bytes(audio)
+
+    async def synthesize_many(self, items: Iterable[Tuple[str, str, str]],
+                              window: int = 64, priority: str = BULK) -> AsyncIterator[Tuple[str, Optional[bytes], Optional[Exception]]]:
+        """
+        Synthesize independent (item_id, text, voice) items, e.g. a catalog of
+        UI prompts. Yields (item_id, audio, error) in completion order. At most
+        `window` items are pending at once, so large catalogs stream through
+        without creating a task per item up front.
+        """
+        items = iter(items)
+        pending = {}
+
+        def refill():
+            while len(pending) < window:
+                item = next(items, None)
+                if item is None:
+                    return
+                item_id, text, voice = item
+                pending[asyncio.create_task(self.synthesize(text, voice, priority))] = item_id
+
+        try:
+            refill()
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    item_id = pending.pop(task)
+                    if task.exception() is not None:
+                        yield item_id, None, task.exception()
+                    else:
+                        yield item_id, task.result(), None
+                refill()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    @staticmethod
+    async def _watch_cancel(cancel_event, task: asyncio.Task):
+        while not cancel_event.is_set():
+            await asyncio.sleep(CANCEL_POLL_INTERVAL)
+        task.cancel()
+
+    @profiled("convert")
+    async def convert(self, text: str, voice: str, output_path: str, cancel_event=None,
+                      fmt: str = DEFAULT_FORMAT, on_audio=None, chunks: Optional[Iterable[str]] = None,
+                      priority: str = NORMAL) -> str:
         """
+        chunks, if given, is a precomputed chunk plan for text (e.g. from the
+        extracted-text cache) or a lazy stream of chunks (TextProcessor.iter_chunks),
+        consumed CONVERT_WINDOW chunks ahead of the writer. on_audio, if given,
+        receives each chunk's MP3 bytes in document order as soon as it is
+        written (used for progressive playback).
+
         Returns: 'success', 'cancelled', or 'error'
         """
+        # Chunks are synthesized concurrently (bounded by the AIMD controller)
+        # and written in document order as each one completes
+        if chunks is None:
+            chunks = plan_chunks(text, CHUNK_MAX_BYTES)
+        chunks = iter(chunks)
+        tasks = collections.deque()
+
+        def refill():
+            while len(tasks) < CONVERT_WINDOW:
+                text_chunk = next(chunks, None)
+                if text_chunk is None:
+                    return
+                tasks.append(asyncio.create_task(self.synthesize(text_chunk, voice, priority)))
+
+        # Setting cancel_event cancels this task wherever it is waiting: on a
+        # stalled connection, the encoder, or the next chunk
+        watcher = asyncio.create_task(self._watch_cancel(cancel_event, asyncio.current_task())) \
+            if cancel_event else None
+
+        result = "success"
+        encoder = None
         try:
-            communicate = edge_tts.Communicate(text, voice)
-            with open(output_path, "wb") as f:
-                async for chunk in communicate.stream():
-                    if cancel_event and cancel_event.is_set():
-                        f.close()
-                        if os.path.exists(output_path):
-                            os.remove(output_path)
-                        return "cancelled"
-
-                    if chunk["type"] == "audio":
-                        f.write(chunk["data"])
-                            
-            return "success"
+            encoder = await open_encoder(fmt, output_path)
+            refill()
+            while tasks:
+                audio = await tasks[0]
+                tasks.popleft()
+                await encoder.write(audio)
+                if on_audio:
+                    on_audio(audio)
+                refill()
+            await encoder.close()
+        except asyncio.CancelledError:
+            if not (cancel_event and cancel_event.is_set()):
+                raise
+            asyncio.current_task().uncancel()
+            result = "cancelled"
         except Exception as e:
             print(f"TTS Error: {e}")
-            if os.path.exists(output_path):
-                os.remove(output_path)
-            return "error"
\ No newline at end of file
+            result = "error"
+        finally:
+            if watcher:
+                watcher.cancel()
+            for task in tasks:
+                task.cancel()
+            # Wait for every request to unwind so its connection is closed
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if result != "success" and encoder:
+                await encoder.abort()
+
+        if result != "success" and os.path.exists(output_path):
+            os.remove(output_path)
+        return result
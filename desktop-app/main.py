@@ -1,5 +1,6 @@
 import os
 import asyncio
+import itertools
 import threading
 import subprocess
 import webbrowser
@@ -8,7 +9,18 @@ from tkinter import ttk, filedialog, messagebox
 import winsound
 from datetime import datetime
 
-from logic import TextProcessor, TTSManager
+import ingest
+from logic import CHUNK_MAX_BYTES, ConversionCancelled, TextProcessor
+from formats import AUDIO_FORMATS, DEFAULT_FORMAT, available_formats, extension_for
+from playback import FfplaySink, PlaybackPipeline
+from textcache import ExtractedTextCache
+from pager import PagedDocument
+from chunking import plan_chunks
+from chapters import CONTAINER_FORMATS, convert_chapters, detect_chapters
+from gateway import connect_manager
+
+# Pastes longer than this are paged instead of inserted into the text box
+LARGE_PASTE_CHARS = 100_000
 
 # Try to import version, default to Dev if not found (e.g. running directly without build script)
 try:
@@ -21,12 +33,18 @@ class App(tk.Tk):
         super().__init__()
 
         self.title(f"Lito v{__version__}")
-        self.geometry("550x450")
+        self.geometry("550x520")
         self.resizable(False, False)
 
-        self.tts_manager = TTSManager()
+        # Thin client of `lito serve` when it is running
+        self.tts_manager = connect_manager()
+        self.text_cache = ExtractedTextCache()
         self.current_output_path = ""
         self.selected_file_path = ""
+        self.playback = None
+        # Large pastes and file previews are shown a page at a time from here
+        self.document = None
+        self.page_number = 0
         
         # Threading control
         self.cancel_event = threading.Event()
@@ -73,6 +91,23 @@ class App(tk.Tk):
         self.voice_var = tk.StringVar(value="Loading voices...")
         self.voice_combo = ttk.Combobox(voice_frame, textvariable=self.voice_var, state="readonly", width=40)
         self.voice_combo.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Button(voice_frame, text="Listen", width=7, command=self.preview_voice).pack(side=tk.LEFT, padx=(10, 0))
+
+        # Output Format
+        format_frame = ttk.Frame(main_frame)
+        format_frame.pack(fill=tk.X, pady=(0, 15))
+        ttk.Label(format_frame, text="Output Format:").pack(side=tk.LEFT, padx=(0, 10))
+        self.format_labels = {AUDIO_FORMATS[f]["label"]: f for f in available_formats()}
+        self.format_combo = ttk.Combobox(format_frame, values=list(self.format_labels), state="readonly", width=38)
+        self.format_combo.current(0)
+        self.format_combo.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+        # Progressive playback needs ffplay (from ffmpeg) to stream audio
+        self.play_while_converting = tk.BooleanVar(value=FfplaySink.available())
+        ttk.Checkbutton(
+            format_frame, text="Play while converting", variable=self.play_while_converting,
+            state="normal" if FfplaySink.available() else "disabled"
+        ).pack(side=tk.LEFT, padx=(10, 0))
 
         # Tabs
         self.notebook = ttk.Notebook(main_frame)
@@ -81,18 +116,34 @@ class App(tk.Tk):
         # Tab 1: Text
         self.tab_text = ttk.Frame(self.notebook, padding=10)
         self.notebook.add(self.tab_text, text="Text Input")
+        # Pager controls, shown only while a paged document is loaded
+        self.pager_frame = ttk.Frame(self.tab_text)
+        ttk.Button(self.pager_frame, text="◀", width=3, command=lambda: self.show_page(self.page_number - 1)).pack(side=tk.LEFT)
+        self.page_var = tk.StringVar()
+        ttk.Label(self.pager_frame, textvariable=self.page_var, anchor="center").pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Button(self.pager_frame, text="▶", width=3, command=lambda: self.show_page(self.page_number + 1)).pack(side=tk.LEFT)
+        self.btn_clear = ttk.Button(self.pager_frame, text="Clear", command=self.clear_document)
+        self.btn_clear.pack(side=tk.LEFT, padx=(5, 0))
         self.text_area = tk.Text(self.tab_text, height=10, width=50, wrap=tk.WORD, font=("Segoe UI", 10))
         self.text_area.pack(fill=tk.BOTH, expand=True)
+        self.text_area.bind("<<Paste>>", self.on_paste)
 
         # Tab 2: File
         self.tab_file = ttk.Frame(self.notebook, padding=10)
         self.notebook.add(self.tab_file, text="File Upload")
         self.file_label = ttk.Label(
-            self.tab_file, text="No file selected\n(Supported: .txt, .md, .pdf)", 
+            self.tab_file, text="No file selected\n(Supported: .txt, .md, .pdf, .epub, .docx, .html)", 
             relief="groove", anchor="center", padding=30
         )
         self.file_label.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
-        ttk.Button(self.tab_file, text="Choose File...", command=self.select_file).pack()
+        file_buttons = ttk.Frame(self.tab_file)
+        file_buttons.pack()
+        ttk.Button(file_buttons, text="Choose File...", command=self.select_file).pack(side=tk.LEFT, padx=(0, 5))
+        self.btn_preview = ttk.Button(file_buttons, text="Preview", command=self.preview_file)
+        self.btn_preview.pack(side=tk.LEFT)
+        # PDF outlines, EPUB contents and Markdown headings; other files convert as one
+        self.split_chapters = tk.BooleanVar(value=False)
+        ttk.Checkbutton(file_buttons, text="One file per chapter", variable=self.split_chapters).pack(side=tk.LEFT, padx=(10, 0))
 
         # Progress Bar
         self.progress_frame = ttk.Frame(main_frame)
@@ -185,13 +236,113 @@ class App(tk.Tk):
 
     def select_file(self):
         filename = filedialog.askopenfilename(
-            title="Select Document", filetypes=[("Documents", "*.pdf *.md *.txt"), ("All Files", "*.*")]
+            title="Select Document", filetypes=[("Documents", "*.pdf *.md *.txt *.epub *.docx *.html *.htm"), ("All Files", "*.*")]
         )
         if filename:
             self.selected_file_path = filename
             self.file_label.config(text=os.path.basename(filename))
             self.status_var.set(f"Selected: {filename}")
 
+    def on_paste(self, event):
+        try:
+            pasted = self.clipboard_get()
+        except tk.TclError:
+            return None
+        if self.document:
+            return "break"  # Paged view is read-only; Clear it first
+        if len(pasted) < LARGE_PASTE_CHARS:
+            return None  # Let Tk insert it normally
+        if self.is_converting:
+            self.status_var.set("Finish or cancel the conversion before loading more text.")
+            return "break"
+        self.status_var.set("Loading pasted text...")
+        threading.Thread(target=self.load_document_thread, args=(lambda: PagedDocument.from_text(pasted),), daemon=True).start()
+        return "break"
+
+    def preview_file(self):
+        if not self.selected_file_path:
+            messagebox.showwarning("Warning", "Please select a file first.")
+            return
+        file_path = self.selected_file_path
+        self.status_var.set("Loading preview...")
+
+        def open_document():
+            # Extraction goes through the text cache; converting afterwards reuses it
+            return PagedDocument(self.text_cache.get_text_file(file_path, TextProcessor.process_file))
+
+        threading.Thread(target=self.load_document_thread, args=(open_document,), daemon=True).start()
+
+    def load_document_thread(self, open_document):
+        try:
+            document = open_document()
+        except Exception as e:
+            err_msg = str(e)
+            self.after(0, lambda: self.status_var.set(f"Could not load text: {err_msg}"))
+            return
+        self.after(0, lambda: self.show_document(document))
+
+    def show_document(self, document):
+        if self.is_converting:
+            # The conversion may still be reading the loaded document
+            document.close()
+            self.status_var.set("Finish or cancel the conversion before loading another document.")
+            return
+        if self.document:
+            self.document.close()
+        self.document = document
+        self.pager_frame.pack(fill=tk.X, pady=(0, 5), before=self.text_area)
+        self.notebook.select(self.tab_text)
+        self.show_page(0)
+        self.status_var.set(f"{len(document)} pages loaded. Conversion reads the whole document.")
+
+    def show_page(self, number):
+        if not self.document or not 0 <= number < len(self.document):
+            return
+        self.page_number = number
+        self.text_area.config(state="normal")
+        self.text_area.delete("1.0", tk.END)
+        self.text_area.insert("1.0", self.document.page(number))
+        self.text_area.config(state="disabled")
+        self.page_var.set(f"Page {number + 1} of {len(self.document)}")
+
+    def clear_document(self):
+        if self.document:
+            self.document.close()
+            self.document = None
+        self.pager_frame.pack_forget()
+        self.text_area.config(state="normal")
+        self.text_area.delete("1.0", tk.END)
+        self.status_var.set("")
+
+    def preview_voice(self):
+        # Speaks the selection (or the first sentence) right away, even while a conversion runs
+        try:
+            sample = self.text_area.get(tk.SEL_FIRST, tk.SEL_LAST)
+        except tk.TclError:
+            sample = self.text_area.get("1.0", "3.0")
+        if not sample.strip():
+            messagebox.showwarning("Warning", "Please enter some text.")
+            return
+        voice_shortname = self.voice_mapping.get(self.voice_combo.get(), "vi-VN-HoaiMyNeural")
+        threading.Thread(target=self.run_preview_thread, args=(sample, voice_shortname), daemon=True).start()
+
+    def run_preview_thread(self, sample, voice):
+        try:
+            audio = asyncio.run(self.tts_manager.preview(sample, voice))
+        except Exception as e:
+            err_msg = str(e)
+            self.after(0, lambda: self.status_var.set(f"Preview failed: {err_msg}"))
+            return
+        if FfplaySink.available():
+            sink = FfplaySink()
+            sink.write(audio)
+            sink.close()
+        else:
+            preview_path = os.path.join(self.tts_manager.output_dir, "preview.mp3")
+            with open(preview_path, "wb") as f:
+                f.write(audio)
+            os.startfile(preview_path)
+
     def toggle_conversion(self):
         if self.is_converting:
             self.cancel_conversion()
@@ -202,8 +353,12 @@ class App(tk.Tk):
         # Gather inputs on Main Thread (fast)
         raw_text = ""
         file_path = None
+        document = None
 
-        if self.notebook.index(self.notebook.select()) == 0:
+        if self.notebook.index(self.notebook.select()) == 0 and self.document:
+            # Read in the background thread; the widget only holds one page
+            document = self.document
+        elif self.notebook.index(self.notebook.select()) == 0:
             raw_text = self.text_area.get("1.0", tk.END).strip()
             if not raw_text:
                 messagebox.showwarning("Warning", "Please enter some text.")
@@ -221,27 +376,81 @@ class App(tk.Tk):
         self.btn_convert.config(text="Cancel Conversion")
         self.btn_play.config(state="disabled")
         self.btn_folder.config(state="disabled")
+        # The conversion thread reads the paged document: keep it open until done
+        self.btn_clear.config(state="disabled")
+        self.btn_preview.config(state="disabled")
         
         self.progress_frame.pack(fill=tk.X, pady=(0, 10), before=self.btn_convert.master)
         self.progress.start(10) # Bouncing bar
         self.status_var.set("Processing file...")
 
         voice_shortname = self.voice_mapping.get(self.voice_combo.get(), "vi-VN-HoaiMyNeural")
+        fmt = self.format_labels.get(self.format_combo.get(), DEFAULT_FORMAT)
+        play = self.play_while_converting.get()
+        split_chapters = bool(file_path) and self.split_chapters.get()
         
         # Move ALL logic to background thread to prevent freeze
-        threading.Thread(target=self.run_conversion_thread, args=(raw_text, file_path, voice_shortname)).start()
+        threading.Thread(
+            target=self.run_conversion_thread,
+            args=(raw_text, file_path, voice_shortname, fmt, play, document, split_chapters)
+        ).start()
 
     def cancel_conversion(self):
         if self.is_converting:
             self.status_var.set("Cancelling...")
             self.cancel_event.set()
+            self.stop_playback()
+
+    def stop_playback(self):
+        if self.playback:
+            self.playback.stop()
+            self.playback = None
+
+    def run_conversion_thread(self, raw_text, file_path, voice, fmt=DEFAULT_FORMAT, play=False, document=None,
+                              split_chapters=False):
+        if split_chapters:
+            try:
+                chapters = detect_chapters(file_path)
+            except Exception as e:
+                err_msg = str(e)
+                self.after(0, lambda: self.on_error(f"Error reading file: {err_msg}"))
+                return
+            if chapters:
+                self.run_chapter_conversion(chapters, file_path, voice, fmt)
+                return
+            # No chapter structure: convert as one file
 
-    def run_conversion_thread(self, raw_text, file_path, voice):
         # Step 1: Heavy Processing (Extract Text)
         text_to_convert = raw_text
-        if file_path:
+        chunks = None
+        if document:
+            try:
+                text_to_convert = document.text().strip()
+                chunks = plan_chunks(text_to_convert, CHUNK_MAX_BYTES)
+            except Exception as e:
+                err_msg = str(e)
+                self.after(0, lambda: self.on_error(f"Error reading text: {err_msg}"))
+                return
+        elif file_path and ingest.should_stream(file_path):
+            # Too large to extract at once: chunks are planned as the file is read
+            try:
+                chunks = TextProcessor.iter_chunks(file_path)
+                text_to_convert = next(chunks, "")
+                chunks = itertools.chain([text_to_convert], chunks)
+            except Exception as e:
+                err_msg = str(e)
+                self.after(0, lambda: self.on_error(f"Error reading file: {err_msg}"))
+                return
+        elif file_path:
             try:
-                text_to_convert = TextProcessor.process_file(file_path)
+                # Re-running the same file (e.g. with another voice) skips extraction
+                chunks = self.text_cache.get_chunks(
+                    file_path, CHUNK_MAX_BYTES, lambda path: TextProcessor.process_file(path, self.cancel_event)
+                )
+                text_to_convert = "\n".join(chunks)
+            except ConversionCancelled:
+                self.after(0, lambda: self.on_conversion_complete("cancelled", None))
+                return
             except Exception as e:
                 err_msg = str(e)
                 self.after(0, lambda: self.on_error(f"Error reading file: {err_msg}"))
@@ -256,19 +465,59 @@ class App(tk.Tk):
 
         # Step 2: Conversion
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = os.path.join(self.tts_manager.output_dir, f"speech_{timestamp}.mp3")
+        output_path = os.path.join(self.tts_manager.output_dir, f"speech_{timestamp}{extension_for(fmt)}")
+
+        on_audio = None
+        if play:
+            self.stop_playback()
+            self.playback = PlaybackPipeline(FfplaySink()).start()
+            on_audio = self.playback.feed
+            self.after(0, lambda: self.status_var.set("Generating audio (playing as it arrives)..."))
 
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         result = loop.run_until_complete(
-            self.tts_manager.convert(text_to_convert, voice, output_path, self.cancel_event)
+            self.tts_manager.convert(
+                text_to_convert, voice, output_path, self.cancel_event, fmt=fmt, on_audio=on_audio, chunks=chunks
+            )
         )
         loop.close()
+
+        if self.playback:
+            if result == "success":
+                self.playback.finish()
+            else:
+                self.stop_playback()
         
         self.after(0, lambda: self.on_conversion_complete(result, output_path))
 
+    def run_chapter_conversion(self, chapters, file_path, voice, fmt):
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_dir = os.path.join(self.tts_manager.output_dir, f"{base_name}_{timestamp}")
+        container_path = None
+        if fmt in CONTAINER_FORMATS:
+            container_path = os.path.join(output_dir, f"{base_name}{extension_for(fmt)}")
+        self.after(0, lambda: self.status_var.set(f"Generating audio for {len(chapters)} chapters..."))
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        result, written = loop.run_until_complete(
+            convert_chapters(self.tts_manager, chapters, voice, output_dir, fmt, self.cancel_event,
+                             container_path=container_path, title=base_name, on_chapter=self.on_chapter_started)
+        )
+        loop.close()
+
+        output_path = container_path if container_path and result == "success" else next(iter(written), None)
+        self.after(0, lambda: self.on_conversion_complete(result, output_path))
+
+    def on_chapter_started(self, number, total, title):
+        self.after(0, lambda: self.status_var.set(f"Generating chapter {number} of {total}: {title}"))
+
     def on_error(self, message):
         self.is_converting = False
+        self.btn_clear.config(state="normal")
+        self.btn_preview.config(state="normal")
         self.progress.stop()
         self.progress_frame.pack_forget()
         self.btn_convert.config(text="Convert to Audio")
@@ -277,6 +526,8 @@ class App(tk.Tk):
 
     def on_conversion_complete(self, result, output_path):
         self.is_converting = False
+        self.btn_clear.config(state="normal")
+        self.btn_preview.config(state="normal")
         self.progress.stop()
         self.progress_frame.pack_forget()
         self.btn_convert.config(text="Convert to Audio")
@@ -296,6 +547,7 @@ class App(tk.Tk):
             messagebox.showerror("Error", "Failed to convert text.")
 
     def play_audio(self):
+        self.stop_playback()
         if self.current_output_path and os.path.exists(self.current_output_path):
             os.startfile(self.current_output_path)
 
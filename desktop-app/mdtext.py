@@ -0,0 +1,194 @@
+"""
+Reduce Markdown to the prose worth reading aloud.
+
+A single line-oriented pass drops front matter, fenced and indented code,
+tables, HTML blocks, images, footnotes and link definitions, then strips
+inline markup. Paragraphs, headings and list items come out one per line so
+the chunker can break on them.
+
+Shared with web-app/api/mdtext.py; web-app/tests/test_shared_modules.py fails if the copies differ.
+"""
+import re
+import html
+from typing import Iterable, Iterator, List
+
+_FENCE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+_ATX_HEADING = re.compile(r'^ {0,3}#{1,6}(?:\s+|$)')
+_SETEXT_UNDERLINE = re.compile(r'^ {0,3}(=+|-+)\s*$')
+_THEMATIC_BREAK = re.compile(r'^ {0,3}([-*_])(\s*\1){2,}\s*$')
+_TABLE_DELIMITER = re.compile(r'^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$')
+_HTML_BLOCK = re.compile(r'^ {0,3}</?[A-Za-z][A-Za-z0-9-]*(\s|/?>|$)')
+_HTML_COMMENT = re.compile(r'^ {0,3}<!--')
+_FOOTNOTE_DEF = re.compile(r'^ {0,3}\[\^[^\]]+\]:')
+_LINK_DEF = re.compile(r'^ {0,3}\[[^\]]+\]:\s*\S')
+_BLOCKQUOTE = re.compile(r'^ {0,3}>\s?')
+_LIST_ITEM = re.compile(r'^\s*(?:[-*+]|\d{1,9}[.)])\s+(?:\[[ xX]\]\s+)?')
+
+_INLINE_RULES = [
+    (re.compile(r'!\[[^\]]*\](?:\([^)]*\)|\[[^\]]*\])'), ''),    # images
+    (re.compile(r'\[\^[^\]]+\]'), ''),                            # footnote references
+    (re.compile(r'\[([^\]]*)\]\([^)]*\)'), r'\1'),                # inline links
+    (re.compile(r'\[([^\]]*)\]\[[^\]]*\]'), r'\1'),               # reference links
+    (re.compile(r'<(?:https?|mailto):[^>]*>'), ''),              # autolinks
+    (re.compile(r'<!--.*?-->'), ''),
+    (re.compile(r'</?[A-Za-z][^>]*>'), ''),                       # inline HTML tags
+    (re.compile(r'https?://\S+'), ''),
+    (re.compile(r'`+([^`]*)`+'), r'\1'),
+    (re.compile(r'(\*\*|__)(.+?)\1'), r'\2'),
+    (re.compile(r'(?<!\w)([*_])(?!\s)(.+?)(?<!\s)\1(?!\w)'), r'\2'),
+    (re.compile(r'~~(.+?)~~'), r'\1'),
+    (re.compile(r'\\([\\`*_{}\[\]()#+\-.!|>~])'), r'\1'),         # backslash escapes
+]
+
+
+def _inline(text: str) -> str:
+    for pattern, replacement in _INLINE_RULES:
+        text = pattern.sub(replacement, text)
+    return html.unescape(text)
+
+
+# Front matter is only recognised if it closes within this many lines
+FRONT_MATTER_MAX_LINES = 200
+
+
+def _flush(pending: List[str]) -> Iterator[str]:
+    if pending:
+        text = re.sub(r'\s+', ' ', _inline(" ".join(pending))).strip()
+        pending.clear()
+        if text:
+            yield text
+
+
+def _without_front_matter(lines: Iterator[str]) -> Iterator[str]:
+    first = next(lines, None)
+    if first is None:
+        return
+    if first.strip() != "---":
+        yield first
+        yield from lines
+        return
+    held = [first]
+    for line in lines:
+        held.append(line)
+        if line.strip() in ("---", "..."):
+            # YAML front matter: drop it
+            yield from lines
+            return
+        if len(held) > FRONT_MATTER_MAX_LINES:
+            break
+    yield from held
+    yield from lines
+
+
+def markdown_to_speech(content: str) -> str:
+    return "\n".join(iter_speech_paragraphs(content.splitlines()))
+
+
+def iter_speech_paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    """Speakable paragraphs from Markdown lines, as they are read."""
+    pending: List[str] = []
+    fence = None
+    skipping = None  # 'table', 'html', 'comment' or 'footnote' while inside such a block
+    previous_blank = True
+    in_list = False
+
+    for line in _without_front_matter(iter(lines)):
+        line = line.rstrip("\r\n")
+        stripped = line.strip()
+
+        if fence:
+            closing = _FENCE.match(line)
+            if closing and closing.group(1)[0] == fence[0] and len(closing.group(1)) >= len(fence) \
+                    and not line.strip()[len(closing.group(1)):].strip():
+                fence = None
+            continue
+
+        if skipping == 'comment':
+            if '-->' in line:
+                skipping = None
+            continue
+        if skipping == 'table':
+            if stripped and '|' in stripped:
+                continue
+            skipping = None
+        if skipping in ('html', 'footnote'):
+            if not stripped:
+                skipping = None
+            elif skipping == 'html' or line[:1] in (' ', '\t'):
+                continue
+            else:
+                skipping = None
+
+        if not stripped:
+            yield from _flush(pending)
+            previous_blank = True
+            continue
+
+        opening = _FENCE.match(line)
+        if opening:
+            yield from _flush(pending)
+            fence = opening.group(1)
+            previous_blank = False
+            continue
+
+        # Indented code: starts after a blank line, outside a list
+        if previous_blank and not in_list and not pending and re.match(r'^( {4}|\t)', line):
+            continue
+
+        if _HTML_COMMENT.match(line):
+            yield from _flush(pending)
+            if '-->' not in line:
+                skipping = 'comment'
+            previous_blank = False
+            continue
+        if _HTML_BLOCK.match(line) and not pending:
+            skipping = 'html'
+            previous_blank = False
+            continue
+        if _FOOTNOTE_DEF.match(line) or (_LINK_DEF.match(line) and not pending):
+            yield from _flush(pending)
+            skipping = 'footnote'
+            previous_blank = False
+            continue
+
+        if _TABLE_DELIMITER.match(line) and '-' in line and pending and '|' in pending[-1]:
+            # The previous line was the header row
+            pending.pop()
+            yield from _flush(pending)
+            skipping = 'table'
+            previous_blank = False
+            continue
+
+        if pending and _SETEXT_UNDERLINE.match(line):
+            yield from _flush(pending)
+            previous_blank = False
+            continue
+        if _THEMATIC_BREAK.match(line):
+            yield from _flush(pending)
+            in_list = False
+            previous_blank = False
+            continue
+
+        if _ATX_HEADING.match(line):
+            yield from _flush(pending)
+            pending.append(re.sub(r'\s#+\s*$', '', re.sub(r'^ {0,3}#{1,6}', '', line)))
+            yield from _flush(pending)
+            in_list = False
+            previous_blank = False
+            continue
+
+        while _BLOCKQUOTE.match(line):
+            line = _BLOCKQUOTE.sub('', line, count=1)
+
+        item = _LIST_ITEM.match(line)
+        if item:
+            yield from _flush(pending)
+            in_list = True
+            line = line[item.end():]
+        elif previous_blank and line[:1] not in (' ', '\t'):
+            in_list = False
+
+        pending.append(line.strip())
+        previous_blank = False
+
+    yield from _flush(pending)
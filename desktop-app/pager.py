@@ -0,0 +1,93 @@
+"""
+Paged access to large extracted texts, so the UI only ever holds one page.
+
+The text lives in a UTF-8 file. Opening it records the byte offset where each
+page starts; reading a page then costs one seek and one small read,
+whatever the document's size. The file stays open until close(), so pages
+remain readable even if the text cache evicts the file meanwhile. Reads
+share that one handle, so they are serialized: the UI pages through the
+document while a conversion thread reads all of it.
+"""
+import os
+import tempfile
+import threading
+from typing import Iterator, List, Optional
+
+PAGE_BYTES = 8 * 1024
+
+
+def _page_end(block: bytes, at_eof: bool) -> int:
+    """Where to cut a page-sized block: the last newline, else space, else a UTF-8 character boundary."""
+    if at_eof:
+        return len(block)
+    # Spaces and newlines never occur inside a multi-byte UTF-8 sequence
+    for separator in (b"\n", b" "):
+        cut = block.rfind(separator, len(block) // 2)
+        if cut != -1:
+            return cut + 1
+    cut = len(block)
+    while cut > 0 and (block[cut - 1] & 0xC0) == 0x80:
+        cut -= 1
+    # Step back over the lead byte of a sequence cut short
+    if cut > 0 and block[cut - 1] >= 0xC0:
+        cut -= 1
+    return cut or len(block)
+
+
+class PagedDocument:
+    def __init__(self, path: str, page_bytes: int = PAGE_BYTES, owned: bool = False):
+        self.path = path
+        self.page_bytes = page_bytes
+        self.owned = owned
+        self._lock = threading.Lock()
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.offsets = self._index()
+
+    @classmethod
+    def from_text(cls, text: str, directory: Optional[str] = None, page_bytes: int = PAGE_BYTES) -> "PagedDocument":
+        """Spool text (e.g. a large paste) to a temporary file the document owns."""
+        fd, path = tempfile.mkstemp(prefix="lito-", suffix=".txt", dir=directory)
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        return cls(path, page_bytes, owned=True)
+
+    def _index(self) -> List[int]:
+        offsets = [0]
+        while offsets[-1] < self.size:
+            self._file.seek(offsets[-1])
+            block = self._file.read(self.page_bytes)
+            at_eof = offsets[-1] + len(block) >= self.size
+            offsets.append(offsets[-1] + _page_end(block, at_eof))
+        return offsets
+
+    def __len__(self) -> int:
+        return max(1, len(self.offsets) - 1)
+
+    def page(self, number: int) -> str:
+        if not 0 <= number < len(self):
+            raise IndexError(number)
+        if self.size == 0:
+            return ""
+        start, end = self.offsets[number], self.offsets[number + 1]
+        with self._lock:
+            self._file.seek(start)
+            return self._file.read(end - start).decode("utf-8", errors="replace")
+
+    def pages(self) -> Iterator[str]:
+        for number in range(len(self)):
+            yield self.page(number)
+
+    def text(self) -> str:
+        with self._lock:
+            self._file.seek(0)
+            return self._file.read(self.size).decode("utf-8", errors="replace")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+        if self.owned:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,185 @@
+"""
+Progressive playback: start hearing a conversion while it is still running.
+
+Synthesized chunks are appended to a spool file as they arrive. A reader
+thread moves them into a bounded in-memory jitter buffer, and a player thread
+drains that buffer into an AudioSink at playback pace.
+"""
+import os
+import abc
+import queue
+import shutil
+import tempfile
+import threading
+import subprocess
+from typing import Optional
+
+BLOCK_SIZE = 16 * 1024
+
+
+class AudioSink(abc.ABC):
+    @abc.abstractmethod
+    def write(self, data: bytes):
+        """Play data; may block at playback pace."""
+
+    def close(self):
+        """Called once all audio has been written."""
+
+    def abort(self):
+        """Stop immediately, dropping anything not yet played."""
+        self.close()
+
+
+class NullSink(AudioSink):
+    """Discards audio; for headless runs and tests."""
+
+    def __init__(self):
+        self.bytes_written = 0
+        self.closed = False
+
+    def write(self, data: bytes):
+        self.bytes_written += len(data)
+
+    def close(self):
+        self.closed = True
+
+
+class FileSink(AudioSink):
+    def __init__(self, path: str):
+        self._file = open(path, "wb")
+
+    def write(self, data: bytes):
+        self._file.write(data)
+
+    def close(self):
+        self._file.close()
+
+
+class FfplaySink(AudioSink):
+    """Plays MP3 from stdin through ffplay; writes block at playback pace."""
+
+    def __init__(self):
+        flags = subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
+        self.process = subprocess.Popen(
+            [shutil.which("ffplay"), "-nodisp", "-autoexit", "-loglevel", "quiet", "-i", "pipe:0"],
+            stdin=subprocess.PIPE, creationflags=flags,
+        )
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("ffplay") is not None
+
+    def write(self, data: bytes):
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+    def abort(self):
+        if self.process.poll() is None:
+            self.process.kill()
+
+
+def default_sink() -> Optional[AudioSink]:
+    return FfplaySink() if FfplaySink.available() else None
+
+
+class PlaybackPipeline:
+    def __init__(self, sink: AudioSink, prebuffer_bytes: int = 32 * 1024, max_buffered_blocks: int = 16):
+        self.sink = sink
+        self.prebuffer_bytes = prebuffer_bytes
+        self.underruns = 0
+
+        self._spool = tempfile.TemporaryFile()
+        self._spooled = 0
+        self._finished = False
+        self._stopped = threading.Event()
+        self._cond = threading.Condition()
+        self._buffer = queue.Queue(maxsize=max_buffered_blocks)
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._player = threading.Thread(target=self._play_loop, daemon=True)
+        self.first_audio = threading.Event()
+
+    def start(self):
+        self._reader.start()
+        self._player.start()
+        return self
+
+    def feed(self, data: bytes):
+        """Append synthesized audio. Never blocks on playback."""
+        with self._cond:
+            if self._spool.closed:
+                return
+            self._spool.seek(0, os.SEEK_END)
+            self._spool.write(data)
+            self._spooled += len(data)
+            self._cond.notify_all()
+
+    def finish(self):
+        """No more audio is coming; play out what is buffered."""
+        with self._cond:
+            self._finished = True
+            self._cond.notify_all()
+
+    def stop(self):
+        """Abort playback now."""
+        self._stopped.set()
+        self.finish()
+        self.sink.abort()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        self._player.join(timeout)
+        return not self._player.is_alive()
+
+    def _read_loop(self):
+        position = 0
+        while not self._stopped.is_set():
+            with self._cond:
+                # Hold back until a prebuffer is available, unless that is all there will be
+                needed = self.prebuffer_bytes if position == 0 else 1
+                while (self._spooled - position < needed and not self._finished
+                       and not self._stopped.is_set()):
+                    self._cond.wait()
+                if self._spooled == position and self._finished:
+                    break
+                self._spool.seek(position)
+                block = self._spool.read(min(BLOCK_SIZE, self._spooled - position))
+            position += len(block)
+            self._put(block)
+        self._put(None)
+        with self._cond:
+            self._spool.close()
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._buffer.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _play_loop(self):
+        starved = False
+        try:
+            while not self._stopped.is_set():
+                try:
+                    block = self._buffer.get(timeout=0.1)
+                except queue.Empty:
+                    # Synthesis fell behind playback after audio had started
+                    if self.first_audio.is_set() and not starved:
+                        self.underruns += 1
+                        starved = True
+                    continue
+                starved = False
+                if block is None:
+                    self.sink.close()
+                    return
+                self.sink.write(block)
+                self.first_audio.set()
+        except OSError:
+            # Player process went away (window closed, stopped)
+            self._stopped.set()
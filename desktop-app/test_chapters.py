@@ -0,0 +1,116 @@
+import io
+import os
+import struct
+import asyncio
+import zipfile
+from pypdf import PdfWriter
+from chapters import Chapter, Mp3Duration, chapter_tag, convert_chapters, detect_chapters
+from test_pdf_backends import make_pdf
+
+# MPEG-2 layer III, 48 kbps, 24 kHz mono (what edge-tts sends): 144 bytes, 24 ms
+FRAME = bytes([0xFF, 0xF3, 0x64, 0xC4]) + bytes(140)
+
+def test_markdown_splits_at_top_level_headings(tmp_path):
+    path = tmp_path / "book.md"
+    path.write_text("Preface line.\n\n# One\n\nFirst.\n\n```\n# not a heading\n```\n\n## Section\n\nMore.\n\n# Two\n\nSecond.\n",
+                    encoding="utf-8")
+    chapters = detect_chapters(str(path))
+    assert [c.title for c in chapters] == ["One", "Two"]
+    assert chapters[0].text.startswith("Preface line.\nOne\nFirst.")
+    assert "Section\nMore." in chapters[0].text
+    assert chapters[1].text == "Two\nSecond."
+
+def test_pdf_chapters_follow_the_outline(tmp_path):
+    writer = PdfWriter(clone_from=io.BytesIO(make_pdf(["Cover.", "Alpha starts.", "Alpha ends.", "Beta."])))
+    writer.add_outline_item("Alpha", 1)
+    writer.add_outline_item("Beta", 3)
+    path = tmp_path / "book.pdf"
+    with open(path, "wb") as f:
+        writer.write(f)
+    chapters = detect_chapters(str(path))
+    assert [(c.title, c.text) for c in chapters] == [("Alpha", "Cover. Alpha starts. Alpha ends."), ("Beta", "Beta.")]
+
+def test_epub_chapters_follow_the_nav_toc(tmp_path):
+    path = tmp_path / "book.epub"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("META-INF/container.xml", (
+            '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+            '<rootfile full-path="OPS/book.opf"/></rootfiles></container>'
+        ))
+        names = ["cover", "one", "one-b", "two"]
+        items = "".join(f'<item id="{n}" href="{n}.xhtml" media-type="application/xhtml+xml"/>' for n in names)
+        archive.writestr("OPS/book.opf", (
+            '<package xmlns="http://www.idpf.org/2007/opf"><manifest>'
+            f'{items}<item id="nav" href="nav.xhtml" properties="nav" media-type="application/xhtml+xml"/>'
+            '</manifest><spine>' + "".join(f'<itemref idref="{n}"/>' for n in names) + '</spine></package>'
+        ))
+        archive.writestr("OPS/nav.xhtml", (
+            '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops"><body>'
+            '<nav epub:type="toc"><ol><li><a href="one.xhtml">Chapter One</a>'
+            '<ol><li><a href="one.xhtml#s1">Section</a></li></ol></li>'
+            '<li><a href="two.xhtml#top">Chapter Two</a></li></ol></nav></body></html>'
+        ))
+        for name in names:
+            archive.writestr(f"OPS/{name}.xhtml", f"<html><body><p>Text of {name}.</p></body></html>")
+    chapters = detect_chapters(str(path))
+    assert [(c.title, c.text) for c in chapters] == [
+        ("Chapter One", "Text of cover.\nText of one.\nText of one-b."),
+        ("Chapter Two", "Text of two."),
+    ]
+
+def test_duration_counts_frames_across_pieces_and_tags():
+    stream = b"ID3\x03\x00\x00\x00\x00\x00\x05" + bytes(5) + FRAME * 100
+    duration = Mp3Duration()
+    for start in range(0, len(stream), 97):
+        duration.feed(stream[start:start + 97])
+    assert round(duration.seconds, 3) == 2.4
+
+def test_chapter_tag_lists_chapters_in_order():
+    tag = chapter_tag("Book", [("Một", 1.5), ("Two", 2.0)])
+    assert tag.startswith(b"ID3\x03") and tag.count(b"CHAP") == 2
+    # Second CHAP frame: 10-byte header, then "chp1\0", then start and end in ms
+    body = tag.rindex(b"CHAP") + 10
+    assert tag[body:body + 5] == b"chp1\x00"
+    start_ms, end_ms = struct.unpack(">II", tag[body + 5:body + 13])
+    assert (start_ms, end_ms) == (1500, 3500)
+    assert "Một".encode("utf-16-le") in tag
+
+def test_long_books_get_nested_tables_of_contents():
+    tag = chapter_tag("Book", [(f"Part {n}", 1.0) for n in range(300)])
+    assert tag.count(b"CHAP") == 300 and tag.count(b"CTOC") == 3
+    # Top level lists the two nested CTOCs, which split the chapters 255 + 45
+    top = tag.index(b"CTOC") + 10
+    assert tag[top:top + 16] == b"toc\x00\x03\x02toc0\x00toc1\x00"
+    second = tag.index(b"toc1\x00\x01")
+    assert tag[second - 10:second - 6] == b"CTOC" and tag[second + 6] == 45
+
+class FakeManager:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def convert(self, text, voice, output_path, cancel_event=None, fmt="mp3", on_audio=None):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        audio = FRAME * len(text)
+        with open(output_path, "wb") as f:
+            f.write(audio)
+        on_audio(audio)
+        self.running -= 1
+        return "success"
+
+def test_convert_chapters_writes_files_and_chaptered_mp3(tmp_path):
+    manager = FakeManager()
+    chapters = [Chapter("One: start", "a" * 10), Chapter("Two", "b" * 20), Chapter("Three", "c" * 5)]
+    container = tmp_path / "out" / "book.mp3"
+    started = []
+    result, written = asyncio.run(convert_chapters(manager, chapters, "voice", str(tmp_path / "out"),
+                                                   container_path=str(container), title="book",
+                                                   on_chapter=lambda *args: started.append(args)))
+    assert result == "success" and manager.peak == 2
+    assert sorted(started) == [(1, 3, "One: start"), (2, 3, "Two"), (3, 3, "Three")]
+    assert [os.path.basename(p) for p in written] == ["01 - One_ start.mp3", "02 - Two.mp3", "03 - Three.mp3"]
+    data = container.read_bytes()
+    assert data.endswith(FRAME * 35)
+    assert data.count(b"CHAP") == 3
@@ -0,0 +1,24 @@
+from chunking import plan_chunks, split_sentences, utf8_len
+
+def test_split_sentences_cjk():
+    text = "这是第一句。这是第二句！这是第三句？"
+    assert split_sentences(text) == ["这是第一句。", "这是第二句！", "这是第三句？"]
+
+def test_split_sentences_keeps_decimals():
+    assert split_sentences("Pi is 3.14 today. Next.") == ["Pi is 3.14 today. ", "Next."]
+
+def test_chunks_respect_byte_limit():
+    text = "Xin chào, đây là ví dụ về chuyển đổi văn bản thành giọng nói. " * 50
+    chunks = plan_chunks(text, 500)
+    assert all(utf8_len(c) <= 500 for c in chunks)
+    assert "".join(chunks).replace(" ", "") == text.replace(" ", "")
+
+def test_chunks_are_evenly_sized():
+    text = "日本語の文章です。" * 300
+    sizes = [utf8_len(c) for c in plan_chunks(text, 1000)]
+    assert max(sizes) - min(sizes) <= utf8_len("日本語の文章です。")
+
+def test_oversized_sentence_without_punctuation():
+    chunks = plan_chunks("字" * 1000, 300)
+    assert all(utf8_len(c) <= 300 for c in chunks)
+    assert "".join(chunks) == "字" * 1000
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from concurrency import AIMDController, is_throttle_error
+
+class Throttled(Exception):
+    status = 429
+
+def test_limit_grows_while_healthy():
+    controller = AIMDController(initial=2, maximum=8)
+
+    async def run():
+        for _ in range(20):
+            async with controller.slot():
+                await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert controller.limit > 2
+
+def test_limit_halves_on_throttle():
+    controller = AIMDController(initial=8)
+
+    async def run():
+        with pytest.raises(Throttled):
+            async with controller.slot():
+                raise Throttled()
+
+    asyncio.run(run())
+    assert controller.limit == 4
+
+def test_in_flight_never_exceeds_limit():
+    controller = AIMDController(initial=3, maximum=3)
+    peak = 0
+
+    async def worker():
+        nonlocal peak
+        async with controller.slot():
+            peak = max(peak, controller.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(worker() for _ in range(12)))
+
+    asyncio.run(run())
+    assert peak == 3
+    assert controller.in_flight == 0
+
+def test_cancelled_waiter_does_not_leak_slot():
+    controller = AIMDController(initial=1, maximum=1)
+
+    async def run():
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        controller._release()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert controller.in_flight == 0
+
+    asyncio.run(run())
+
+def test_is_throttle_error():
+    assert is_throttle_error(asyncio.TimeoutError())
+    assert is_throttle_error(Throttled())
+    assert not is_throttle_error(ValueError())
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import distributed
+from distributed import ChunkQueue, ChunkWorker, Coordinator
+
+class FakeManager:
+    def __init__(self, fail=False):
+        self.synthesized = []
+        self.fail = fail
+
+    async def synthesize(self, text, voice, priority="normal"):
+        await asyncio.sleep(0.001)
+        if self.fail:
+            raise ConnectionError("upstream down")
+        self.synthesized.append(text)
+        return f"[{text}]".encode("utf-8")
+
+def write_doc(tmp_path, name, paragraphs):
+    path = tmp_path / name
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    return str(path)
+
+def test_workers_share_the_queue_and_coordinator_stitches_in_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(distributed.TextProcessor, "iter_chunks", lambda path: iter(open(path).read().split("\n\n")))
+    queue_dir = str(tmp_path / "queue")
+    paragraphs = [f"Paragraph {n}." for n in range(40)]
+    coordinator = Coordinator(queue_dir)
+    doc_id = coordinator.publish(write_doc(tmp_path, "book.txt", paragraphs), "voice", str(tmp_path / "book.mp3"))
+    managers = [FakeManager(), FakeManager()]
+    workers = [ChunkWorker(queue_dir, manager, concurrency=4) for manager in managers]
+
+    async def run():
+        await asyncio.gather(*(w.run(drain=True) for w in workers))
+        return await coordinator.wait([doc_id], poll_interval=0.01)
+
+    assert asyncio.run(run()) == {doc_id: "done"}
+    assert all(m.synthesized for m in managers)
+    assert sorted(managers[0].synthesized + managers[1].synthesized) == sorted(paragraphs)
+    assert (tmp_path / "book.mp3").read_bytes() == "".join(f"[{p}]" for p in paragraphs).encode("utf-8")
+    # Publishing the same document again queues nothing
+    assert coordinator.publish(str(tmp_path / "book.txt"), "voice", str(tmp_path / "book.mp3")) == doc_id
+    assert coordinator.queue.counts() == {"done": 40}
+
+def test_expired_leases_are_redelivered_and_completions_are_idempotent(tmp_path):
+    queue = ChunkQueue(str(tmp_path / "queue.sqlite"))
+    queue.publish("doc", "src", ["one", "two"], "voice", "mp3", "out.mp3")
+    first = queue.lease(2, lease_seconds=0.01)
+    assert queue.lease(2) == []
+    time.sleep(0.02)
+    again = queue.lease(2)
+    assert sorted(again) == sorted(first)
+    for doc_id, seq, _, _ in first + again:
+        queue.complete(doc_id, seq)
+    assert queue.counts() == {"done": 2}
+    assert [d["id"] for d in queue.ready()] == ["doc"]
+
+def test_document_fails_after_repeated_synthesis_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(distributed.TextProcessor, "iter_chunks", lambda path: iter(["only chunk"]))
+    queue_dir = str(tmp_path / "queue")
+    coordinator = Coordinator(queue_dir)
+    doc_id = coordinator.publish(write_doc(tmp_path, "a.txt", ["x"]), "voice", str(tmp_path / "a.mp3"))
+    asyncio.run(ChunkWorker(queue_dir, FakeManager(fail=True)).run(drain=True))
+    assert coordinator.queue.status(doc_id) == "failed"
+    assert coordinator.queue.counts() == {"failed": 1}
+
+def test_publish_commits_in_batches_and_skips_failed_documents(tmp_path, monkeypatch):
+    monkeypatch.setattr(distributed, "PUBLISH_BATCH", 2)
+    path = str(tmp_path / "queue.sqlite")
+    queue, other_node = ChunkQueue(path), ChunkQueue(path)
+
+    def chunks():
+        for n in range(5):
+            # Extraction runs between transactions: another node can still use the queue
+            assert other_node.lease(1) == []
+            yield f"chunk {n}"
+
+    assert queue.publish("doc", "src", chunks(), "voice", "mp3", "out.mp3")
+    assert not queue.publish("doc", "src", iter(["again"]), "voice", "mp3", "out.mp3")
+    assert queue.counts() == {"queued": 5}
+
+    queue.set_status("doc", "failed")
+    assert queue.lease(5) == []
+
+def test_worker_survives_a_locked_queue(tmp_path, monkeypatch):
+    import sqlite3
+    queue_dir = str(tmp_path / "queue")
+    coordinator = Coordinator(queue_dir)
+    coordinator.queue.publish("doc", "src", ["one", "two"], "voice", "mp3", str(tmp_path / "out.mp3"))
+    worker = ChunkWorker(queue_dir, FakeManager())
+    lease = worker.queue.lease
+    failures = [sqlite3.OperationalError("database is locked")]
+
+    def flaky_lease(*args):
+        if failures:
+            raise failures.pop()
+        return lease(*args)
+
+    monkeypatch.setattr(worker.queue, "lease", flaky_lease)
+    asyncio.run(worker.run(drain=True, poll_interval=0.01))
+    assert worker.completed == 2
@@ -0,0 +1,70 @@
+import documents
+import zipfile
+from documents import iter_docx_paragraphs, iter_epub_chapters, iter_html
+from logic import TextProcessor
+
+def make_epub(path, chapters):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("mimetype", "application/epub+zip")
+        archive.writestr("META-INF/container.xml", (
+            '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container" version="1.0"><rootfiles>'
+            '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            '</rootfiles></container>'
+        ))
+        # Listed in reverse: the spine, not the manifest, gives the reading order
+        items = "".join(f'<item id="c{n}" href="text/ch%20{n}.xhtml" media-type="application/xhtml+xml"/>'
+                        for n in reversed(range(len(chapters))))
+        spine = "".join(f'<itemref idref="c{n}"/>' for n in range(len(chapters)))
+        archive.writestr("OEBPS/content.opf", (
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+            f'<manifest>{items}<item id="notes" href="notes.xhtml" media-type="application/xhtml+xml"/></manifest>'
+            f'<spine>{spine}<itemref idref="notes" linear="no"/></spine></package>'
+        ))
+        for n, body in enumerate(chapters):
+            archive.writestr(f"OEBPS/text/ch {n}.xhtml", f"<html><head><title>skip</title></head><body>{body}</body></html>")
+        archive.writestr("OEBPS/notes.xhtml", "<p>Footnote</p>")
+
+def test_html_paragraphs_across_feed_boundaries():
+    html = "<h1>Title</h1><p>First &amp; <b>bold</b>\n line.</p><script>skip()</script><ul><li>One</li><li>Two</li></ul>"
+    blocks = [html[i:i + 7] for i in range(0, len(html), 7)]
+    assert list(iter_html(blocks)) == ["Title", "First & bold line.", "One", "Two"]
+
+def test_epub_chapters_in_spine_order(tmp_path):
+    path = tmp_path / "book.epub"
+    make_epub(path, [f"<p>Chapter {n} opens.</p><p>It ends.</p>" for n in range(6)])
+    chapters = list(iter_epub_chapters(str(path), workers=2))
+    assert [name for name, _ in chapters] == [f"OEBPS/text/ch {n}.xhtml" for n in range(6)]
+    assert chapters[3][1] == ["Chapter 3 opens.", "It ends."]
+
+def test_docx_paragraphs(tmp_path):
+    w = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    body = ('<w:p><w:r><w:t>Hello</w:t></w:r><w:r><w:tab/><w:t xml:space="preserve">world </w:t></w:r></w:p>'
+            '<w:p></w:p><w:tbl><w:tr><w:tc><w:p><w:r><w:t>Cell</w:t></w:r></w:p></w:tc></w:tr></w:tbl>')
+    path = tmp_path / "doc.docx"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f'<w:document {w}><w:body>{body}</w:body></w:document>')
+    assert list(iter_docx_paragraphs(str(path))) == ["Hello world", "Cell"]
+
+def test_docx_paragraphs_are_dropped_once_read(tmp_path, monkeypatch):
+    w = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    body = "".join(f"<w:p><w:r><w:t>Paragraph {n}</w:t></w:r></w:p>" for n in range(1000))
+    path = tmp_path / "doc.docx"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f'<w:document {w}><w:body>{body}</w:body></w:document>')
+    parsers = []
+    iterparse = documents.ET.iterparse
+
+    def recording_iterparse(*args, **kwargs):
+        parsers.append(iterparse(*args, **kwargs))
+        return parsers[-1]
+
+    monkeypatch.setattr(documents.ET, "iterparse", recording_iterparse)
+    assert len(list(iter_docx_paragraphs(str(path)))) == 1000
+    # Only the document and its body are left in the tree
+    assert len(list(parsers[0].root.iter())) == 2
+
+def test_process_file_and_chunks_for_new_formats(tmp_path):
+    page = tmp_path / "page.html"
+    page.write_text("<p>Xin chào.</p><p>Tạm biệt.</p>", encoding="utf-8")
+    assert TextProcessor.process_file(str(page)) == "Xin chào.\nTạm biệt."
+    assert list(TextProcessor.iter_chunks(str(page), 200)) == ["Xin chào.\nTạm biệt."]
@@ -0,0 +1,26 @@
+import asyncio
+import pytest
+import formats
+
+def test_available_formats_without_ffmpeg(mocker):
+    mocker.patch.object(formats, "ffmpeg_path", return_value=None)
+    assert formats.available_formats() == ["mp3"]
+
+def test_mp3_passthrough(tmp_path):
+    output = tmp_path / "out.mp3"
+
+    async def run():
+        encoder = await formats.open_encoder("mp3", str(output))
+        await encoder.write(b"abc")
+        await encoder.close()
+
+    asyncio.run(run())
+    assert output.read_bytes() == b"abc"
+
+def test_opus_requires_ffmpeg(tmp_path, mocker):
+    mocker.patch.object(formats, "ffmpeg_path", return_value=None)
+    with pytest.raises(RuntimeError):
+        asyncio.run(formats.open_encoder("opus", str(tmp_path / "out.ogg")))
+
+def test_replace_extension():
+    assert formats.replace_extension("speech.mp3", "opus") == "speech.ogg"
@@ -0,0 +1,116 @@
+import os
+import asyncio
+import threading
+import aiohttp
+import pytest
+import logic
+import gateway
+from gateway import Gateway, GatewayError, GatewayManager, connect_manager
+from logic import TTSManager
+
+class CountingCommunicate:
+    calls = []
+
+    def __init__(self, text, voice):
+        self.text = text
+
+    async def stream(self):
+        CountingCommunicate.calls.append(self.text)
+        if "fail" in self.text:
+            raise ConnectionError("upstream down")
+        yield {"type": "audio", "data": f"[{self.text}]".encode("utf-8")}
+
+@pytest.fixture
+def upstream(monkeypatch):
+    CountingCommunicate.calls = []
+    monkeypatch.setattr(logic.edge_tts, "Communicate", CountingCommunicate)
+    return CountingCommunicate.calls
+
+def test_clients_share_the_daemon_cache(tmp_path, upstream):
+    address = str(tmp_path / "gw.sock")
+    server = Gateway(TTSManager())
+    output = tmp_path / "out.mp3"
+    text = "One sentence here. Another one here."
+
+    async def run():
+        await server.start(address)
+        try:
+            assert isinstance(connect_manager(address), GatewayManager)
+            first = await GatewayManager(address).convert(text, "voice", str(output))
+            # A second client run: every chunk comes from the daemon's cache
+            again = await GatewayManager(address).synthesize(text, "voice")
+            headers = {gateway.TOKEN_HEADER: gateway.read_token(address)}
+            async with aiohttp.ClientSession(connector=aiohttp.UnixConnector(path=address), headers=headers) as session:
+                async with session.get("http://lito/health") as response:
+                    return first, again, await response.json()
+        finally:
+            await server.stop()
+
+    first, again, health = asyncio.run(run())
+    assert first == "success"
+    assert output.read_bytes() == again == f"[{text}]".encode("utf-8")
+    assert upstream == [text]
+    assert health["cache"]["hits"] == 1 and health["requests"] == 2
+
+def test_errors_and_bad_requests(tmp_path, upstream):
+    address = str(tmp_path / "gw.sock")
+    server = Gateway(TTSManager())
+
+    async def run():
+        await server.start(address)
+        try:
+            with pytest.raises(GatewayError, match="upstream down"):
+                await GatewayManager(address).synthesize("please fail", "voice")
+            async with aiohttp.ClientSession(connector=aiohttp.UnixConnector(path=address)) as session:
+                # Other local users cannot read the token file
+                assert os.stat(gateway.token_path(address)).st_mode & 0o077 == 0
+                async with session.get("http://lito/health") as response:
+                    assert response.status == 401
+                async with session.get("http://lito/health", headers={gateway.TOKEN_HEADER: "guess"}) as response:
+                    assert response.status == 401
+                session.headers[gateway.TOKEN_HEADER] = gateway.read_token(address)
+                async with session.post("http://lito/synthesize", json={"text": "hi", "voice": "v", "priority": "urgent"}) as response:
+                    assert response.status == 400
+                async with session.post("http://lito/synthesize", json=["hi"]) as response:
+                    assert response.status == 400
+            # A second daemon on the same socket refuses to start
+            with pytest.raises(RuntimeError):
+                await Gateway(TTSManager()).start(address)
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
+
+def test_falls_back_to_in_process_synthesis(tmp_path, upstream, monkeypatch):
+    address = str(tmp_path / "gw.sock")
+    monkeypatch.setenv(gateway.GATEWAY_ENV, address)
+    assert type(connect_manager()) is TTSManager
+    monkeypatch.setenv(gateway.GATEWAY_ENV, "off")
+    assert type(connect_manager()) is TTSManager
+
+    # The daemon went away after the client connected
+    assert asyncio.run(GatewayManager(address).synthesize("Hello.", "voice")) == b"[Hello.]"
+    assert upstream == ["Hello."]
+
+def test_client_shares_one_session_across_event_loops(tmp_path, upstream):
+    address = str(tmp_path / "gw.sock")
+    server = Gateway(TTSManager())
+    server_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=server_loop.run_forever)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(server.start(address), server_loop).result(5)
+    client = GatewayManager(address)
+    try:
+        # The desktop app runs each conversion on an event loop of its own
+        assert asyncio.run(client.synthesize("First.", "voice")) == b"[First.]"
+        session = client._client
+        assert asyncio.run(client.synthesize("Second.", "voice")) == b"[Second.]"
+        assert client._client is session and not session.closed
+    finally:
+        client.close()
+        asyncio.run_coroutine_threadsafe(server.stop(), server_loop).result(5)
+        server_loop.call_soon_threadsafe(server_loop.stop)
+        thread.join(5)
+        server_loop.close()
+    assert session.closed and client._client is None
+    assert not os.path.exists(gateway.token_path(address))
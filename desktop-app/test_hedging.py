@@ -0,0 +1,62 @@
+import time
+import asyncio
+import pytest
+from hedging import HedgeBudget, Hedger, LatencyTracker
+
+def warmed_tracker(seconds=0.01):
+    tracker = LatencyTracker(min_samples=5)
+    for _ in range(5):
+        tracker.record(seconds)
+    return tracker
+
+def make_call(delays, log):
+    """Each call takes the next delay; None fails."""
+    async def call():
+        n = len(log)
+        log.append(n)
+        if delays[n] is None:
+            raise ConnectionError(f"call {n}")
+        try:
+            await asyncio.sleep(delays[n])
+        except asyncio.CancelledError:
+            log.append(f"cancelled {n}")
+            raise
+        return f"audio {n}"
+    return call
+
+def test_slow_call_is_hedged_and_loser_cancelled():
+    hedger = Hedger(enabled=True, fraction=1.0, min_delay=0.01, tracker=warmed_tracker())
+    log = []
+    started = time.monotonic()
+    assert asyncio.run(hedger.run(make_call([5, 0.01], log))) == "audio 1"
+    assert time.monotonic() - started < 1
+    assert "cancelled 0" in log
+    assert (hedger.hedges, hedger.hedge_wins) == (1, 1)
+
+def test_no_hedge_without_budget_or_history():
+    log = []
+    no_budget = Hedger(enabled=True, fraction=0.0, min_delay=0.01, tracker=warmed_tracker())
+    assert asyncio.run(no_budget.run(make_call([0.1], log))) == "audio 0"
+    cold = Hedger(enabled=True, fraction=1.0, min_delay=0.01)
+    log = []
+    assert asyncio.run(cold.run(make_call([0.1], log))) == "audio 0"
+    assert no_budget.hedges == cold.hedges == 0
+
+def test_hedge_budget_caps_duplicates():
+    budget = HedgeBudget(fraction=0.25)
+    spent = 0
+    for _ in range(100):
+        budget.earn()
+        spent += budget.spend()
+    assert spent == 25
+
+def test_error_from_one_attempt_waits_for_the_other():
+    hedger = Hedger(enabled=True, fraction=1.0, min_delay=0.01, tracker=warmed_tracker())
+    assert asyncio.run(hedger.run(make_call([0.05, None], []))) == "audio 0"
+    with pytest.raises(ConnectionError):
+        asyncio.run(hedger.run(make_call([None], [])))
+
+def test_disabled_hedger_passes_through():
+    hedger = Hedger(enabled=False)
+    assert asyncio.run(hedger.run(make_call([0], []))) == "audio 0"
+    assert hedger.stats()["calls"] == 0
@@ -0,0 +1,58 @@
+import ingest
+from ingest import iter_lines, iter_paragraphs, plan_stream, sniff_encoding
+
+def test_sniffs_boms_utf8_and_legacy_encodings():
+    assert sniff_encoding("﻿Xin chào".encode("utf-8")) == "utf-8-sig"
+    assert sniff_encoding("Xin chào".encode("utf-16")) == "utf-16"
+    assert sniff_encoding("plain ascii text".encode("utf-16-le")) == "utf-16-le"
+    assert sniff_encoding("Tiếng Việt".encode("utf-8")) == "utf-8"
+    # Cut inside a multi-byte character is still UTF-8
+    assert sniff_encoding("Tiếng".encode("utf-8")[:4]) == "utf-8"
+    assert sniff_encoding("café crème".encode("cp1252")) == "cp1252"
+    # Western text using the bytes cp1258 reads as ă, ơ and tone marks
+    assert sniff_encoding("Não sei, è così più però õ".encode("cp1252")) == "cp1252"
+    # cp1258 writes tones as combining marks after the (possibly accented) vowel
+    assert sniff_encoding("Tiê\u0301ng Viê\u0323t ơ\u0300i".encode("cp1258")) == "cp1258"
+
+def test_lines_survive_block_boundaries(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "BLOCK_SIZE", 7)
+    path = tmp_path / "doc.txt"
+    lines = ["Tiếng Việt có dấu", "", "second\r", "ệệệ"]
+    path.write_bytes("\n".join(lines).encode("utf-8"))
+    assert list(iter_lines(str(path))) == ["Tiếng Việt có dấu", "", "second", "ệệệ"]
+
+def test_paragraphs_for_text_and_markdown(tmp_path):
+    txt = tmp_path / "doc.txt"
+    txt.write_text("Hard wrapped\nline one.\n\n\nNext   paragraph.\n", encoding="cp1252")
+    assert list(iter_paragraphs(str(txt))) == ["Hard wrapped line one.", "Next paragraph."]
+
+    md = tmp_path / "doc.md"
+    md.write_text("# Title\n\n```\ncode\n```\nBody *text*.\n", encoding="utf-8")
+    assert list(iter_paragraphs(str(md))) == ["Title", "Body text."]
+
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+    assert list(iter_paragraphs(str(empty))) == []
+
+def test_unbroken_text_is_cut_into_bounded_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_PARAGRAPH_CHARS", 100)
+    monkeypatch.setattr(ingest, "BLOCK_SIZE", 64)
+    path = tmp_path / "doc.txt"
+    path.write_text("word " * 1000, encoding="utf-8")
+    lines = list(iter_lines(str(path)))
+    assert max(len(line) for line in lines) <= 100
+    assert "".join(lines) == "word " * 1000
+
+def test_plan_stream_is_lazy_and_bounded():
+    consumed = []
+
+    def paragraphs():
+        for i in range(10000):
+            consumed.append(i)
+            yield f"Paragraph number {i} ends here."
+
+    chunks = plan_stream(paragraphs(), 200, window_bytes=1000)
+    first = next(chunks)
+    assert len(first.encode("utf-8")) <= 200
+    assert len(consumed) < 100
+    assert sum(1 for _ in chunks) > 100
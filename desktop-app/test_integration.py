@@ -27,7 +27,12 @@ def mock_app(mocker):
     app.btn_play = MagicMock()
     app.btn_folder = MagicMock()
     app.voice_mapping = {"Test Voice": "test-voice"}
+    app.format_combo = MagicMock()
+    app.format_labels = {}
+    app.play_while_converting = MagicMock()
+    app.split_chapters = MagicMock()
     app.selected_file_path = ""
+    app.document = None
     app.tts_manager = MagicMock()
     app.is_converting = False
     app.cancel_event = MagicMock()
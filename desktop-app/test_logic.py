@@ -1,4 +1,4 @@
-from logic import TextProcessor
+from logic import TextProcessor, TTSManager
 
 def test_clean_text():
     raw = "Hello   World!  "
@@ -15,3 +15,149 @@ def test_extract_from_md():
     assert "Title" in cleaned
     assert "Bold text" in cleaned
 
+
+class FakeCommunicate:
+    def __init__(self, text, voice):
+        self.text = text
+
+    async def stream(self):
+        yield {"type": "audio", "data": self.text.encode("utf-8")}
+
+def test_convert_writes_chunks_in_order(tmp_path, mocker):
+    import asyncio
+    import logic
+    mocker.patch.object(logic.edge_tts, "Communicate", FakeCommunicate)
+    mocker.patch.object(logic, "CHUNK_MAX_BYTES", 20)
+    mocker.patch.object(logic.os, "makedirs")
+    manager = TTSManager()
+    output = tmp_path / "out.mp3"
+
+    text = "One sentence here. Another one here. And a third one."
+    result = asyncio.run(manager.convert(text, "voice", str(output)))
+
+    assert result == "success"
+    assert output.read_bytes().decode("utf-8").replace(" ", "") == text.replace(" ", "")
+
+def test_convert_coalesces_repeated_chunks(tmp_path, mocker):
+    import asyncio
+    import logic
+    calls = []
+
+    class CountingCommunicate(FakeCommunicate):
+        def __init__(self, text, voice):
+            super().__init__(text, voice)
+            calls.append(text)
+
+        async def stream(self):
+            await asyncio.sleep(0.01)
+            yield {"type": "audio", "data": self.text.encode("utf-8")}
+
+    mocker.patch.object(logic.edge_tts, "Communicate", CountingCommunicate)
+    mocker.patch.object(logic, "CHUNK_MAX_BYTES", 10)
+    mocker.patch.object(logic.os, "makedirs")
+    manager = TTSManager()
+
+    result = asyncio.run(manager.convert("Chapter. " * 6, "voice", str(tmp_path / "out.mp3")))
+
+    assert result == "success"
+    assert len(calls) == 1
+
+def test_synthesize_many_reports_each_item(mocker):
+    import asyncio
+    import logic
+
+    class FlakyCommunicate(FakeCommunicate):
+        async def stream(self):
+            if self.text == "bad":
+                raise RuntimeError("upstream refused")
+            yield {"type": "audio", "data": self.text.encode("utf-8")}
+
+    mocker.patch.object(logic.edge_tts, "Communicate", FlakyCommunicate)
+    mocker.patch.object(logic.os, "makedirs")
+    manager = TTSManager()
+    items = [(f"item-{i}", f"text {i}", "voice") for i in range(10)] + [("broken", "bad", "voice")]
+
+    async def collect():
+        return [result async for result in manager.synthesize_many(items, window=3)]
+
+    results = {item_id: (audio, error) for item_id, audio, error in asyncio.run(collect())}
+    assert len(results) == 11
+    assert results["item-7"] == (b"text 7", None)
+    assert isinstance(results["broken"][1], RuntimeError)
+
+def test_convert_consumes_chunk_stream_lazily(tmp_path, mocker):
+    import asyncio
+    import logic
+    mocker.patch.object(logic.edge_tts, "Communicate", FakeCommunicate)
+    mocker.patch.object(logic, "CONVERT_WINDOW", 4)
+    mocker.patch.object(logic.os, "makedirs")
+    manager = TTSManager()
+    produced = []
+    written = []
+
+    def chunks():
+        for i in range(50):
+            # Never more than a window ahead of what has been written
+            assert i - len(written) <= 4
+            produced.append(i)
+            yield f"c{i} "
+
+    output = tmp_path / "out.mp3"
+    result = asyncio.run(manager.convert("", "voice", str(output), chunks=chunks(), on_audio=written.append))
+    assert result == "success"
+    assert output.read_bytes() == "".join(f"c{i} " for i in range(50)).encode("utf-8")
+
+def test_cancel_aborts_stalled_requests_quickly(tmp_path, mocker):
+    import time
+    import asyncio
+    import threading
+    import logic
+    closed = []
+
+    class StalledCommunicate(FakeCommunicate):
+        async def stream(self):
+            try:
+                # A connection that never delivers
+                await asyncio.sleep(3600)
+                yield {"type": "audio", "data": b""}
+            finally:
+                closed.append(self.text)
+
+    mocker.patch.object(logic.edge_tts, "Communicate", StalledCommunicate)
+    mocker.patch.object(logic, "CHUNK_MAX_BYTES", 20)
+    mocker.patch.object(logic.os, "makedirs")
+    manager = TTSManager()
+    cancel_event = threading.Event()
+    output = tmp_path / "out.mp3"
+    threading.Timer(0.2, cancel_event.set).start()
+
+    started = time.monotonic()
+    text = "One sentence here. Another one here. And a third one."
+    result = asyncio.run(manager.convert(text, "voice", str(output), cancel_event))
+
+    assert result == "cancelled"
+    assert time.monotonic() - started < 1.0
+    assert len(closed) == 3
+    assert not output.exists()
+    assert len(manager.flights) == 0
+    assert manager.controller.in_flight == 0
+
+def test_extraction_stops_when_cancelled(tmp_path):
+    import threading
+    import pytest
+    from logic import ConversionCancelled
+    path = tmp_path / "doc.txt"
+    path.write_text("First.\n\nSecond.\n", encoding="utf-8")
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with pytest.raises(ConversionCancelled):
+        TextProcessor.process_file(str(path), cancel_event)
+
+def test_preview_speaks_first_sentence(mocker):
+    import asyncio
+    import logic
+    mocker.patch.object(logic.edge_tts, "Communicate", FakeCommunicate)
+    mocker.patch.object(logic.os, "makedirs")
+    manager = TTSManager()
+    audio = asyncio.run(manager.preview("Xin chào. This part is not read.", "voice"))
+    assert audio == "Xin chào.".encode("utf-8")
@@ -0,0 +1,44 @@
+from mdtext import markdown_to_speech
+
+def test_drops_code_tables_html_and_images():
+    doc = """# Guide
+
+Intro with **bold** and a [link](https://example.com).
+
+```python
+print("not spoken")
+```
+
+| Column | Other |
+|--------|-------|
+| cell   | cell  |
+
+<div align="center">
+<img src="logo.png">
+</div>
+
+![diagram](diagram.png)
+
+Closing words.
+"""
+    assert markdown_to_speech(doc) == "Guide\nIntro with bold and a link.\nClosing words."
+
+def test_footnotes_front_matter_and_indented_code():
+    doc = """---
+title: Notes
+---
+A claim[^1].
+
+    indented code
+
+[^1]: Source of the claim.
+    More of it.
+"""
+    assert markdown_to_speech(doc) == "A claim."
+
+def test_list_items_and_quotes_stay_separate():
+    doc = "- First\n- Second\n  continued\n\n> Quoted *text* &amp; more"
+    assert markdown_to_speech(doc).split("\n") == ["First", "Second continued", "Quoted text & more"]
+
+def test_identifiers_keep_underscores():
+    assert markdown_to_speech("Call `load_file` or snake_case_name.") == "Call load_file or snake_case_name."
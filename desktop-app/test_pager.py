@@ -0,0 +1,56 @@
+import os
+from pager import PagedDocument
+
+def test_pages_cover_text_without_splitting_words(tmp_path):
+    text = " ".join(f"word{i} Tiếng Việt" for i in range(2000))
+    document = PagedDocument.from_text(text, str(tmp_path), page_bytes=512)
+    assert len(document) > 10
+    pages = list(document.pages())
+    assert "".join(pages) == text
+    assert all(page.endswith(" ") for page in pages[:-1])
+    assert document.text() == text
+    document.close()
+    assert list(tmp_path.iterdir()) == []
+
+def test_unbroken_text_splits_on_character_boundaries(tmp_path):
+    text = "ệ" * 1000
+    document = PagedDocument.from_text(text, str(tmp_path), page_bytes=100)
+    assert "".join(document.pages()) == text
+    assert "�" not in document.page(1)
+
+def test_empty_document_has_one_blank_page(tmp_path):
+    document = PagedDocument.from_text("", str(tmp_path))
+    assert len(document) == 1
+    assert document.page(0) == ""
+
+def test_pages_stay_readable_after_cache_eviction(tmp_path):
+    from textcache import ExtractedTextCache
+    # Room for one document's text, not two
+    cache = ExtractedTextCache(str(tmp_path / "cache"), max_bytes=4000)
+    first, second = tmp_path / "first.txt", tmp_path / "second.txt"
+    first.write_text("first " * 500, encoding="utf-8")
+    second.write_text("second " * 500, encoding="utf-8")
+    read = lambda p: open(p, encoding="utf-8").read()
+    text_path = cache.get_text_file(str(first), read)
+    document = PagedDocument(text_path, page_bytes=256)
+    for name in os.listdir(tmp_path / "cache"):
+        if name.startswith(os.path.basename(text_path)[:-4]):
+            os.utime(tmp_path / "cache" / name, (1, 1))
+    # Caching another document evicts the first one's text file (where the OS allows it)
+    cache.get_text_file(str(second), read)
+    assert "".join(document.pages()) == "first " * 500
+    document.close()
+
+def test_paging_while_another_thread_reads_the_whole_text(tmp_path):
+    import threading
+    text = " ".join(f"word{i}" for i in range(20000))
+    document = PagedDocument.from_text(text, str(tmp_path), page_bytes=256)
+    expected = list(document.pages())
+    results = []
+    reader = threading.Thread(target=lambda: results.extend(document.text() for _ in range(20)))
+    reader.start()
+    for _ in range(5):
+        assert list(document.pages()) == expected
+    reader.join()
+    assert results == [text] * 20
+    document.close()
@@ -0,0 +1,64 @@
+import pytest
+import pdf_backends
+
+def make_pdf(pages):
+    """A minimal PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+def test_pypdf_backend_reads_paths_and_bytes(tmp_path):
+    data = make_pdf(["First page.", "Second page."])
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(data)
+    assert [t.strip() for t in pdf_backends.page_texts(str(path), "pypdf")] == ["First page.", "Second page."]
+    assert [t.strip() for t in pdf_backends.page_texts(data, "pypdf")] == ["First page.", "Second page."]
+
+def test_selection_honours_env_and_rejects_unknown(monkeypatch):
+    monkeypatch.setenv(pdf_backends.BACKEND_ENV, "pypdf")
+    assert pdf_backends.select_backend().name == "pypdf"
+    with pytest.raises(ValueError):
+        pdf_backends.select_backend("nonesuch")
+
+def test_incomplete_backend_cannot_be_created():
+    class NoPages(pdf_backends.PdfBackend):
+        name = "nopages"
+
+        def available(self) -> bool:
+            return True
+
+    with pytest.raises(TypeError):
+        NoPages()
+
+def test_auto_selection_prefers_fastest_installed(monkeypatch):
+    monkeypatch.delenv(pdf_backends.BACKEND_ENV, raising=False)
+    monkeypatch.setattr(pdf_backends.PdfiumBackend, "available", lambda self: True)
+    monkeypatch.setattr(pdf_backends.PyMuPDFBackend, "available", lambda self: False)
+    assert pdf_backends.select_backend().name == "pypdfium2"
+
+def test_compare_reports_speed_and_similarity(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(make_pdf(["Alpha beta gamma."] * 3))
+    results = pdf_backends.compare_backends([str(path)], ["pypdf"])
+    assert results[0]["backend"] == "pypdf"
+    assert results[0]["pages"] == 3
+    assert results[0]["similarity"] == 1.0
+    assert "pages/s" in pdf_backends.format_report(results)
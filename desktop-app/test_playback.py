@@ -0,0 +1,40 @@
+import pytest
+from playback import AudioSink, FileSink, NullSink, PlaybackPipeline
+
+def test_playback_starts_before_synthesis_finishes():
+    sink = NullSink()
+    pipeline = PlaybackPipeline(sink, prebuffer_bytes=100).start()
+
+    pipeline.feed(b"x" * 150)
+    assert pipeline.first_audio.wait(timeout=2)
+    assert not sink.closed
+
+    pipeline.feed(b"y" * 50)
+    pipeline.finish()
+    assert pipeline.wait(timeout=2)
+    assert sink.bytes_written == 200
+    assert sink.closed
+
+def test_short_audio_plays_without_full_prebuffer(tmp_path):
+    path = tmp_path / "played.mp3"
+    pipeline = PlaybackPipeline(FileSink(str(path)), prebuffer_bytes=1024).start()
+    pipeline.feed(b"abc")
+    pipeline.feed(b"def")
+    pipeline.finish()
+    assert pipeline.wait(timeout=2)
+    assert path.read_bytes() == b"abcdef"
+
+def test_stop_aborts_playback():
+    sink = NullSink()
+    pipeline = PlaybackPipeline(sink, prebuffer_bytes=10).start()
+    pipeline.feed(b"x" * 10)
+    pipeline.stop()
+    assert pipeline.wait(timeout=2)
+    pipeline.feed(b"late")
+
+def test_sink_without_write_cannot_be_created():
+    class Silent(AudioSink):
+        pass
+
+    with pytest.raises(TypeError):
+        Silent()
@@ -0,0 +1,55 @@
+import time
+import asyncio
+import threading
+import profiling
+from profiling import Profiler, profiled
+
+def test_disabled_profiler_writes_nothing(tmp_path):
+    profiler = Profiler(0, str(tmp_path))
+    with profiler.session("idle") as session:
+        assert session is None
+    assert list(tmp_path.iterdir()) == []
+
+def test_sync_session_writes_stats_and_allocations(tmp_path):
+    profiler = Profiler(1, str(tmp_path))
+    with profiler.session("extract sample.pdf") as session:
+        held = [bytearray(1024) for _ in range(100)]
+    report = open(session.report_path, encoding="utf-8").read()
+    assert report.startswith("extract sample.pdf:")
+    assert "Top functions" in report and "Top allocations" in report
+    assert "not sampled (synchronous call)" in report
+    assert len(list(tmp_path.glob("*-extract_sample.pdf.prof"))) == 1
+    del held
+
+def test_async_session_samples_loop_lag(tmp_path):
+    profiler = Profiler(1, str(tmp_path))
+
+    async def run():
+        async with profiler.async_session("convert") as session:
+            await asyncio.sleep(0.12)
+            time.sleep(0.1)  # blocks the loop
+            await asyncio.sleep(0.06)
+        return session
+
+    session = asyncio.run(run())
+    assert session.lag_samples and max(session.lag_samples) >= 0.05
+    assert "p95" in open(session.report_path, encoding="utf-8").read()
+
+def test_overlapping_calls_profile_only_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "profiler", Profiler(1, str(tmp_path)))
+    inside = threading.Event()
+    release = threading.Event()
+
+    @profiled("slow")
+    def slow():
+        inside.set()
+        release.wait(5)
+
+    thread = threading.Thread(target=slow)
+    thread.start()
+    inside.wait(5)
+    with profiling.profiler.session("other") as session:
+        assert session is None
+    release.set()
+    thread.join()
+    assert len(list(tmp_path.glob("*.txt"))) == 1
@@ -0,0 +1,113 @@
+import time
+import asyncio
+from scheduler import BULK, INTERACTIVE, NORMAL, PriorityScheduler
+
+def test_interactive_overtakes_queued_bulk_work():
+    scheduler = PriorityScheduler(2, reservations={})
+    order = []
+
+    async def job(name, priority, duration=0.01):
+        async with scheduler.slot(priority):
+            order.append(name)
+            await asyncio.sleep(duration)
+
+    async def run():
+        bulk = [asyncio.create_task(job(f"bulk{i}", BULK)) for i in range(6)]
+        await asyncio.sleep(0)
+        preview = asyncio.create_task(job("preview", INTERACTIVE))
+        await asyncio.gather(preview, *bulk)
+
+    asyncio.run(run())
+    # Two bulk jobs were already running; the preview goes next
+    assert order.index("preview") == 2
+
+def test_reservation_keeps_a_slot_for_interactive():
+    scheduler = PriorityScheduler(3, reservations={INTERACTIVE: 1})
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold(priority):
+            async with scheduler.slot(priority):
+                await release.wait()
+
+        bulk = [asyncio.create_task(hold(BULK)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["running"][BULK] == 2
+
+        started = time.monotonic()
+        async with scheduler.slot(INTERACTIVE):
+            assert time.monotonic() - started < 0.1
+        release.set()
+        await asyncio.gather(*bulk)
+
+    asyncio.run(run())
+
+def test_capacity_below_reservations_still_runs_bulk():
+    scheduler = PriorityScheduler(1, reservations={INTERACTIVE: 1})
+
+    async def run():
+        async with scheduler.slot(BULK):
+            return True
+
+    assert asyncio.run(asyncio.wait_for(run(), 1))
+
+def test_aging_prevents_starvation():
+    scheduler = PriorityScheduler(1, reservations={}, aging_seconds=0.05)
+    order = []
+
+    async def job(name, priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0.03)
+
+    async def run():
+        tasks = [asyncio.create_task(job("first", NORMAL))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(job("bulk", BULK)))
+        # A steady stream of normal work arriving while the bulk job waits
+        for i in range(8):
+            await asyncio.sleep(0.02)
+            tasks.append(asyncio.create_task(job(f"normal{i}", NORMAL)))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order.index("bulk") < len(order) - 1
+
+def test_capacity_follows_callable_and_cancelled_waiters_leave():
+    limit = [1]
+    scheduler = PriorityScheduler(lambda: limit[0], reservations={})
+
+    async def run():
+        await scheduler.acquire(NORMAL)
+        waiter = asyncio.create_task(scheduler.acquire(NORMAL))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.stats()["waiting"][NORMAL] == 0
+
+        limit[0] = 2
+        await asyncio.wait_for(scheduler.acquire(NORMAL), 0.5)
+        assert scheduler.stats()["running"][NORMAL] == 2
+
+    asyncio.run(run())
+
+def test_waiters_start_when_the_controller_limit_grows():
+    from concurrency import AIMDController
+    controller = AIMDController(initial=1, maximum=4)
+    scheduler = PriorityScheduler(lambda: controller.limit, reservations={})
+    controller.on_limit_change(scheduler.poke)
+
+    async def run():
+        await scheduler.acquire(NORMAL)
+        waiter = asyncio.create_task(scheduler.acquire(NORMAL))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        # Healthy completions raise the limit; nothing is released meanwhile
+        while controller.limit < 2:
+            controller.record(time.monotonic(), 0.01, ok=True)
+        await asyncio.wait_for(waiter, 0.5)
+        assert scheduler.stats()["running"][NORMAL] == 2
+
+    asyncio.run(run())
@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from singleflight import SingleFlight, normalize_text
+
+def test_normalize_text():
+    assert normalize_text("  Xin   chào\n") == "Xin chào"
+    # Decomposed and precomposed Vietnamese map to the same key
+    assert normalize_text("à") == normalize_text("à")
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"audio"
+
+    async def run():
+        return await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+
+    assert asyncio.run(run()) == [b"audio"] * 5
+    assert calls == 1
+    assert len(flights) == 0
+
+def test_errors_propagate_to_followers():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream")
+
+    async def run():
+        return await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+
+def test_follower_takes_over_when_leader_cancelled():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def run():
+        leader = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == "done"
@@ -0,0 +1,51 @@
+import os
+from textcache import ExtractedTextCache
+
+def test_second_lookup_skips_extraction(tmp_path):
+    doc = tmp_path / "doc.txt"
+    doc.write_text("Hello world. Second sentence.", encoding="utf-8")
+    cache = ExtractedTextCache(str(tmp_path / "cache"))
+    calls = []
+
+    def extract(path):
+        calls.append(path)
+        return "Hello world. Second sentence."
+
+    assert cache.get_chunks(str(doc), 20, extract) == ["Hello world.", "Second sentence."]
+    assert ExtractedTextCache(str(tmp_path / "cache")).get_chunks(str(doc), 20, extract) == ["Hello world.", "Second sentence."]
+    assert cache.get_text(str(doc), extract) == "Hello world. Second sentence."
+    assert len(calls) == 1
+
+def test_changed_file_is_re_extracted(tmp_path):
+    doc = tmp_path / "doc.txt"
+    doc.write_text("one", encoding="utf-8")
+    cache = ExtractedTextCache(str(tmp_path / "cache"))
+    assert cache.get_text(str(doc), lambda p: open(p, encoding="utf-8").read()) == "one"
+
+    doc.write_text("two!", encoding="utf-8")
+    os.utime(doc, ns=(1, 1))
+    assert cache.get_text(str(doc), lambda p: open(p, encoding="utf-8").read()) == "two!"
+
+def test_eviction_keeps_cache_bounded(tmp_path):
+    cache = ExtractedTextCache(str(tmp_path / "cache"), max_bytes=1)
+    for i in range(3):
+        doc = tmp_path / f"doc{i}.txt"
+        doc.write_text(f"document {i}", encoding="utf-8")
+        cache.get_text(str(doc), lambda p: open(p, encoding="utf-8").read())
+    entries = [n for n in os.listdir(tmp_path / "cache") if n.endswith(".json.gz")]
+    assert len(entries) <= 1
+
+def test_text_file_is_reused(tmp_path):
+    doc = tmp_path / "doc.txt"
+    doc.write_text("Hello pages.", encoding="utf-8")
+    cache = ExtractedTextCache(str(tmp_path / "cache"))
+    calls = []
+
+    def extract(path):
+        calls.append(path)
+        return "Hello pages."
+
+    first = cache.get_text_file(str(doc), extract)
+    assert cache.get_text_file(str(doc), extract) == first
+    assert open(first, encoding="utf-8").read() == "Hello pages."
+    assert len(calls) == 1
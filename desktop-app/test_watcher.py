@@ -0,0 +1,102 @@
+import os
+import time
+import watcher
+from watcher import FolderWatcher
+
+class FakeManager:
+    def __init__(self):
+        self.converted = []
+
+    async def convert(self, text, voice, output_path, fmt="mp3", priority="normal"):
+        self.converted.append((text, output_path))
+        with open(output_path, "wb") as f:
+            f.write(b"audio")
+        return "success"
+
+def make_watcher(tmp_path, manager):
+    return FolderWatcher(str(tmp_path / "in"), str(tmp_path / "out"), "voice",
+                         index_path=str(tmp_path / "index.sqlite"), manager=manager)
+
+def write_old(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+    past = time.time() - 60
+    os.utime(path, (past, past))
+
+def run_once(tmp_path, manager):
+    w = make_watcher(tmp_path, manager)
+    w.run(once=True)
+
+def test_converts_new_files_once(tmp_path):
+    write_old(tmp_path / "in" / "a.txt", "Alpha")
+    write_old(tmp_path / "in" / "sub" / "b.md", "# Beta")
+    write_old(tmp_path / "in" / "skip.odt", "ignored")
+    manager = FakeManager()
+
+    run_once(tmp_path, manager)
+    assert sorted(text for text, _ in manager.converted) == ["Alpha", "Beta"]
+    assert os.path.exists(tmp_path / "out" / "sub" / "b.mp3")
+
+    run_once(tmp_path, manager)
+    assert len(manager.converted) == 2
+
+def test_detects_added_and_edited_files(tmp_path, monkeypatch):
+    write_old(tmp_path / "in" / "a.txt", "Alpha")
+    manager = FakeManager()
+    run_once(tmp_path, manager)
+
+    write_old(tmp_path / "in" / "new.txt", "Gamma")
+    run_once(tmp_path, manager)
+    assert manager.converted[-1][0] == "Gamma"
+
+    # An in-place edit leaves the directory mtime alone; the verify slice finds it
+    directory_mtime = os.stat(tmp_path / "in").st_mtime_ns
+    write_old(tmp_path / "in" / "a.txt", "Alpha two")
+    os.utime(tmp_path / "in", ns=(directory_mtime, directory_mtime))
+    run_once(tmp_path, manager)
+    assert manager.converted[-1][0] == "Alpha two"
+    assert len(manager.converted) == 3
+
+def test_unchanged_directories_are_not_listed(tmp_path, monkeypatch):
+    write_old(tmp_path / "in" / "a.txt", "Alpha")
+    run_once(tmp_path, FakeManager())
+
+    listed = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(watcher.os, "scandir", lambda p: listed.append(p) or real_scandir(p))
+    run_once(tmp_path, FakeManager())
+    assert listed == []
+
+def test_settling_files_wait_for_next_pass(tmp_path):
+    (tmp_path / "in").mkdir()
+    (tmp_path / "in" / "fresh.txt").write_text("Still copying", encoding="utf-8")
+    manager = FakeManager()
+    run_once(tmp_path, manager)
+    assert manager.converted == []
+
+    past = time.time() - 60
+    os.utime(tmp_path / "in" / "fresh.txt", (past, past))
+    run_once(tmp_path, manager)
+    assert manager.converted[0][0] == "Still copying"
+
+def test_index_lives_outside_the_watched_folder(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path / "cache"))
+    write_old(tmp_path / "in" / "a.txt", "Alpha")
+    FolderWatcher(str(tmp_path / "in"), str(tmp_path / "out"), "voice", manager=FakeManager()).run(once=True)
+    assert os.listdir(tmp_path / "in") == ["a.txt"]
+    assert os.listdir(tmp_path / "cache" / "Lito" / "watch")
+
+def test_queued_conversions_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(watcher, "PENDING_PER_WORKER", 1)
+    for n in range(5):
+        write_old(tmp_path / "in" / f"{n}.txt", f"Document {n}")
+    manager = FakeManager()
+    w = make_watcher(tmp_path, manager)
+    # Nothing finishes while the pass dispatches
+    monkeypatch.setattr(w._pool, "submit", lambda *args: None)
+    assert w.scan() == 2
+    w.close()
+    # The files left over are picked up by later passes
+    for _ in range(3):
+        run_once(tmp_path, manager)
+    assert len(manager.converted) == 5
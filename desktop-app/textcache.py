@@ -0,0 +1,168 @@
+"""
+Persistent cache of extracted text and chunk plans, keyed by file fingerprint.
+"""
+import os
+import gzip
+import json
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional
+
+import pdf_backends
+from chunking import plan_chunks
+
+# Bump whenever extraction or cleaning output changes, to invalidate old entries
+CACHE_VERSION = 3
+
+HASH_BLOCK_SIZE = 1024 * 1024
+# Compressed entries, and plain-text copies used for paged previews
+ENTRY_SUFFIXES = (".json.gz", ".txt")
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "Lito", "text-cache")
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractedTextCache:
+    """
+    Entries are gzip-compressed JSON files named by content hash and file
+    type, evicted least-recently-used once the cache exceeds max_bytes. An
+    index of path -> (size, mtime, hash) lets unchanged files skip rehashing.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(self.cache_dir, "index.json")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self) -> Dict:
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def key_for(self, path: str) -> str:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            known = self._index.get(path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            content_hash = known[2]
+        else:
+            content_hash = hash_file(path)
+            with self._lock:
+                self._index[path] = [stat.st_size, stat.st_mtime_ns, content_hash]
+                self._save_index()
+        ext = os.path.splitext(path)[1].lower().lstrip(".")
+        if ext == "pdf":
+            # Backends extract slightly different text
+            ext = f"pdf-{pdf_backends.select_backend().name}"
+        return f"v{CACHE_VERSION}-{ext}-{content_hash}"
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".json.gz")
+
+    def _read(self, key: str) -> Optional[Dict]:
+        entry_path = self._entry_path(key)
+        try:
+            with gzip.open(entry_path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError, EOFError):
+            return None
+        # Mark as recently used for eviction
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return entry
+
+    def _write(self, key: str, entry: Dict):
+        entry_path = self._entry_path(key)
+        tmp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, entry_path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for item in os.scandir(self.cache_dir):
+                if item.name.endswith(ENTRY_SUFFIXES):
+                    stat = item.stat()
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(entry_path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def get_text(self, path: str, extract: Callable[[str], str]) -> str:
+        key = self.key_for(path)
+        entry = self._read(key)
+        if entry is not None:
+            return entry["text"]
+        text = extract(path)
+        if text:
+            self._write(key, {"text": text, "chunks": {}})
+        return text
+
+    def get_chunks(self, path: str, max_bytes: int, extract: Callable[[str], str]) -> List[str]:
+        key = self.key_for(path)
+        entry = self._read(key) or {"text": extract(path), "chunks": {}}
+        plan = entry["chunks"].get(str(max_bytes))
+        if plan is None:
+            plan = plan_chunks(entry["text"], max_bytes)
+            entry["chunks"][str(max_bytes)] = plan
+            if entry["text"]:
+                self._write(key, entry)
+        return plan
+
+    def get_text_file(self, path: str, extract: Callable[[str], str]) -> str:
+        """Path to an uncompressed UTF-8 copy of the extracted text, for seeking into."""
+        key = self.key_for(path)
+        text_path = os.path.join(self.cache_dir, key + ".txt")
+        if os.path.exists(text_path):
+            try:
+                os.utime(text_path)
+            except OSError:
+                pass
+            return text_path
+        text = self.get_text(path, extract)
+        tmp_path = f"{text_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        os.replace(tmp_path, text_path)
+        self._evict()
+        return text_path
+
+    def clear(self):
+        with self._lock:
+            for item in os.scandir(self.cache_dir):
+                if item.name.endswith(ENTRY_SUFFIXES):
+                    os.remove(item.path)
+            self._index = {}
+            self._save_index()
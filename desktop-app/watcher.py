@@ -0,0 +1,267 @@
+"""
+Headless watch-folder mode: convert documents dropped into a folder.
+
+A SQLite index records every directory's mtime and every file's size, mtime
+and content hash. A rescan only lists directories whose mtime changed, since
+adding, removing or renaming an entry changes its directory's mtime. Files
+edited in place leave the directory untouched, so each pass also re-stats a
+rolling slice of known files. A pass therefore costs about the same whether
+the tree holds a hundred files or tens of thousands.
+
+The index lives in the user's cache directory rather than the watched
+folder, since its journal files coming and going would change the root's
+mtime and make every pass re-list it.
+"""
+import os
+import time
+import hashlib
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from logic import TextProcessor, TTSManager
+from formats import DEFAULT_FORMAT, extension_for
+from scheduler import BULK
+from textcache import hash_file
+
+SUPPORTED_EXTENSIONS = (".pdf", ".md", ".txt", ".epub", ".docx", ".html", ".htm")
+
+# Files queued for conversion per worker; the rest wait for a later pass
+PENDING_PER_WORKER = 4
+
+# Files modified more recently than this may still be being copied in
+SETTLE_SECONDS = 2.0
+# Known files re-stat'ed per pass to catch in-place edits
+VERIFY_SLICE = 500
+
+
+def default_index_path(root: str) -> str:
+    """One index per watched folder, in the user's cache directory."""
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    key = hashlib.sha256(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(base, "Lito", "watch", f"{key}.sqlite")
+
+
+class WatchIndex:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY, parent TEXT, mtime_ns INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, dir TEXT, size INTEGER, mtime_ns INTEGER,
+                hash TEXT, status TEXT, output TEXT
+            );
+            CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+            CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+        """)
+
+    def dir_mtime(self, path: str) -> Optional[int]:
+        with self._lock:
+            row = self._db.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def subdirs(self, path: str) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._db.execute("SELECT path FROM dirs WHERE parent = ?", (path,))]
+
+    def files_in(self, path: str) -> Dict[str, Tuple[int, int]]:
+        with self._lock:
+            rows = self._db.execute("SELECT path, size, mtime_ns FROM files WHERE dir = ?", (path,))
+            return {r[0]: (r[1], r[2]) for r in rows}
+
+    def update_dir(self, path: str, parent: Optional[str], mtime_ns: int,
+                   subdirs: List[str], files: List[str]):
+        """Record a fresh listing, dropping entries that disappeared from it."""
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)", (path, parent, mtime_ns))
+            known = {r[0] for r in self._db.execute("SELECT path FROM dirs WHERE parent = ?", (path,))}
+            for gone in known - set(subdirs):
+                self._db.execute("DELETE FROM dirs WHERE path = ? OR path LIKE ?", (gone, gone + os.sep + "%"))
+                self._db.execute("DELETE FROM files WHERE dir = ? OR dir LIKE ?", (gone, gone + os.sep + "%"))
+            known = {r[0] for r in self._db.execute("SELECT path FROM files WHERE dir = ?", (path,))}
+            for gone in known - set(files):
+                self._db.execute("DELETE FROM files WHERE path = ?", (gone,))
+
+    def invalidate_dir(self, path: str):
+        """Force the next pass to re-list path."""
+        with self._lock, self._db:
+            self._db.execute("UPDATE dirs SET mtime_ns = NULL WHERE path = ?", (path,))
+
+    def file_state(self, path: str) -> Optional[Tuple[int, int, str, str]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT size, mtime_ns, hash, status FROM files WHERE path = ?", (path,)
+            ).fetchone()
+
+    def record_file(self, path: str, size: int, mtime_ns: int, content_hash: Optional[str],
+                    status: str, output: Optional[str] = None):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, os.path.dirname(path), size, mtime_ns, content_hash, status, output),
+            )
+
+    def verify_slice(self, after: str, limit: int) -> List[Tuple[str, int, int]]:
+        with self._lock:
+            return list(self._db.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE path > ? ORDER BY path LIMIT ?", (after, limit)
+            ))
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class FolderWatcher:
+    def __init__(self, root: str, output_dir: str, voice: str, fmt: str = DEFAULT_FORMAT,
+                 workers: int = 2, index_path: Optional[str] = None, manager: Optional[TTSManager] = None):
+        self.root = os.path.abspath(root)
+        self.output_dir = os.path.abspath(output_dir)
+        self.voice = voice
+        self.fmt = fmt
+        index_path = index_path or default_index_path(self.root)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        self.index = WatchIndex(index_path)
+        self.manager = manager or TTSManager()
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lito-watch")
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._verify_cursor = ""
+
+    # Scanning
+
+    def _changed_dirs(self, path: str, parent: Optional[str]) -> Iterator[Tuple[str, List[os.DirEntry]]]:
+        """Yield (directory, document entries) for every directory whose listing changed."""
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+        if self.index.dir_mtime(path) != mtime_ns:
+            subdirs, documents = [], []
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.name.startswith("."):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.path != self.output_dir:
+                                subdirs.append(entry.path)
+                        elif entry.name.lower().endswith(SUPPORTED_EXTENSIONS) and entry.is_file():
+                            documents.append(entry)
+            except OSError:
+                return
+            self.index.update_dir(path, parent, mtime_ns, subdirs, [e.path for e in documents])
+            yield path, documents
+        else:
+            subdirs = self.index.subdirs(path)
+        for subdir in subdirs:
+            yield from self._changed_dirs(subdir, path)
+
+    def _candidates(self) -> Iterator[Tuple[str, os.stat_result]]:
+        seen = set()
+        for directory, documents in self._changed_dirs(self.root, None):
+            known = self.index.files_in(directory)
+            for entry in documents:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if known.get(entry.path) != (stat.st_size, stat.st_mtime_ns):
+                    seen.add(entry.path)
+                    yield entry.path, stat
+
+        rows = self.index.verify_slice(self._verify_cursor, VERIFY_SLICE)
+        self._verify_cursor = rows[-1][0] if len(rows) == VERIFY_SLICE else ""
+        for path, size, mtime_ns in rows:
+            if path in seen:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                yield path, stat
+
+    def scan(self) -> int:
+        """One incremental pass. Returns the number of files dispatched."""
+        dispatched = 0
+        now = time.time()
+        for path, stat in self._candidates():
+            if now - stat.st_mtime < SETTLE_SECONDS:
+                # Not recorded yet, so make sure a later pass looks again
+                self.index.invalidate_dir(os.path.dirname(path))
+                continue
+            with self._pending_lock:
+                if path in self._pending:
+                    continue
+                full = len(self._pending) >= self.workers * PENDING_PER_WORKER
+                if not full:
+                    self._pending.add(path)
+            if full:
+                # Enough queued already: leave it unrecorded and look again next pass
+                self.index.invalidate_dir(os.path.dirname(path))
+                continue
+            self._pool.submit(self._process, path, stat.st_size, stat.st_mtime_ns)
+            dispatched += 1
+        return dispatched
+
+    # Conversion
+
+    def output_path_for(self, path: str) -> str:
+        relative = os.path.splitext(os.path.relpath(path, self.root))[0]
+        return os.path.join(self.output_dir, relative + extension_for(self.fmt))
+
+    def _process(self, path: str, size: int, mtime_ns: int):
+        try:
+            content_hash = hash_file(path)
+            previous = self.index.file_state(path)
+            if previous and previous[2] == content_hash and previous[3] == "done":
+                # Touched or copied over with identical content
+                self.index.record_file(path, size, mtime_ns, content_hash, "done", self.output_path_for(path))
+                return
+            output_path = self.output_path_for(path)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            text = TextProcessor.process_file(path)
+            if not text:
+                result = "empty"
+            else:
+                result = asyncio.run(self.manager.convert(text, self.voice, output_path, fmt=self.fmt, priority=BULK))
+            status = "done" if result == "success" else result
+            print(f"[watch] {path}: {status}")
+            self.index.record_file(path, size, mtime_ns, content_hash, status, output_path)
+        except Exception as e:
+            print(f"[watch] {path}: error: {e}")
+            self.index.record_file(path, size, mtime_ns, None, "error")
+        finally:
+            with self._pending_lock:
+                self._pending.discard(path)
+
+    def pending(self) -> int:
+        with self._pending_lock:
+            return len(self._pending)
+
+    def run(self, interval: float = 5.0, once: bool = False, stop_event: Optional[threading.Event] = None):
+        stop_event = stop_event or threading.Event()
+        try:
+            while not stop_event.is_set():
+                self.scan()
+                if once:
+                    break
+                stop_event.wait(interval)
+        finally:
+            self.close(wait=True)
+
+    def close(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+        self.index.close()
@@ -0,0 +1,152 @@
+"""
+Content-addressed store for synthesized audio, served with HTTP Range and
+conditional GET support.
+"""
+import os
+import re
+import threading
+from typing import Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+BLOCK_SIZE = 64 * 1024
+KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+# Audio for a key never changes, so clients may cache it forever
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class AudioStore:
+    def __init__(self, directory: str, max_bytes: int, extensions=(".mp3", ".ogg")):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.extensions = extensions
+        self._lock = threading.Lock()
+        self._size = None
+
+    def find(self, key: str) -> Optional[str]:
+        if not KEY_PATTERN.match(key):
+            return None
+        for extension in self.extensions:
+            path = os.path.join(self.directory, key + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def read(self, key: str) -> Optional[bytes]:
+        path = self.find(key)
+        if not path:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key: str, extension: str, data: bytes) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, key + extension)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+
+        with self._lock:
+            # Same key, same content (e.g. two workers racing): only the new copy counts
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._prune()
+        return path
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.extensions):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _prune(self):
+        # Caller holds the lock. Oldest entries go first, down to 90% of the cap.
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `bytes=` header into an inclusive (start, end).
+    Returns None for anything unsatisfiable.
+    """
+    match = re.fullmatch(r'\s*bytes=(\d*)-(\d*)\s*', header)
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    first, last = match.group(1), match.group(2)
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return None
+        start = max(0, size - length)
+        end = size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+
+def _read_blocks(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def serve_audio(path: str, key: str, media_type: str, request: Request) -> Response:
+    size = os.path.getsize(path)
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE, "Accept-Ranges": "bytes"}
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = parse_range(range_header, size)
+        if byte_range is None:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(_read_blocks(path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(_read_blocks(path, 0, size - 1), media_type=media_type, headers=headers)
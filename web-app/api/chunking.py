@@ -0,0 +1,134 @@
+"""
+Sentence-aware chunk planner for TTS backends.
+
+Shared with web-app/api/chunking.py; web-app/tests/test_shared_modules.py fails if the copies differ.
+"""
+import math
+import re
+from typing import List
+
+# Hard per-request input limits, in UTF-8 bytes
+BACKEND_BYTE_LIMITS = {
+    "edge": 4096,
+    "google": 5000,
+}
+
+# Latin terminators only end a sentence when followed by whitespace (so "3.14"
+# and "v.v." mid-word stay intact); full-width CJK terminators end it outright.
+_SENTENCE_END = re.compile(
+    r'(?:[.!?…]+[)"\'”’»\]]*(?=\s|$)|[。！？]+[」』）》”’]*|\n)\s*'
+)
+_CLAUSE_END = re.compile(r'[,;:，、；：]+\s*')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def utf8_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _split_after(pattern: re.Pattern, text: str) -> List[str]:
+    pieces = []
+    start = 0
+    for match in pattern.finditer(text):
+        if match.end() > start:
+            pieces.append(text[start:match.end()])
+            start = match.end()
+    if start < len(text):
+        pieces.append(text[start:])
+    return pieces
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, keeping trailing whitespace on each piece."""
+    return _split_after(_SENTENCE_END, text)
+
+
+def _hard_split(text: str, max_bytes: int) -> List[str]:
+    pieces = []
+    current = ""
+    current_bytes = 0
+    for ch in text:
+        size = utf8_len(ch)
+        if current and current_bytes + size > max_bytes:
+            pieces.append(current)
+            current, current_bytes = "", 0
+        current += ch
+        current_bytes += size
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _fit(pieces: List[str], max_bytes: int) -> List[str]:
+    """Merge consecutive pieces back together while they fit in max_bytes."""
+    merged = []
+    current = ""
+    for piece in pieces:
+        if current and utf8_len(current + piece) > max_bytes:
+            merged.append(current)
+            current = ""
+        current += piece
+    if current:
+        merged.append(current)
+    return merged
+
+
+def _split_oversized(sentence: str, max_bytes: int) -> List[str]:
+    if utf8_len(sentence) <= max_bytes:
+        return [sentence]
+
+    # Clause punctuation first, then whitespace, then raw character boundaries
+    for splitter in (
+        lambda s: _split_after(_CLAUSE_END, s),
+        lambda s: _split_after(_WHITESPACE, s),
+    ):
+        parts = splitter(sentence)
+        if len(parts) > 1:
+            result = []
+            for part in _fit(parts, max_bytes):
+                result.extend(_split_oversized(part, max_bytes))
+            return result
+
+    return _hard_split(sentence, max_bytes)
+
+
+def plan_chunks(text: str, max_bytes: int) -> List[str]:
+    """
+    Split text into chunks of at most max_bytes UTF-8 bytes, breaking on
+    sentence and clause boundaries and sizing chunks as evenly as possible.
+    """
+    if max_bytes <= 0:
+        raise ValueError("max_bytes must be positive")
+
+    pieces = []
+    for sentence in split_sentences(text):
+        pieces.extend(_split_oversized(sentence, max_bytes))
+
+    total = sum(utf8_len(p) for p in pieces)
+    if total == 0:
+        return []
+
+    # Aim chunk boundaries at multiples of the mean chunk size, measured on
+    # the running total so rounding does not pile up in the last chunk
+    target = total / math.ceil(total / max_bytes)
+
+    chunks = []
+    current = ""
+    current_bytes = 0
+    consumed = 0
+    for piece in pieces:
+        size = utf8_len(piece)
+        if current:
+            boundary = target * (len(chunks) + 1)
+            overflow = current_bytes + size > max_bytes
+            closer_without = abs(consumed - boundary) <= abs(consumed + size - boundary)
+            if overflow or closer_without:
+                chunks.append(current)
+                current, current_bytes = "", 0
+        current += piece
+        current_bytes += size
+        consumed += size
+    if current:
+        chunks.append(current)
+
+    return [c.strip() for c in chunks if c.strip()]
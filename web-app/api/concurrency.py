@@ -0,0 +1,163 @@
+"""
+AIMD concurrency control for upstream TTS requests.
+
+Shared with web-app/api/concurrency.py; web-app/tests/test_shared_modules.py fails if the copies differ.
+"""
+import time
+import asyncio
+import threading
+import collections
+from contextlib import asynccontextmanager
+from typing import Callable
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """True for errors that mean the upstream wants us to slow down."""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    # aiohttp uses .status, google-api-core uses .code
+    for attr in ("status", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int) and value in THROTTLE_STATUS_CODES:
+            return True
+    return type(exc).__name__ in ("ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "TooManyRequests")
+
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease limit on in-flight requests.
+
+    The limit grows by roughly one slot per window of healthy completions and
+    is cut by `decrease` on throttling, timeouts or latency spikes. Waiters may
+    live on different event loops (the desktop app runs one loop per
+    conversion thread), so state is guarded by a threading lock and waiters
+    are woken through their own loop.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32,
+                 decrease: float = 0.5, latency_factor: float = 2.5,
+                 error_threshold: float = 0.2, smoothing: float = 0.2):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.error_threshold = error_threshold
+        self.smoothing = smoothing
+
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+        self._latency = None
+        self._error_rate = 0.0
+        self._last_decrease = 0.0
+        self._listeners = []
+
+    @property
+    def limit(self) -> int:
+        return max(self.minimum, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+            "latency": self._latency,
+            "error_rate": round(self._error_rate, 3),
+        }
+
+    def on_limit_change(self, callback: Callable[[], None]):
+        """Call callback after the limit changes, e.g. so a scheduler sized by it re-checks its waiters."""
+        self._listeners.append(callback)
+
+    async def acquire(self):
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+                    future = None
+            # The slot was granted just before we were cancelled: hand it back.
+            # If the grant callback has not run yet it returns the slot itself.
+            if future is not None and future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._wake()
+
+    def _wake(self):
+        # Caller holds the lock
+        while self._waiters and self._in_flight < self.limit:
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self._in_flight += 1
+            future.get_loop().call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future):
+        if future.cancelled():
+            self._release()
+        else:
+            future.set_result(None)
+
+    def record(self, started: float, latency: float, ok: bool, throttled: bool = False):
+        with self._lock:
+            before = self.limit
+            self._error_rate += self.smoothing * ((0.0 if ok else 1.0) - self._error_rate)
+
+            spike = False
+            if ok:
+                if self._latency is None:
+                    self._latency = latency
+                else:
+                    spike = latency > self._latency * self.latency_factor
+                    if not spike:
+                        self._latency += self.smoothing * (latency - self._latency)
+
+            if throttled or spike:
+                # One cut per congestion event: completions that started before
+                # the previous cut were already accounted for by it
+                if started >= self._last_decrease:
+                    self._limit = max(self.minimum, self._limit * self.decrease)
+                    self._last_decrease = time.monotonic()
+            elif ok and self._error_rate < self.error_threshold:
+                self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+
+            self._wake()
+            changed = self.limit != before
+        if changed:
+            for callback in self._listeners:
+                callback()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            self.record(started, time.monotonic() - started, ok=False, throttled=is_throttle_error(e))
+            raise
+        else:
+            self.record(started, time.monotonic() - started, ok=True)
+        finally:
+            self._release()
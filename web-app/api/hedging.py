@@ -0,0 +1,130 @@
+"""
+Hedged upstream requests: when a call runs past the recent p95 latency,
+send a duplicate and keep whichever answers first.
+
+A token budget caps duplicates at a small fraction of all calls (5% by
+default), so a stuck request stops stretching a whole conversion without
+adding noticeable upstream load. Until enough latencies have been observed
+no call is hedged. Off unless LITO_HEDGE is set (1, true or on);
+LITO_HEDGE_BUDGET sets the fraction.
+
+Shared with web-app/api/hedging.py; web-app/tests/test_shared_modules.py fails if the copies differ.
+"""
+import os
+import time
+import asyncio
+import threading
+import collections
+from typing import Awaitable, Callable, Optional, TypeVar
+
+HEDGE_ENV = "LITO_HEDGE"
+HEDGE_BUDGET_ENV = "LITO_HEDGE_BUDGET"
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Quantiles over the most recent `window` latencies."""
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class HedgeBudget:
+    """Every call earns `fraction` of a hedge; a hedge spends one. Savings are capped at `burst`."""
+
+    def __init__(self, fraction: float = 0.05, burst: float = 10.0):
+        self.fraction = fraction
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.fraction)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class Hedger:
+    def __init__(self, enabled: Optional[bool] = None, fraction: Optional[float] = None,
+                 percentile: float = 0.95, min_delay: float = 0.05, tracker: Optional[LatencyTracker] = None):
+        if enabled is None:
+            enabled = os.environ.get(HEDGE_ENV, "").lower() in ("1", "true", "on")
+        if fraction is None:
+            fraction = float(os.environ.get(HEDGE_BUDGET_ENV) or 0.05)
+        self.enabled = enabled
+        self.percentile = percentile
+        # Never hedge sooner than this, however fast recent calls were
+        self.min_delay = min_delay
+        self.tracker = tracker or LatencyTracker()
+        self.budget = HedgeBudget(fraction)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def stats(self) -> dict:
+        delay = self.tracker.quantile(self.percentile)
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_after": round(delay, 3) if delay is not None else None,
+        }
+
+    async def _timed(self, call: Callable[[], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        result = await call()
+        self.tracker.record(time.monotonic() - started)
+        return result
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Await call(), hedged with a second call() if the first is slow and the budget allows."""
+        if not self.enabled:
+            return await call()
+        self.calls += 1
+        self.budget.earn()
+        primary = asyncio.ensure_future(self._timed(call))
+        pending = {primary}
+        try:
+            delay = self.tracker.quantile(self.percentile)
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=max(delay, self.min_delay))
+                if not done and self.budget.spend():
+                    self.hedges += 1
+                    pending.add(asyncio.ensure_future(self._timed(call)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            # Both attempts failed (or the only one did)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            # Let the loser close its connection before returning
+            await asyncio.gather(*pending, return_exceptions=True)
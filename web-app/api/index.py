@@ -1,15 +1,59 @@
-from fastapi import FastAPI, HTTPException, Response, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, Response, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import List
 from google.cloud import texttospeech
-from pypdf import PdfReader
 import os
-import io
+import asyncio
+import atexit
+import base64
+import hashlib
+import hmac
 import re
 import json
+import tempfile
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+from api.chunking import BACKEND_BYTE_LIMITS, plan_chunks, utf8_len
+from api.concurrency import AIMDController
+from api.mdtext import markdown_to_speech
+from api.pdf_backends import page_texts
+from api.profiling import profiled, profiler
+from api.ratelimit import ClientRateLimiter, FairQueue, QueueFull, client_id
+from api.usage import SERVICE_STATES, ServiceSwitch, UsageMeter, voice_tier
+from api.audio_store import AudioStore, serve_audio
+from api.singleflight import SingleFlight, normalize_text
+from api.scheduler import BULK, INTERACTIVE, NORMAL, PriorityScheduler
+from api.jobs import TERMINAL_STATES, JobStore, JobWorkers
+from api.hedging import Hedger
+from api import oggopus
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Jobs requeued after a restart would otherwise wait for the next submission
+    await asyncio.to_thread(job_workers.resume)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+class ProfileRequests:
+    """Profiles sampled /api/ requests (LITO_PROFILE), streamed response bodies included."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            return await self.app(scope, receive, send)
+        async with profiler.async_session(f"{scope['method']} {scope['path']}"):
+            await self.app(scope, receive, send)
+
+
+app.add_middleware(ProfileRequests)
 
 # Allow CORS
 app.add_middleware(
@@ -23,23 +67,139 @@ app.add_middleware(
 # Service kill switch - can be disabled via environment variable
 SERVICE_ENABLED = os.environ.get("SERVICE_ENABLED", "true").lower() == "true"
 
+# Runtime state of the kill switch: starts from SERVICE_ENABLED, then driven by
+# the usage meter and the admin endpoint without a restart
+service_switch = ServiceSwitch(SERVICE_ENABLED)
+
+# Usage meter store (Vercel only allows writes under /tmp)
+USAGE_STORE_PATH = os.environ.get("USAGE_STORE_PATH", os.path.join(tempfile.gettempdir(), "lito-usage.json"))
+usage_meter = UsageMeter(USAGE_STORE_PATH, service_switch)
+atexit.register(usage_meter.close)
+
+# Synthesized audio, addressable at /api/audio/{key}
+AUDIO_STORE_DIR = os.environ.get("AUDIO_STORE_DIR", os.path.join(tempfile.gettempdir(), "lito-audio"))
+AUDIO_STORE_MAX_BYTES = int(os.environ.get("AUDIO_STORE_MAX_BYTES", 200 * 1024 * 1024))
+audio_store = AudioStore(AUDIO_STORE_DIR, AUDIO_STORE_MAX_BYTES)
+
+# Concurrent identical requests (same demo text in many tabs) share one Google call
+synthesis_flights = SingleFlight()
+
+# Enables /api/admin/* when set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+SERVICE_UNAVAILABLE_DETAIL = (
+    "🚫 Demo service temporarily unavailable due to high usage. "
+    "Download Lito Desktop for unlimited, free text-to-speech: "
+    "https://github.com/1dragon-xyz/lito/releases"
+)
+
+# While throttled, every character counts this many times against client budgets
+THROTTLE_COST_FACTOR = 3
+
 # Character limit for demo (HOOK: enough to demo, triggers download desire)
 MAX_CHARS = 1500
 
+# Per-client character budget: a burst of two full demos, then a steady trickle
+RATE_LIMIT_BURST_CHARS = int(os.environ.get("RATE_LIMIT_BURST_CHARS", MAX_CHARS * 2))
+RATE_LIMIT_CHARS_PER_SEC = float(os.environ.get("RATE_LIMIT_CHARS_PER_SEC", "25"))
+
+# Synthesis requests admitted at once; the rest queue fairly per client
+FAIR_QUEUE_CONCURRENCY = int(os.environ.get("FAIR_QUEUE_CONCURRENCY", "8"))
+MAX_QUEUED_PER_CLIENT = int(os.environ.get("MAX_QUEUED_PER_CLIENT", "6"))
+
+# Browser playback chunks: small enough that the first one returns quickly
+CHUNK_MAX_BYTES = 1200
+
+# Bulk requests: items per call, and how many of them are synthesized at once
+# (kept under MAX_QUEUED_PER_CLIENT so a bulk call never trips QueueFull)
+MAX_BULK_ITEMS = 200
+BULK_CONCURRENCY = max(1, min(4, MAX_QUEUED_PER_CLIENT - 1))
+
+# Jobs: long documents synthesized server-side by background workers
+MAX_JOB_CHARS = int(os.environ.get("MAX_JOB_CHARS", "100000"))
+MAX_JOBS_PER_CLIENT = int(os.environ.get("MAX_JOBS_PER_CLIENT", "3"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_STORE_PATH = os.environ.get("JOB_STORE_PATH", os.path.join(tempfile.gettempdir(), "lito-jobs.sqlite"))
+# Job chunks stay under the character budget's burst so pacing never stalls
+JOB_CHUNK_MAX_BYTES = 2400
+JOB_EVENT_INTERVAL = 0.5
+# A chunk turned away by a full fair queue retries this often, then fails its job
+JOB_CHUNK_ATTEMPTS = 60
+JOB_QUEUE_RETRY_SECONDS = 1.0
+
+# Start synthesizing an uploaded file's first chunk while the browser is still
+# receiving the extracted text, so its first /api/tts call finds the audio ready
+SPECULATIVE_SYNTHESIS = os.environ.get("SPECULATIVE_SYNTHESIS", "true").lower() == "true"
+# Remembers the last voice used, for speculation when a client doesn't name one
+VOICE_COOKIE = "lito_voice"
+
 # Initialize Google Cloud TTS client
 # For Vercel: credentials from environment variable
 credentials_json = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_JSON")
 if credentials_json:
-    import tempfile
     with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
         f.write(credentials_json)
         os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = f.name
 
 client = texttospeech.TextToSpeechClient()
 
+# Adapts the number of concurrent Google TTS calls to what the upstream accepts
+tts_concurrency = AIMDController()
+
+# Interactive requests go ahead of chunk follow-ups, which go ahead of bulk and job work
+work_scheduler = PriorityScheduler(lambda: tts_concurrency.limit)
+tts_concurrency.on_limit_change(work_scheduler.poke)
+
+# Duplicates Google calls stuck past the p95 latency (LITO_HEDGE, off by default)
+hedger = Hedger()
+
+rate_limiter = ClientRateLimiter(RATE_LIMIT_BURST_CHARS, RATE_LIMIT_CHARS_PER_SEC)
+fair_queue = FairQueue(FAIR_QUEUE_CONCURRENCY, MAX_QUEUED_PER_CLIENT)
+
+# Durable queue for long documents, drained by background worker threads
+job_store = JobStore(JOB_STORE_PATH)
+job_workers = JobWorkers(job_store, lambda job: process_job(job), JOB_WORKERS)
+atexit.register(job_workers.stop, 1)
+
+# Output formats. Google's MP3 is 32 kbps; Opus is several times smaller for speech.
+# "mp3-16k" only lowers the sample rate to 16 kHz: Google does not let the MP3
+# bitrate be chosen, so it is a narrower-band MP3 rather than a smaller one, and
+# unlike the desktop app's "mp3-low" (24 kbps) it is not named for its size.
+# Opus is the compact format.
+AUDIO_FORMATS = {
+    "mp3": {"encoding": texttospeech.AudioEncoding.MP3, "sample_rate": None, "extension": ".mp3", "media_type": "audio/mpeg"},
+    "mp3-16k": {"encoding": texttospeech.AudioEncoding.MP3, "sample_rate": 16000, "extension": ".mp3", "media_type": "audio/mpeg"},
+    "opus": {"encoding": texttospeech.AudioEncoding.OGG_OPUS, "sample_rate": 24000, "extension": ".ogg", "media_type": "audio/ogg"},
+}
+DEFAULT_FORMAT = "mp3"
+
 class TTSRequest(BaseModel):
     text: str
     voice: str
+    format: str = DEFAULT_FORMAT
+    # Clients may mark follow-up chunks "normal"; "bulk" is for server-side batch work
+    priority: str = INTERACTIVE
+
+class BulkItem(BaseModel):
+    id: str
+    text: str
+    voice: str
+
+class BulkTTSRequest(BaseModel):
+    items: List[BulkItem]
+    format: str = DEFAULT_FORMAT
+    include_audio: bool = True
+
+class JobRequest(BaseModel):
+    text: str
+    voice: str
+    format: str = DEFAULT_FORMAT
+
+class ChunkRequest(BaseModel):
+    text: str
+
+class ServiceStateRequest(BaseModel):
+    state: str
 
 # 20 languages with male + female voices (40 total)
 SUPPORTED_VOICES = [
@@ -104,90 +264,457 @@ SUPPORTED_VOICES = [
     {"id": "sv-SE-Standard-A", "name": "Swedish (Female)", "gender": "Female", "locale": "sv-SE"},
     {"id": "sv-SE-Standard-B", "name": "Swedish (Male)", "gender": "Male", "locale": "sv-SE"},
 ]
+# The browser preselects the first voice
+DEFAULT_VOICE = SUPPORTED_VOICES[0]["id"]
+
+# Speculative syntheses in flight (the event loop only keeps weak references)
+speculative_tasks = set()
 
 @app.get("/api/voices")
 async def get_voices():
     return SUPPORTED_VOICES
 
 @app.post("/api/tts")
-async def text_to_speech(request: TTSRequest):
+async def text_to_speech(request: TTSRequest, http_request: Request):
     # Check if service is enabled (kill switch)
-    if not SERVICE_ENABLED:
+    if not service_switch.enabled:
+        raise HTTPException(status_code=503, detail=SERVICE_UNAVAILABLE_DETAIL)
+    
+    text = normalize_text(request.text)
+    language_code = validate_synthesis(text, request.voice, request.format)
+    if request.priority not in (INTERACTIVE, NORMAL):
+        raise HTTPException(status_code=400, detail="Priority must be interactive or normal")
+
+    # Replays are served from the audio store without touching budgets or Google
+    key = audio_cache_key(text, request.voice, request.format)
+    audio = await asyncio.to_thread(audio_store.read, key)
+    if audio is None:
+        client_key = client_id(http_request)
+        # Joining a call already in flight costs the upstream nothing, like a cache hit
+        if key not in synthesis_flights:
+            retry_after = rate_limiter.consume(client_key, synthesis_cost(text))
+            if retry_after:
+                if retry_after == float("inf"):
+                    raise HTTPException(status_code=400, detail="Text exceeds the per-client character budget.")
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many characters requested. Please slow down.",
+                    headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+                )
+
+        try:
+            audio = await synthesize_shared(key, text, request.voice, language_code, request.format, client_key,
+                                            request.priority)
+        except QueueFull:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests in flight. Please wait for earlier ones to finish.",
+                headers={"Retry-After": "1"}
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    response = Response(
+        content=audio,
+        media_type=AUDIO_FORMATS[request.format]["media_type"],
+        headers={"ETag": f'"{key}"', "Content-Location": f"/api/audio/{key}"}
+    )
+    response.set_cookie(VOICE_COOKIE, request.voice, max_age=365 * 24 * 3600, samesite="lax")
+    return response
+
+
+@app.post("/api/tts/bulk")
+async def bulk_text_to_speech(request: BulkTTSRequest, http_request: Request):
+    """
+    Synthesize many short, independent texts in one call. Results stream
+    back as NDJSON lines in completion order: {"id", "url", "audio"} with
+    base64 audio (omitted when include_audio is false), or {"id", "error"}.
+    """
+    if not service_switch.enabled:
+        raise HTTPException(status_code=503, detail=SERVICE_UNAVAILABLE_DETAIL)
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No items to synthesize")
+    if len(request.items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items per request.")
+    if request.format not in AUDIO_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(AUDIO_FORMATS)}")
+
+    client_key = client_id(http_request)
+    slots = asyncio.Semaphore(BULK_CONCURRENCY)
+
+    async def run_item(item: BulkItem) -> dict:
+        async with slots:
+            text = normalize_text(item.text)
+            try:
+                language_code = validate_synthesis(text, item.voice, request.format)
+                key = audio_cache_key(text, item.voice, request.format)
+                audio = await asyncio.to_thread(audio_store.read, key)
+                if audio is None:
+                    if key not in synthesis_flights:
+                        # Bulk callers are paced by their budget rather than rejected
+                        await wait_for_budget(client_key, text)
+                    audio = await synthesize_shared(key, text, item.voice, language_code, request.format, client_key, BULK)
+            except HTTPException as e:
+                return {"id": item.id, "error": e.detail}
+            except Exception as e:
+                return {"id": item.id, "error": str(e)}
+            result = {"id": item.id, "url": f"/api/audio/{key}"}
+            if request.include_audio:
+                result["audio"] = base64.b64encode(audio).decode("ascii")
+            return result
+
+    async def results():
+        tasks = [asyncio.create_task(run_item(item)) for item in request.items]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # Client went away: stop the rest
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+def join_audio(fmt: str, parts: List[bytes]) -> bytes:
+    """MP3 frames can simply follow each other; Ogg Opus parts are remuxed into one stream."""
+    if AUDIO_FORMATS[fmt]["encoding"] == texttospeech.AudioEncoding.OGG_OPUS:
+        return oggopus.join(parts)
+    return b"".join(parts)
+
+
+@profiled("job")
+async def process_job(job: dict) -> str:
+    """Synthesize a job chunk by chunk; returns the audio store key of the result."""
+    voice, fmt, client_key = job["voice"], job["format"], job["client"]
+    key = audio_cache_key(job["text"], voice, fmt)
+    if await asyncio.to_thread(audio_store.find, key):
+        return key
+    language_code = validate_synthesis(job["text"], voice, fmt, chunked=True)
+    slots = asyncio.Semaphore(BULK_CONCURRENCY)
+    done = 0
+
+    async def run_chunk(chunk: str) -> bytes:
+        nonlocal done
+        async with slots:
+            if not service_switch.enabled:
+                raise RuntimeError("Service temporarily unavailable due to high usage.")
+            # Each chunk is stored on its own, so a restarted job skips finished chunks
+            chunk_key = audio_cache_key(chunk, voice, fmt)
+            audio = await asyncio.to_thread(audio_store.read, chunk_key)
+            charged = False
+            for _ in range(JOB_CHUNK_ATTEMPTS):
+                if audio is not None:
+                    break
+                # Charged once per chunk, however often the fair queue turns it away
+                if not charged and chunk_key not in synthesis_flights:
+                    await wait_for_budget(client_key, chunk)
+                    charged = True
+                try:
+                    audio = await synthesize_shared(chunk_key, chunk, voice, language_code, fmt, client_key, BULK)
+                except QueueFull:
+                    await asyncio.sleep(JOB_QUEUE_RETRY_SECONDS)
+            else:
+                if audio is None:
+                    raise RuntimeError("The synthesis queue stayed full. Please try again later.")
+            done += 1
+            await asyncio.to_thread(job_store.progress, job["id"], done)
+            return audio
+
+    tasks = [asyncio.create_task(run_chunk(chunk)) for chunk in plan_chunks(job["text"], JOB_CHUNK_MAX_BYTES)]
+    try:
+        parts = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    audio = await asyncio.to_thread(join_audio, fmt, parts)
+    await asyncio.to_thread(audio_store.put, key, AUDIO_FORMATS[fmt]["extension"], audio)
+    return key
+
+
+def job_view(job: dict) -> dict:
+    if job["status"] == "done" and not audio_store.find(job["result_key"]):
+        # Pruned from the size-capped audio store
+        job_store.expire(job["id"])
+        job = job_store.get(job["id"]) or job
+    view = {
+        "id": job["id"],
+        "status": job["status"],
+        "done_chunks": job["done_chunks"],
+        "total_chunks": job["total_chunks"],
+    }
+    if job["status"] == "queued":
+        view["position"] = job_store.position(job["id"])
+    if job["status"] == "done":
+        view["url"] = f"/api/audio/{job['result_key']}"
+    if job["error"]:
+        view["error"] = job["error"]
+    return view
+
+
+async def get_job_or_404(job_id: str) -> dict:
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(request: JobRequest, http_request: Request):
+    if not service_switch.enabled:
+        raise HTTPException(status_code=503, detail=SERVICE_UNAVAILABLE_DETAIL)
+    text = normalize_text(request.text)
+    validate_synthesis(text, request.voice, request.format, chunked=True)
+    client_key = client_id(http_request)
+    if await asyncio.to_thread(job_store.active_for, client_key) >= MAX_JOBS_PER_CLIENT:
         raise HTTPException(
-            status_code=503,
-            detail="🚫 Demo service temporarily unavailable due to high usage. "
-                   "Download Lito Desktop for unlimited, free text-to-speech: "
-                   "https://github.com/1dragon-xyz/lito/releases"
+            status_code=429,
+            detail="Too many unfinished jobs. Wait for earlier ones to finish.",
+            headers={"Retry-After": "10"}
         )
-    
-    text = request.text.strip()
-    
+    job_id = await asyncio.to_thread(job_store.create, client_key, text, request.voice, request.format,
+                                     len(plan_chunks(text, JOB_CHUNK_MAX_BYTES)))
+    job_workers.notify()
+    return await asyncio.to_thread(job_view, await get_job_or_404(job_id))
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    return await asyncio.to_thread(job_view, await get_job_or_404(job_id))
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    await get_job_or_404(job_id)
+    await asyncio.to_thread(job_store.cancel, job_id)
+    return await asyncio.to_thread(job_view, await get_job_or_404(job_id))
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: one `status` event per change, until the job ends."""
+    await get_job_or_404(job_id)
+
+    async def events():
+        last = None
+        while True:
+            job = await asyncio.to_thread(job_store.get, job_id)
+            if job is None:
+                return
+            view = await asyncio.to_thread(job_view, job)
+            if view != last:
+                yield f"event: status\ndata: {json.dumps(view)}\n\n"
+                last = view
+            if job["status"] in TERMINAL_STATES:
+                return
+            await asyncio.sleep(JOB_EVENT_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str, http_request: Request):
+    job = await get_job_or_404(job_id)
+    if job["status"] == "done" and not await asyncio.to_thread(audio_store.find, job["result_key"]):
+        await asyncio.to_thread(job_store.expire, job_id)
+        job = await get_job_or_404(job_id)
+    if job["status"] == "expired":
+        raise HTTPException(status_code=410, detail=job["error"])
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return await get_audio(job["result_key"], http_request)
+
+@app.get("/api/queue")
+async def queue_depth():
+    """Job backlog (the number to scale workers on), synthesis slots by priority, and hedging."""
+    return {**await asyncio.to_thread(job_store.depth), "scheduler": work_scheduler.stats(), "hedging": hedger.stats()}
+
+
+@app.get("/api/audio/{key}")
+async def get_audio(key: str, http_request: Request):
+    path = await asyncio.to_thread(audio_store.find, key)
+    if not path:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    extension = os.path.splitext(path)[1]
+    media_type = next(f["media_type"] for f in AUDIO_FORMATS.values() if f["extension"] == extension)
+    return await asyncio.to_thread(serve_audio, path, key, media_type, http_request)
+
+
+def validate_synthesis(text: str, voice: str, fmt: str, chunked: bool = False) -> str:
+    """
+    Check a synthesis request; returns the voice's language code. Chunked
+    requests (jobs) are split server-side, so they get the job character limit
+    and no per-request byte limit.
+    """
     if not text:
         raise HTTPException(status_code=400, detail="Text cannot be empty")
     
-    if len(text) > MAX_CHARS:
+    max_chars = MAX_JOB_CHARS if chunked else MAX_CHARS
+    if len(text) > max_chars:
         raise HTTPException(
             status_code=400, 
-            detail=f"Text exceeds {MAX_CHARS} character limit. Download Lito Desktop for unlimited use."
+            detail=f"Text exceeds {max_chars} character limit. Download Lito Desktop for unlimited use."
         )
+
+    # Google's request limit is in bytes, which CJK/Vietnamese text reaches first
+    if not chunked and utf8_len(text) > BACKEND_BYTE_LIMITS["google"]:
+        raise HTTPException(status_code=400, detail="Text exceeds the synthesis byte limit. Split it into smaller chunks.")
     
     # Validate voice
-    valid_voice_ids = [v["id"] for v in SUPPORTED_VOICES]
-    if request.voice not in valid_voice_ids:
+    voice_info = next((v for v in SUPPORTED_VOICES if v["id"] == voice), None)
+    if voice_info is None:
         raise HTTPException(status_code=400, detail="Invalid voice selected")
-    
-    # Get locale from voice id
-    voice_info = next((v for v in SUPPORTED_VOICES if v["id"] == request.voice), None)
-    language_code = voice_info["locale"] if voice_info else "en-US"
 
+    if fmt not in AUDIO_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(AUDIO_FORMATS)}")
+    return voice_info["locale"]
+
+
+def synthesis_cost(text: str) -> int:
+    return len(text) * (THROTTLE_COST_FACTOR if service_switch.throttled else 1)
+
+
+async def wait_for_budget(client_key: str, text: str):
+    """Charge the client's character budget, sleeping until it allows the text."""
+    # Never ask for more than a full bucket, or a long chunk could never pass
+    cost = min(synthesis_cost(text), rate_limiter.capacity)
+    while True:
+        retry_after = rate_limiter.consume(client_key, cost)
+        if not retry_after:
+            return
+        await asyncio.sleep(retry_after)
+
+
+async def synthesize_shared(key: str, text: str, voice_name: str, language_code: str, fmt: str,
+                            client_key: str, priority: str = NORMAL) -> bytes:
+    """Synthesize and store under key, sharing the call with identical requests in flight."""
+    async def synthesize_and_store():
+        # An identical call may have finished and stored it after the caller looked
+        stored = await asyncio.to_thread(audio_store.read, key)
+        if stored is not None:
+            return stored
+        # Fair between clients first, then ordered by priority for Google slots
+        async with fair_queue.turn(client_key), work_scheduler.slot(priority):
+            result = await synthesize(text, voice_name, language_code, fmt)
+        await asyncio.to_thread(audio_store.put, key, AUDIO_FORMATS[fmt]["extension"], result)
+        return result
+
+    return await synthesis_flights.do(key, synthesize_and_store)
+
+
+def start_speculation(text: str, voice_name: str, fmt: str, client_key: str) -> bool:
+    """
+    Synthesize text in the background so a later identical /api/tts call is a
+    cache hit or joins the call in flight. Charged to the client's budget up
+    front, and skipped rather than queued when the budget is short or the
+    service is throttled. Returns whether synthesis was started or is cached.
+    """
+    if not SPECULATIVE_SYNTHESIS or not service_switch.enabled or service_switch.throttled:
+        return False
+    text = normalize_text(text)
     try:
-        synthesis_input = texttospeech.SynthesisInput(text=text)
-        
-        voice = texttospeech.VoiceSelectionParams(
-            language_code=language_code,
-            name=request.voice
-        )
-        
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3
-        )
-        
+        language_code = validate_synthesis(text, voice_name, fmt)
+    except HTTPException:
+        return False
+    key = audio_cache_key(text, voice_name, fmt)
+    if key in synthesis_flights or audio_store.find(key):
+        return True
+    if rate_limiter.consume(client_key, synthesis_cost(text)):
+        return False
+
+    task = asyncio.create_task(synthesize_shared(key, text, voice_name, language_code, fmt, client_key, INTERACTIVE))
+    speculative_tasks.add(task)
+    # A failed guess only costs the budget; the real request retries and reports it
+    task.add_done_callback(lambda t: (speculative_tasks.discard(t), t.cancelled() or t.exception()))
+    return True
+
+
+def audio_cache_key(text: str, voice_name: str, fmt: str) -> str:
+    """Identifies a synthesis result; the same key always yields the same audio."""
+    return hashlib.sha256(f"{voice_name}\0{fmt}\0{text}".encode("utf-8")).hexdigest()
+
+
+async def synthesize(text: str, voice_name: str, language_code: str, fmt: str = DEFAULT_FORMAT) -> bytes:
+    synthesis_input = texttospeech.SynthesisInput(text=text)
+
+    voice = texttospeech.VoiceSelectionParams(
+        language_code=language_code,
+        name=voice_name
+    )
+
+    audio_format = AUDIO_FORMATS[fmt]
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=audio_format["encoding"],
+        sample_rate_hertz=audio_format["sample_rate"] or 0
+    )
+
+    def call_google():
         response = client.synthesize_speech(
             input=synthesis_input,
             voice=voice,
             audio_config=audio_config
         )
-        
-        return Response(content=response.audio_content, media_type="audio/mpeg")
+        # Metered per upstream call: a hedged duplicate is billed too
+        usage_meter.record(voice_tier(voice_name), len(text))
+        return response
+
+    # The client is blocking; run it off the event loop under the AIMD limit.
+    # A hedge shares the slot, and a losing call's thread runs to completion.
+    async with tts_concurrency.slot():
+        response = await hedger.run(lambda: asyncio.to_thread(call_google))
+    return response.audio_content
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+def require_admin(http_request: Request):
+    token = http_request.headers.get("X-Admin-Token", "")
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@app.get("/api/admin/usage")
+async def get_usage(http_request: Request):
+    require_admin(http_request)
+    return usage_meter.snapshot()
+
+@app.post("/api/admin/service")
+async def set_service_state(request: ServiceStateRequest, http_request: Request):
+    require_admin(http_request)
+    if request.state not in SERVICE_STATES:
+        raise HTTPException(status_code=400, detail=f"State must be one of: {', '.join(SERVICE_STATES)}")
+    service_switch.set(request.state, "admin")
+    return {"state": service_switch.state}
 
 
 def clean_text(text: str) -> str:
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
+@app.post("/api/chunks")
+async def chunk_text(request: ChunkRequest):
+    text = request.text.strip()
+    if len(text) > MAX_CHARS:
+        raise HTTPException(status_code=400, detail=f"Text exceeds {MAX_CHARS} character limit.")
+    return {"chunks": plan_chunks(text, CHUNK_MAX_BYTES)}
+
 @app.post("/api/extract-text")
-async def extract_text(file: UploadFile = File(...)):
+async def extract_text(http_request: Request, file: UploadFile = File(...),
+                       voice: str = Form(""), format: str = Form(DEFAULT_FORMAT)):
     try:
         content = await file.read()
         filename = file.filename.lower()
         extracted_text = ""
 
         if filename.endswith(".pdf"):
-            pdf_file = io.BytesIO(content)
-            reader = PdfReader(pdf_file)
-            for page in reader.pages:
-                text = page.extract_text()
+            # Fastest installed backend (LITO_PDF_BACKEND pins one)
+            for text in page_texts(content):
                 if text:
                     extracted_text += text + "\n"
+        elif filename.endswith(".md"):
+            # Keeps paragraph breaks, which the chunker splits on
+            extracted_text = markdown_to_speech(content.decode("utf-8"))
         else:
-            # Assume text/md
+            # Assume plain text
             extracted_text = content.decode("utf-8")
         
         # Clean up
-        final_text = clean_text(extracted_text)
+        final_text = extracted_text if filename.endswith(".md") else clean_text(extracted_text)
         
         if not final_text:
              raise HTTPException(status_code=400, detail="Could not extract text from file")
@@ -196,7 +723,17 @@ async def extract_text(file: UploadFile = File(...)):
         if len(final_text) > MAX_CHARS:
             final_text = final_text[:MAX_CHARS]
 
-        return {"text": final_text, "truncated": len(extracted_text) > MAX_CHARS}
+        chunks = plan_chunks(final_text, CHUNK_MAX_BYTES)
+        # The browser asks for the first chunk next, in the voice last used
+        voice = voice or http_request.cookies.get(VOICE_COOKIE) or DEFAULT_VOICE
+        prefetched = bool(chunks) and start_speculation(chunks[0], voice, format, client_id(http_request))
+
+        return {
+            "text": final_text,
+            "chunks": chunks,
+            "truncated": len(extracted_text) > MAX_CHARS,
+            "prefetched": prefetched
+        }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process file: {str(e)}")
@@ -0,0 +1,206 @@
+"""
+Durable job queue for documents too long to synthesize within one request.
+
+Jobs live in SQLite, so queued work survives a restart: jobs that were
+running when the process died go back to the queue on startup. A small pool
+of worker threads claims jobs oldest first and runs them on their own event
+loops.
+"""
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from typing import Awaitable, Callable, Dict, Optional
+
+# expired: done, but the result has since been pruned from the audio store
+TERMINAL_STATES = ("done", "failed", "cancelled", "expired")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobStore:
+    def __init__(self, path: str, retention_seconds: float = 24 * 3600):
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                client TEXT,
+                status TEXT,
+                text TEXT,
+                voice TEXT,
+                format TEXT,
+                total_chunks INTEGER,
+                done_chunks INTEGER DEFAULT 0,
+                result_key TEXT,
+                error TEXT,
+                created REAL,
+                updated REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created);
+        """)
+        # Whatever was running when the process stopped starts over
+        with self._db:
+            self._db.execute("UPDATE jobs SET status = 'queued', done_chunks = 0 WHERE status = 'running'")
+
+    def create(self, client: str, text: str, voice: str, fmt: str, total_chunks: int) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (id, client, status, text, voice, format, total_chunks, created, updated) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?, ?)",
+                (job_id, client, text, voice, fmt, total_chunks, now, now),
+            )
+        return job_id
+
+    def claim(self) -> Optional[Dict]:
+        """Take the oldest queued job, or None."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(TERMINAL_STATES))}) AND updated < ?",
+                (*TERMINAL_STATES, now - self.retention_seconds),
+            )
+            row = self._db.execute(
+                "UPDATE jobs SET status = 'running', updated = ? WHERE id = "
+                "(SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1) RETURNING *",
+                (now,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def _set(self, job_id: str, only_if: str, **fields) -> bool:
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND status = ?",
+                (*fields.values(), job_id, only_if),
+            )
+        return cursor.rowcount == 1
+
+    def progress(self, job_id: str, done_chunks: int):
+        """Record progress; raises JobCancelled if the job was cancelled meanwhile."""
+        # Chunks report from worker threads, so an older count may land after a newer one
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "UPDATE jobs SET done_chunks = MAX(done_chunks, ?), updated = ? WHERE id = ? AND status = 'running'",
+                (done_chunks, time.time(), job_id),
+            )
+        if cursor.rowcount != 1:
+            raise JobCancelled(job_id)
+
+    def finish(self, job_id: str, result_key: str):
+        # The text is no longer needed once the audio exists
+        self._set(job_id, "running", status="done", result_key=result_key, text="")
+
+    def expire(self, job_id: str):
+        """The result of a done job is gone; it has to be submitted again."""
+        self._set(job_id, "done", status="expired", error="The result has expired. Please submit the job again.")
+
+    def fail(self, job_id: str, error: str):
+        self._set(job_id, "running", status="failed", error=error)
+
+    def cancel(self, job_id: str) -> bool:
+        return (self._set(job_id, "queued", status="cancelled")
+                or self._set(job_id, "running", status="cancelled"))
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Jobs ahead of this one in the queue, or None if it is not queued."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created < "
+                "(SELECT created FROM jobs WHERE id = ? AND status = 'queued')",
+                (job_id,),
+            ).fetchone()
+            queued = self._db.execute(
+                "SELECT 1 FROM jobs WHERE id = ? AND status = 'queued'", (job_id,)
+            ).fetchone()
+        return row[0] if queued else None
+
+    def active_for(self, client: str) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE client = ? AND status IN ('queued', 'running')", (client,)
+            ).fetchone()[0]
+
+    def depth(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE status IN ('queued', 'running') GROUP BY status"
+            ).fetchall())
+            oldest = self._db.execute("SELECT MIN(created) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "oldest_queued_seconds": round(time.time() - oldest, 1) if oldest else 0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class JobWorkers:
+    """
+    Worker threads that run `process(job)` for each claimed job. Started
+    lazily on the first submission, or at startup if jobs survived a
+    restart; idle workers sleep on an event that submissions set.
+    """
+
+    def __init__(self, store: JobStore, process: Callable[[Dict], Awaitable[str]], concurrency: int = 2):
+        self.store = store
+        self.process = process
+        self.concurrency = concurrency
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def notify(self):
+        """A job was queued; start workers if needed and wake one."""
+        with self._start_lock:
+            if not self._threads:
+                for n in range(self.concurrency):
+                    thread = threading.Thread(target=self._run, name=f"lito-job-{n}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+        self._wakeup.set()
+
+    def resume(self):
+        """Start workers for jobs left queued by a previous process."""
+        if self.store.depth()["queued"]:
+            self.notify()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            job = self.store.claim()
+            if job is None:
+                self._wakeup.wait(timeout=5)
+                self._wakeup.clear()
+                continue
+            try:
+                result_key = asyncio.run(self.process(job))
+            except JobCancelled:
+                continue
+            except Exception as e:
+                self.store.fail(job["id"], str(e))
+                continue
+            self.store.finish(job["id"], result_key)
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
@@ -0,0 +1,156 @@
+"""
+Joining Ogg Opus files into one stream.
+
+Concatenated Ogg Opus files form a chained stream, which many players stop
+playing after the first link or report with the wrong duration. join()
+instead repaginates every part's audio packets into one logical stream
+under the first part's headers, with granule positions recomputed from the
+packets themselves. public/app.js does the same for downloads assembled in
+the browser.
+"""
+import struct
+from typing import Iterator, List, Tuple
+
+# Packets per output page; keeps pages around the usual few kilobytes
+PACKETS_PER_PAGE = 32
+HEADER = struct.Struct("<4sBBqIII B")
+
+FLAG_BOS = 0x02
+FLAG_EOS = 0x04
+
+
+def _crc_table() -> List[int]:
+    table = []
+    for n in range(256):
+        crc = n << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+
+CRC_TABLE = _crc_table()
+
+
+def ogg_crc(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ CRC_TABLE[(crc >> 24) ^ byte]
+    return crc
+
+
+def iter_pages(data: bytes) -> Iterator[Tuple[int, int, int, List[bytes], bool]]:
+    """(flags, granule, serial, segments' packet pieces, last piece completes a packet) per page."""
+    offset = 0
+    while offset < len(data):
+        if data[offset:offset + 4] != b"OggS":
+            raise ValueError("Not an Ogg stream")
+        _, _, flags, granule, serial, _, _, count = HEADER.unpack_from(data, offset)
+        lacing = data[offset + HEADER.size:offset + HEADER.size + count]
+        position = offset + HEADER.size + count
+        pieces, piece = [], bytearray()
+        for value in lacing:
+            piece += data[position:position + value]
+            position += value
+            if value < 255:
+                pieces.append(bytes(piece))
+                piece = bytearray()
+        complete = not lacing or lacing[-1] < 255
+        if not complete:
+            pieces.append(bytes(piece))
+        yield flags, granule, serial, pieces, complete
+        offset = position
+
+
+def packets(data: bytes) -> List[bytes]:
+    """The packets of the first logical stream in data."""
+    result, partial, serial = [], b"", None
+    for _, _, page_serial, pieces, complete in iter_pages(data):
+        if serial is None:
+            serial = page_serial
+        elif page_serial != serial:
+            break
+        for n, piece in enumerate(pieces):
+            partial += piece
+            if n < len(pieces) - 1 or complete:
+                result.append(partial)
+                partial = b""
+    return result
+
+
+def packet_samples(packet: bytes) -> int:
+    """Duration of an Opus packet in 48 kHz samples, from its TOC byte (RFC 6716 3.1)."""
+    if not packet:
+        return 0
+    config, code = packet[0] >> 3, packet[0] & 0x03
+    if config < 12:
+        frame = (480, 960, 1920, 2880)[config % 4]
+    elif config < 16:
+        frame = (480, 960)[config % 2]
+    else:
+        frame = (120, 240, 480, 960)[config % 4]
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+    return frame * frames
+
+
+def _page(flags: int, granule: int, serial: int, sequence: int, page_packets: List[bytes]) -> bytes:
+    lacing = bytearray()
+    for packet in page_packets:
+        lacing += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+    if len(lacing) > 255:
+        raise ValueError("Too many segments for one Ogg page")
+    header = HEADER.pack(b"OggS", 0, flags, granule, serial, sequence, 0, len(lacing))
+    page = header + bytes(lacing) + b"".join(page_packets)
+    return page[:22] + struct.pack("<I", ogg_crc(page)) + page[26:]
+
+
+def join(parts: List[bytes]) -> bytes:
+    """One Ogg Opus stream playing each part in turn."""
+    if len(parts) == 1:
+        return parts[0]
+    head = tags = None
+    audio: List[bytes] = []
+    trim = 0
+    for part in parts:
+        part_packets = packets(part)
+        if len(part_packets) < 2 or not part_packets[0].startswith(b"OpusHead"):
+            raise ValueError("Not an Ogg Opus stream")
+        if head is None:
+            head, tags = part_packets[0], part_packets[1]
+        elif part_packets[0][9:10] != head[9:10]:
+            raise ValueError("Parts have different channel counts")
+        audio.extend(part_packets[2:])
+        # Samples the last part trims from its end: its final granule falls short of its packets
+        final_granule = max(granule for _, granule, _, _, _ in iter_pages(part))
+        trim = max(0, sum(packet_samples(p) for p in part_packets[2:]) - final_granule)
+
+    serial = next(iter_pages(parts[0]))[2]
+    pages = [_page(FLAG_BOS, 0, serial, 0, [head]), _page(0, 0, serial, 1, [tags])]
+    # Granules count every decoded sample; players subtract the first part's pre-skip
+    granule = 0
+    batches = list(_batches(audio))
+    for n, batch in enumerate(batches):
+        granule += sum(packet_samples(p) for p in batch)
+        last = n == len(batches) - 1
+        page_granule = granule - trim if last else granule
+        pages.append(_page(FLAG_EOS if last else 0, page_granule, serial, len(pages), batch))
+    return b"".join(pages)
+
+
+def _batches(audio: List[bytes]) -> Iterator[List[bytes]]:
+    """Whole packets per page, within Ogg's 255 lacing values."""
+    batch, segments = [], 0
+    for packet in audio:
+        needed = len(packet) // 255 + 1
+        if batch and (segments + needed > 255 or len(batch) == PACKETS_PER_PAGE):
+            yield batch
+            batch, segments = [], 0
+        batch.append(packet)
+        segments += needed
+    if batch:
+        yield batch
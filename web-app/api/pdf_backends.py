@@ -0,0 +1,159 @@
+"""
+Interchangeable PDF text extractors.
+
+pypdf is always available. PyMuPDF and pypdfium2 are several times faster
+and are used automatically when installed; LITO_PDF_BACKEND pins one by name.
+
+Shared with web-app/api/pdf_backends.py; web-app/tests/test_shared_modules.py fails if the copies differ.
+"""
+import io
+import os
+import abc
+import time
+import difflib
+from typing import Dict, Iterator, List, Optional, Union
+from pypdf import PdfReader
+
+# A file path or the raw bytes of an uploaded file
+PdfSource = Union[str, bytes]
+
+# Fastest first
+PREFERENCE = ("pymupdf", "pypdfium2", "pypdf")
+BACKEND_ENV = "LITO_PDF_BACKEND"
+
+
+class PdfBackend(abc.ABC):
+    name = ""
+
+    @abc.abstractmethod
+    def available(self) -> bool:
+        """True if the backend's library can be imported."""
+
+    @abc.abstractmethod
+    def page_texts(self, source: PdfSource) -> Iterator[str]:
+        """Text of each page, in order."""
+
+
+class PypdfBackend(PdfBackend):
+    name = "pypdf"
+
+    def available(self) -> bool:
+        return True
+
+    def page_texts(self, source: PdfSource) -> Iterator[str]:
+        reader = PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+
+
+class PyMuPDFBackend(PdfBackend):
+    name = "pymupdf"
+
+    def available(self) -> bool:
+        try:
+            import fitz  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def page_texts(self, source: PdfSource) -> Iterator[str]:
+        import fitz
+        document = fitz.open(stream=source, filetype="pdf") if isinstance(source, bytes) else fitz.open(source)
+        try:
+            for page in document:
+                yield page.get_text("text")
+        finally:
+            document.close()
+
+
+class PdfiumBackend(PdfBackend):
+    name = "pypdfium2"
+
+    def available(self) -> bool:
+        try:
+            import pypdfium2  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def page_texts(self, source: PdfSource) -> Iterator[str]:
+        import pypdfium2
+        document = pypdfium2.PdfDocument(source)
+        try:
+            for index in range(len(document)):
+                page = document[index]
+                textpage = page.get_textpage()
+                try:
+                    yield textpage.get_text_range()
+                finally:
+                    textpage.close()
+                    page.close()
+        finally:
+            document.close()
+
+
+BACKENDS: Dict[str, PdfBackend] = {
+    backend.name: backend for backend in (PyMuPDFBackend(), PdfiumBackend(), PypdfBackend())
+}
+
+
+def available_backends() -> List[str]:
+    return [name for name in PREFERENCE if BACKENDS[name].available()]
+
+
+def select_backend(name: Optional[str] = None) -> PdfBackend:
+    """The named backend, else the one pinned by LITO_PDF_BACKEND, else the fastest installed."""
+    name = name or os.environ.get(BACKEND_ENV)
+    if name:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown PDF backend '{name}'; choose from: {', '.join(PREFERENCE)}")
+        if not BACKENDS[name].available():
+            raise ValueError(f"PDF backend '{name}' is not installed")
+        return BACKENDS[name]
+    return BACKENDS[available_backends()[0]]
+
+
+def page_texts(source: PdfSource, backend: Optional[str] = None) -> Iterator[str]:
+    return select_backend(backend).page_texts(source)
+
+
+def _similarity(reference: str, text: str) -> float:
+    # Compared word by word: backends differ mostly in whitespace and line breaks
+    return difflib.SequenceMatcher(None, reference.split(), text.split(), autojunk=False).ratio()
+
+
+def compare_backends(paths: List[str], backends: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Extract every file with each backend. Reports pages/sec and how closely
+    each backend's text matches pypdf's (1.0 = same words in the same order).
+    """
+    results = []
+    reference: Dict[str, str] = {}
+    for name in ["pypdf"] + [b for b in (backends or available_backends()) if b != "pypdf"]:
+        backend = BACKENDS[name]
+        pages = 0
+        extracted = {}
+        started = time.perf_counter()
+        for path in paths:
+            texts = list(backend.page_texts(path))
+            pages += len(texts)
+            extracted[path] = "\n".join(texts)
+        elapsed = time.perf_counter() - started
+        if name == "pypdf":
+            reference = extracted
+        similarities = [_similarity(reference[path], extracted[path]) for path in paths]
+        results.append({
+            "backend": name,
+            "pages": pages,
+            "seconds": round(elapsed, 3),
+            "pages_per_sec": round(pages / elapsed, 1) if elapsed else 0.0,
+            "similarity": round(sum(similarities) / len(similarities), 4) if similarities else 1.0,
+        })
+    return results
+
+
+def format_report(results: List[Dict]) -> str:
+    lines = [f"{'backend':<10} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'vs pypdf':>8}"]
+    for r in results:
+        lines.append(f"{r['backend']:<10} {r['pages']:>6} {r['seconds']:>8.3f} {r['pages_per_sec']:>8.1f} {r['similarity']:>8.4f}")
+    return "\n".join(lines)
@@ -0,0 +1,190 @@
+"""
+Opt-in profiling of conversions and API requests.
+
+LITO_PROFILE is the fraction of calls to profile: 1 profiles every call,
+0.01 one call in a hundred, and unset or 0 turns profiling off. Low rates keep
+the overhead small enough to leave it on in production. Each profiled call
+writes two files to LITO_PROFILE_DIR (default: <tmp>/lito-profiles):
+
+  <stamp>-<name>.prof  cProfile stats, for pstats or snakeviz
+  <stamp>-<name>.txt   top functions, top allocations and event-loop lag
+
+cProfile and tracemalloc are process-wide, so only one call is profiled at a
+time. Calls that overlap it run unprofiled. While a coroutine is profiled,
+whatever else runs on its event loop is profiled with it.
+
+Shared with web-app/api/profiling.py; web-app/tests/test_shared_modules.py fails if the copies differ.
+"""
+import io
+import os
+import re
+import sys
+import time
+import uuid
+import pstats
+import random
+import tempfile
+import asyncio
+import cProfile
+import functools
+import inspect
+import threading
+import tracemalloc
+from contextlib import asynccontextmanager, contextmanager
+from typing import List, Optional
+
+PROFILE_ENV = "LITO_PROFILE"
+PROFILE_DIR_ENV = "LITO_PROFILE_DIR"
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+# Stack frames kept per allocation; more frames cost more while tracing
+TRACEMALLOC_FRAMES = 5
+# How often a profiled coroutine checks that its event loop is responsive
+LAG_INTERVAL = 0.05
+
+
+class ProfileSession:
+    def __init__(self, name: str):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.lag_samples: List[float] = []
+        self.report_path: Optional[str] = None
+        self._owns_tracing = False
+
+    def start(self):
+        # Raises ValueError if another profiler is already active
+        self.profile.enable()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._owns_tracing = True
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.profile.disable()
+        self.elapsed = time.perf_counter() - self.started
+        self.peak_bytes = tracemalloc.get_traced_memory()[1]
+        self.snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        if self._owns_tracing:
+            tracemalloc.stop()
+
+    def write(self, directory: str) -> str:
+        """Write the .prof and .txt files; returns the report's path."""
+        os.makedirs(directory, exist_ok=True)
+        label = re.sub(r"[^\w.-]+", "_", self.name).strip("_")
+        stem = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}-{label}")
+        self.profile.dump_stats(stem + ".prof")
+
+        out = io.StringIO()
+        out.write(f"{self.name}: {self.elapsed:.3f}s, peak traced memory {self.peak_bytes / 1024:.0f} KiB\n")
+        out.write("\n== Top functions (cumulative) ==\n")
+        pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        out.write("== Top allocations still held ==\n")
+        for stat in self.snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            out.write(f"{stat}\n")
+        out.write("\n== Event loop lag ==\n")
+        out.write(self._lag_summary() + "\n")
+
+        self.report_path = stem + ".txt"
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+        return self.report_path
+
+    def _lag_summary(self) -> str:
+        if not self.lag_samples:
+            return "not sampled (synchronous call)"
+        samples = sorted(self.lag_samples)
+        p50 = samples[len(samples) // 2]
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return (f"{len(samples)} samples every {LAG_INTERVAL * 1000:.0f} ms: "
+                f"p50 {p50 * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, max {samples[-1] * 1000:.1f} ms")
+
+
+async def _sample_lag(samples: List[float]):
+    """Record how late each short sleep wakes up: time the loop spent blocked."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + LAG_INTERVAL
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+class Profiler:
+    def __init__(self, rate: float = 0.0, directory: Optional[str] = None):
+        self._active = threading.Lock()
+        self.configure(rate, directory)
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        return cls(float(os.environ.get(PROFILE_ENV) or 0), os.environ.get(PROFILE_DIR_ENV))
+
+    def configure(self, rate: float, directory: Optional[str] = None):
+        self.rate = max(0.0, min(1.0, rate))
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "lito-profiles")
+
+    def _start(self, name: str) -> Optional[ProfileSession]:
+        if not self.rate or random.random() >= self.rate:
+            return None
+        if not self._active.acquire(blocking=False):
+            return None
+        session = ProfileSession(name)
+        try:
+            session.start()
+        except ValueError:
+            self._active.release()
+            return None
+        return session
+
+    def _finish(self, session: ProfileSession):
+        try:
+            session.stop()
+            path = session.write(self.directory)
+            print(f"Profile written to {path}", file=sys.stderr)
+        except Exception as e:
+            print(f"Profiling error: {e}", file=sys.stderr)
+        finally:
+            self._active.release()
+
+    @contextmanager
+    def session(self, name: str):
+        """Profile the block if this call is sampled; yields the ProfileSession or None."""
+        session = self._start(name)
+        try:
+            yield session
+        finally:
+            if session:
+                self._finish(session)
+
+    @asynccontextmanager
+    async def async_session(self, name: str):
+        """Like session(), and also samples the running event loop's lag."""
+        session = self._start(name)
+        sampler = asyncio.create_task(_sample_lag(session.lag_samples)) if session else None
+        try:
+            yield session
+        finally:
+            if session:
+                sampler.cancel()
+                self._finish(session)
+
+
+# Configured from the environment; the CLI's --profile overrides it
+profiler = Profiler.from_env()
+
+
+def profiled(name: str):
+    """Decorator: profile sampled calls of a function or coroutine function."""
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                async with profiler.async_session(name):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with profiler.session(name):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,159 @@
+"""
+Per-client character budgets and fair request scheduling for the TTS API.
+"""
+import os
+import time
+import asyncio
+import threading
+import collections
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import Request
+
+CLIENT_HEADER = "X-Lito-Client"
+# Comma-separated client keys handed out to integrators. Any other header
+# value is ignored: a caller could otherwise rotate it for a fresh budget.
+CLIENT_KEYS_ENV = "LITO_CLIENT_KEYS"
+issued_client_keys = frozenset(k.strip() for k in os.environ.get(CLIENT_KEYS_ENV, "").split(",") if k.strip())
+
+
+def client_id(request: Request) -> str:
+    """
+    Identify the caller by an issued client key, else by the originating IP
+    (Vercel's proxy sets X-Forwarded-For to the connecting address).
+    """
+    key = (request.headers.get(CLIENT_HEADER) or "").strip()
+    if key in issued_client_keys:
+        return f"key:{key}"
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, amount: float) -> float:
+        """Take `amount` tokens. Returns 0 on success, else seconds until they would be available."""
+        self._refill(time.monotonic())
+        if amount <= self.tokens:
+            self.tokens -= amount
+            return 0.0
+        if amount > self.capacity:
+            return float("inf")
+        return (amount - self.tokens) / self.rate
+
+
+class ClientRateLimiter:
+    """A token bucket per client, measured in characters."""
+
+    def __init__(self, capacity: float, rate: float, max_clients: int = 10000):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_clients = max_clients
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, client: str, chars: int) -> float:
+        with self._lock:
+            bucket = self._buckets.pop(client, None)
+            if bucket is None:
+                bucket = TokenBucket(self.capacity, self.rate)
+            self._buckets[client] = bucket
+            # Least recently seen clients go first; a fresh bucket is full anyway
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return bucket.consume(chars)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class FairQueue:
+    """
+    Limits concurrent work and hands free slots to waiting clients in
+    round-robin order, so a client with many queued requests cannot starve
+    one with a single request.
+    """
+
+    def __init__(self, concurrency: int, max_waiting_per_client: Optional[int] = None):
+        self.concurrency = concurrency
+        self.max_waiting_per_client = max_waiting_per_client
+        self._active = 0
+        self._waiting = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(q) for q in self._waiting.values())
+
+    async def acquire(self, client: str):
+        with self._lock:
+            if self._active < self.concurrency and not self._waiting:
+                self._active += 1
+                return
+            queue = self._waiting.setdefault(client, collections.deque())
+            if self.max_waiting_per_client is not None and len(queue) >= self.max_waiting_per_client:
+                if not queue:
+                    del self._waiting[client]
+                raise QueueFull(client)
+            future = asyncio.get_running_loop().create_future()
+            queue.append(future)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                queue = self._waiting.get(client)
+                if queue and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self._waiting[client]
+                    future = None
+            if future is not None and future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        # Caller holds the lock
+        while self._waiting and self._active < self.concurrency:
+            client, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiting.move_to_end(client)
+            else:
+                del self._waiting[client]
+            if future.done():
+                continue
+            self._active += 1
+            future.get_loop().call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def turn(self, client: str):
+        await self.acquire(client)
+        try:
+            yield
+        finally:
+            self.release()
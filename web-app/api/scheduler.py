@@ -0,0 +1,130 @@
+"""
+Priority scheduling of synthesis work across interactive, normal and bulk requests.
+
+Shared with web-app/api/scheduler.py; web-app/tests/test_shared_modules.py fails if the copies differ.
+"""
+import time
+import asyncio
+import itertools
+import threading
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional, Union
+
+INTERACTIVE = "interactive"
+NORMAL = "normal"
+BULK = "bulk"
+# Highest priority first
+PRIORITIES = (INTERACTIVE, NORMAL, BULK)
+
+
+class PriorityScheduler:
+    """
+    Admits at most `capacity` requests at once, highest priority first.
+
+    `reservations` holds slots back for a class: other classes may not take
+    them while that class is using fewer. At least one slot is always left
+    open to every class, so a small capacity cannot stall bulk work entirely.
+    A waiting request is promoted one class for every `aging_seconds` it has
+    waited, so a steady stream of higher-priority work cannot starve it.
+
+    capacity may be a callable (e.g. the AIMD controller's current limit).
+    Waiters may sit on different event loops, as with AIMDController.
+    """
+
+    def __init__(self, capacity: Union[int, Callable[[], int]],
+                 reservations: Optional[Dict[str, int]] = None, aging_seconds: float = 5.0):
+        self._capacity = capacity if callable(capacity) else (lambda: capacity)
+        self.reservations = {INTERACTIVE: 1} if reservations is None else reservations
+        self.aging_seconds = aging_seconds
+        self._running = {priority: 0 for priority in PRIORITIES}
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return max(1, int(self._capacity()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            waiting = {priority: 0 for priority in PRIORITIES}
+            for _, _, priority, _ in self._waiters:
+                waiting[priority] += 1
+            return {"capacity": self.capacity, "running": dict(self._running), "waiting": waiting}
+
+    def _can_start(self, priority: str) -> bool:
+        # Caller holds the lock
+        capacity = self.capacity
+        free = capacity - sum(self._running.values())
+        held = sum(max(0, self.reservations.get(other, 0) - self._running[other])
+                   for other in PRIORITIES if other != priority)
+        return free > min(held, capacity - 1)
+
+    def _rank(self, waiter, now: float) -> tuple:
+        sequence, enqueued, priority, _ = waiter
+        aged = int((now - enqueued) / self.aging_seconds) if self.aging_seconds else 0
+        return (max(0, PRIORITIES.index(priority) - aged), sequence)
+
+    async def acquire(self, priority: str = NORMAL):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'")
+        with self._lock:
+            if not self._waiters and self._can_start(priority):
+                self._running[priority] += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            waiter = (next(self._sequence), time.monotonic(), priority, future)
+            self._waiters.append(waiter)
+            # Capacity may have grown, or this request outranks the queue
+            self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    future = None
+            # Granted just before cancellation: hand the slot back
+            if future is not None and future.done() and not future.cancelled():
+                self.release(priority)
+            raise
+
+    def release(self, priority: str):
+        with self._lock:
+            self._running[priority] -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        # Caller holds the lock
+        now = time.monotonic()
+        while self._waiters:
+            startable = [w for w in self._waiters if self._can_start(w[2])]
+            if not startable:
+                return
+            waiter = min(startable, key=lambda w: self._rank(w, now))
+            self._waiters.remove(waiter)
+            _, _, priority, future = waiter
+            if future.done():
+                continue
+            self._running[priority] += 1
+            future.get_loop().call_soon_threadsafe(self._grant, future, priority)
+
+    def _grant(self, future, priority: str):
+        if future.cancelled():
+            self.release(priority)
+        else:
+            future.set_result(None)
+
+    def poke(self):
+        """Re-check waiters after the capacity callable's value grew (see AIMDController.on_limit_change)."""
+        with self._lock:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str = NORMAL):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(priority)
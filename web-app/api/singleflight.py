@@ -0,0 +1,79 @@
+"""
+Coalesces concurrent identical synthesis calls into one upstream request.
+
+Shared with web-app/api/singleflight.py; web-app/tests/test_shared_modules.py fails if the copies differ.
+"""
+import re
+import asyncio
+import threading
+import unicodedata
+import concurrent.futures
+from typing import Awaitable, Callable, Hashable
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form for keys: NFC (Vietnamese diacritics have several encodings) and single spaces."""
+    return unicodedata.normalize("NFC", re.sub(r'\s+', ' ', text).strip())
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+class SingleFlight:
+    """
+    The first caller for a key runs the work; callers arriving while it is in
+    flight await the same result. Results are shared through thread-safe
+    futures, so callers may sit on different event loops.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = concurrent.futures.Future()
+                    self._calls[key] = future
+
+            if leader:
+                return await self._lead(key, future, fn)
+
+            try:
+                # Shielded so a follower giving up does not cancel the shared call
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _LeaderCancelled:
+                # The leader's caller went away; retry and let one follower take over
+                continue
+
+    async def _lead(self, key, future, fn):
+        # The key is released before the outcome is published, so a caller
+        # woken by it never finds the finished call still registered
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._forget(key, future)
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            self._forget(key, future)
+            future.set_exception(e)
+            raise
+        self._forget(key, future)
+        future.set_result(result)
+        return result
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
@@ -0,0 +1,177 @@
+"""
+In-process usage meter and runtime kill switch for the TTS API.
+
+Counting happens in memory on every request; a background thread flushes
+totals to a local JSON store in batches, so the request path never does I/O.
+"""
+import os
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# Same thresholds as scripts/budget-monitor.py
+THRESHOLD_WARNING_1 = 0.50  # 50%
+THRESHOLD_WARNING_2 = 0.70  # 70%
+THRESHOLD_SHUTDOWN = 0.80   # 80%
+
+# Monthly free-tier characters per voice tier (Google Cloud TTS pricing)
+FREE_TIER_CHARS = {
+    "standard": 4_000_000,
+    "premium": 1_000_000,  # WaveNet / Neural2
+}
+
+ENABLED = "enabled"
+THROTTLED = "throttled"
+DISABLED = "disabled"
+SERVICE_STATES = (ENABLED, THROTTLED, DISABLED)
+
+
+def voice_tier(voice_id: str) -> str:
+    return "premium" if ("Neural2" in voice_id or "Wavenet" in voice_id) else "standard"
+
+
+def current_month() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m")
+
+
+class ServiceSwitch:
+    """Runtime-toggleable service state: enabled, throttled or disabled."""
+
+    def __init__(self, enabled: bool = True):
+        self.state = ENABLED if enabled else DISABLED
+        self.reason = "" if enabled else "SERVICE_ENABLED=false"
+
+    @property
+    def enabled(self) -> bool:
+        return self.state != DISABLED
+
+    @property
+    def throttled(self) -> bool:
+        return self.state == THROTTLED
+
+    def set(self, state: str, reason: str = ""):
+        if state not in SERVICE_STATES:
+            raise ValueError(f"Unknown service state: {state}")
+        if state != self.state:
+            print(f"Service state: {self.state} -> {state} {reason}".rstrip())
+        self.state = state
+        self.reason = reason
+
+
+class UsageMeter:
+    def __init__(self, store_path: str, switch: ServiceSwitch,
+                 quotas: Optional[Dict[str, int]] = None, flush_interval: float = 5.0):
+        self.store_path = store_path
+        self.switch = switch
+        self.quotas = quotas or dict(FREE_TIER_CHARS)
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._month = current_month()
+        self._totals = {tier: 0 for tier in self.quotas}
+        self._level = 0.0
+        self._dirty = False
+        self._flusher = None
+        self._stop = threading.Event()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.store_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("month") == self._month:
+            for tier, count in data.get("totals", {}).items():
+                self._totals[tier] = int(count)
+            self._level = float(data.get("level", 0.0))
+            # Re-apply a throttle or shutdown tripped before the restart
+            if self._level >= THRESHOLD_WARNING_2:
+                self._act(self._fraction())
+
+    def record(self, tier: str, chars: int):
+        with self._lock:
+            month = current_month()
+            if month != self._month:
+                self._roll_over(month)
+            self._totals[tier] = self._totals.get(tier, 0) + chars
+            self._dirty = True
+            fraction = self._fraction()
+            if fraction >= THRESHOLD_WARNING_1 and self._crossed(fraction) > self._level:
+                self._level = self._crossed(fraction)
+                self._act(fraction)
+        self._ensure_flusher()
+
+    def _roll_over(self, month: str):
+        # Caller holds the lock. Quotas are monthly, so automatic trips reset.
+        self._month = month
+        self._totals = {tier: 0 for tier in self.quotas}
+        self._level = 0.0
+        self._dirty = True
+        if self.switch.reason.startswith("usage"):
+            self.switch.set(ENABLED, "new billing month")
+
+    def _fraction(self) -> float:
+        return max(self._totals.get(tier, 0) / quota for tier, quota in self.quotas.items() if quota)
+
+    @staticmethod
+    def _crossed(fraction: float) -> float:
+        for threshold in (THRESHOLD_SHUTDOWN, THRESHOLD_WARNING_2, THRESHOLD_WARNING_1):
+            if fraction >= threshold:
+                return threshold
+        return 0.0
+
+    def _act(self, fraction: float):
+        # Only called when a new threshold is first crossed, so a manual
+        # re-enable sticks until the next threshold or month
+        percent = f"{fraction*100:.1f}%"
+        if fraction >= THRESHOLD_SHUTDOWN:
+            self.switch.set(DISABLED, f"usage at {percent}")
+        elif fraction >= THRESHOLD_WARNING_2:
+            self.switch.set(THROTTLED, f"usage at {percent}")
+        else:
+            print(f"ℹ️  INFO: {percent} of free-tier characters used")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "month": self._month,
+                "totals": dict(self._totals),
+                "quotas": dict(self.quotas),
+                "fraction": round(self._fraction(), 4),
+                "level": self._level,
+                "state": self.switch.state,
+            }
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"month": self._month, "totals": dict(self._totals), "level": self._level}
+            self._dirty = False
+        tmp_path = self.store_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.store_path) or ".", exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.store_path)
+        except OSError as e:
+            print(f"Failed to flush usage: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def _ensure_flusher(self):
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
@@ -4,6 +4,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Elements
     const voiceSelect = document.getElementById('voice-select');
+    const formatSelect = document.getElementById('format-select');
     const textInput = document.getElementById('text-input');
     const convertBtn = document.getElementById('convert-btn');
     const statusDiv = document.getElementById('status');
@@ -42,6 +43,17 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     loadVoices();
 
+    // Opus needs Ogg support in the audio element (missing on older Safari)
+    if (!audioPlayer.canPlayType('audio/ogg; codecs=opus')) {
+        formatSelect.querySelector('option[value="opus"]').remove();
+    }
+
+    const FORMAT_INFO = {
+        'mp3': { extension: 'mp3', mediaType: 'audio/mpeg' },
+        'mp3-16k': { extension: 'mp3', mediaType: 'audio/mpeg' },
+        'opus': { extension: 'ogg', mediaType: 'audio/ogg' },
+    };
+
     // Character Counter
     textInput.addEventListener('input', () => {
         const count = textInput.value.length;
@@ -118,39 +130,206 @@ document.addEventListener('DOMContentLoaded', () => {
     document.querySelector('.action-group').insertBefore(playFullBtn, downloadBtn);
 
 
-    function splitIntoChunks(text, maxChars = 800) {
-        const sentences = text.match(/[^.!?]+[.!?]+(?:\s+|$)|[^.!?]+$/g) || [text];
-        const chunks = [];
-        let currentChunk = "";
-
-        for (let sentence of sentences) {
-            if ((currentChunk + sentence).length > maxChars && currentChunk !== "") {
-                chunks.push(currentChunk.trim());
-                currentChunk = sentence;
-            } else {
-                currentChunk += (currentChunk === "" ? "" : " ") + sentence;
-            }
-        }
-        if (currentChunk) chunks.push(currentChunk.trim());
-        return chunks;
-    }
-
-    async function fetchAudioChunk(text, voice) {
-        const response = await fetch('/api/tts', {
+    // Chunk planning happens server-side so CJK/Vietnamese punctuation and
+    // the synthesis byte limit are handled the same way as the desktop app
+    async function planChunks(text) {
+        const response = await fetch('/api/chunks', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ text, voice }),
+            body: JSON.stringify({ text }),
         });
         if (!response.ok) {
             const error = await response.json();
-            throw new Error(error.detail || 'Failed to fetch audio');
+            throw new Error(error.detail || 'Failed to split text');
+        }
+        const data = await response.json();
+        return data.chunks;
+    }
+
+    // Parallel chunk requests per page; the server queues the rest fairly
+    const MAX_PARALLEL_CHUNKS = 3;
+    const MAX_RETRIES = 5;
+
+    // The first chunk is what the listener is waiting for; later ones can queue behind other users' first chunks
+    async function fetchAudioChunk(text, voice, format, priority = 'normal') {
+        for (let attempt = 0; ; attempt++) {
+            const response = await fetch('/api/tts', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ text, voice, format, priority }),
+            });
+            if (response.status === 429 && attempt < MAX_RETRIES) {
+                const waitSeconds = parseInt(response.headers.get('Retry-After') || '1', 10);
+                await new Promise(resolve => setTimeout(resolve, waitSeconds * 1000));
+                continue;
+            }
+            if (!response.ok) {
+                const error = await response.json();
+                throw new Error(error.detail || 'Failed to fetch audio');
+            }
+            // The server keeps a seekable, cacheable copy at Content-Location
+            return { blob: await response.blob(), url: response.headers.get('Content-Location') };
+        }
+    }
+
+    async function mapWithConcurrency(items, limit, fn) {
+        const results = new Array(items.length);
+        let next = 0;
+        async function worker() {
+            while (next < items.length) {
+                const index = next++;
+                results[index] = await fn(items[index]);
+            }
+        }
+        await Promise.all(Array.from({ length: Math.min(limit, items.length) }, worker));
+        return results;
+    }
+
+    // --- Joining Ogg Opus parts (mirrors api/oggopus.py) ---
+    // Concatenated Ogg Opus files form a chained stream that many players stop
+    // after the first part of, so the parts' packets are repaginated into one.
+    const OGG_CRC_TABLE = (() => {
+        const table = new Uint32Array(256);
+        for (let n = 0; n < 256; n++) {
+            let crc = n << 24;
+            for (let i = 0; i < 8; i++) {
+                crc = (crc & 0x80000000) ? (crc << 1) ^ 0x04C11DB7 : crc << 1;
+            }
+            table[n] = crc >>> 0;
         }
-        return await response.blob();
+        return table;
+    })();
+    const OGG_PACKETS_PER_PAGE = 32;
+
+    function oggCrc(bytes) {
+        let crc = 0;
+        for (const byte of bytes) {
+            crc = ((crc << 8) ^ OGG_CRC_TABLE[((crc >>> 24) ^ byte) & 0xff]) >>> 0;
+        }
+        return crc;
+    }
+
+    function concatBytes(arrays) {
+        const result = new Uint8Array(arrays.reduce((total, a) => total + a.length, 0));
+        let offset = 0;
+        for (const a of arrays) {
+            result.set(a, offset);
+            offset += a.length;
+        }
+        return result;
+    }
+
+    function readOggStream(bytes) {
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        const packets = [];
+        let pieces = [];
+        let offset = 0, serial = null, finalGranule = 0;
+        while (offset < bytes.length) {
+            if (view.getUint32(offset) !== 0x4F676753) throw new Error('Not an Ogg stream');
+            const pageSerial = view.getUint32(offset + 14, true);
+            if (serial === null) serial = pageSerial;
+            else if (pageSerial !== serial) break;
+            finalGranule = Math.max(finalGranule, Number(view.getBigInt64(offset + 6, true)));
+            const count = bytes[offset + 26];
+            let position = offset + 27 + count;
+            for (let i = 0; i < count; i++) {
+                const size = bytes[offset + 27 + i];
+                pieces.push(bytes.subarray(position, position + size));
+                position += size;
+                if (size < 255) {
+                    packets.push(concatBytes(pieces));
+                    pieces = [];
+                }
+            }
+            offset = position;
+        }
+        return { packets, serial, finalGranule };
+    }
+
+    function opusPacketSamples(packet) {
+        if (!packet.length) return 0;
+        const config = packet[0] >> 3, code = packet[0] & 0x03;
+        let frame;
+        if (config < 12) frame = [480, 960, 1920, 2880][config % 4];
+        else if (config < 16) frame = [480, 960][config % 2];
+        else frame = [120, 240, 480, 960][config % 4];
+        const frames = code === 0 ? 1 : code < 3 ? 2 : (packet.length > 1 ? packet[1] & 0x3f : 0);
+        return frame * frames;
+    }
+
+    function oggPage(flags, granule, serial, sequence, packets) {
+        const lacing = [];
+        for (const packet of packets) {
+            for (let i = 0; i < Math.floor(packet.length / 255); i++) lacing.push(255);
+            lacing.push(packet.length % 255);
+        }
+        const header = new Uint8Array(27 + lacing.length);
+        const view = new DataView(header.buffer);
+        header.set([0x4F, 0x67, 0x67, 0x53]);
+        view.setUint8(5, flags);
+        view.setBigInt64(6, BigInt(granule), true);
+        view.setUint32(14, serial, true);
+        view.setUint32(18, sequence, true);
+        view.setUint8(26, lacing.length);
+        header.set(lacing, 27);
+        const page = concatBytes([header, ...packets]);
+        new DataView(page.buffer).setUint32(22, oggCrc(page), true);
+        return page;
+    }
+
+    function joinOggOpus(parts) {
+        let head = null, tags = null, serial = 0, trim = 0;
+        const audio = [];
+        for (const part of parts) {
+            const stream = readOggStream(part);
+            if (head === null) {
+                [head, tags] = stream.packets;
+                serial = stream.serial;
+            }
+            const partAudio = stream.packets.slice(2);
+            audio.push(...partAudio);
+            // Samples the last part trims from its end: its final granule falls short of its packets
+            const samples = partAudio.reduce((total, p) => total + opusPacketSamples(p), 0);
+            trim = Math.max(0, samples - stream.finalGranule);
+        }
+
+        const batches = [];
+        let batch = [], segments = 0;
+        for (const packet of audio) {
+            const needed = Math.floor(packet.length / 255) + 1;
+            if (batch.length && (segments + needed > 255 || batch.length === OGG_PACKETS_PER_PAGE)) {
+                batches.push(batch);
+                batch = [];
+                segments = 0;
+            }
+            batch.push(packet);
+            segments += needed;
+        }
+        if (batch.length) batches.push(batch);
+
+        const pages = [oggPage(0x02, 0, serial, 0, [head]), oggPage(0, 0, serial, 1, [tags])];
+        let granule = 0;
+        batches.forEach((pagePackets, n) => {
+            granule += pagePackets.reduce((total, p) => total + opusPacketSamples(p), 0);
+            const last = n === batches.length - 1;
+            pages.push(oggPage(last ? 0x04 : 0, last ? granule - trim : granule, serial, pages.length, pagePackets));
+        });
+        return concatBytes(pages);
+    }
+
+    async function joinAudio(blobs, format, mediaType) {
+        // MP3 frames can simply follow each other
+        if (format !== 'opus' || blobs.length === 1) return new Blob(blobs, { type: mediaType });
+        const parts = await Promise.all(blobs.map(async blob => new Uint8Array(await blob.arrayBuffer())));
+        return new Blob([joinOggOpus(parts)], { type: mediaType });
     }
 
-    async function extractTextFromFile(file) {
+    async function extractTextFromFile(file, voice, format) {
         const formData = new FormData();
         formData.append('file', file);
+        // Lets the server start on the first chunk before we ask for it
+        formData.append('voice', voice);
+        formData.append('format', format);
 
         const response = await fetch('/api/extract-text', {
             method: 'POST',
@@ -167,13 +346,16 @@ document.addEventListener('DOMContentLoaded', () => {
             statusDiv.textContent = `Note: Text was truncated to ${MAX_CHARS.toLocaleString()} characters.`;
             statusDiv.style.color = "#f59e0b";
         }
-        return data.text;
+        return data;
     }
 
     // --- Main Action ---
     convertBtn.addEventListener('click', async () => {
         let textToConvert = "";
+        let chunks = [];
         const voice = voiceSelect.value;
+        const format = formatSelect.value;
+        const formatInfo = FORMAT_INFO[format];
 
         statusDiv.textContent = "";
         downloadBtn.style.display = "none";
@@ -194,21 +376,23 @@ document.addEventListener('DOMContentLoaded', () => {
                 if (textToConvert.length > MAX_CHARS) {
                     throw new Error(`Text exceeds ${MAX_CHARS.toLocaleString()} character limit. Download Lito Desktop for unlimited use.`);
                 }
+                chunks = await planChunks(textToConvert);
             } else {
                 if (!selectedFile) throw new Error("Please select a file.");
-                textToConvert = await extractTextFromFile(selectedFile);
+                const extracted = await extractTextFromFile(selectedFile, voice, format);
+                textToConvert = extracted.text;
+                chunks = extracted.chunks;
             }
 
-            // Chunking
-            const chunks = splitIntoChunks(textToConvert);
             statusDiv.textContent = "Generating Preview...";
 
             // Process Chunk 1 for Preview
-            const firstChunkBlob = await fetchAudioChunk(chunks[0], voice);
+            const firstChunk = await fetchAudioChunk(chunks[0], voice, format, 'interactive');
+            const firstChunkBlob = firstChunk.blob;
             const firstChunkUrl = URL.createObjectURL(firstChunkBlob);
 
-            // Play Preview
-            audioPlayer.src = firstChunkUrl;
+            // Play Preview (from the server URL when available, so seeking works)
+            audioPlayer.src = firstChunk.url || firstChunkUrl;
             audioPlayer.hidden = false;
             audioPlayer.play();
 
@@ -219,16 +403,17 @@ document.addEventListener('DOMContentLoaded', () => {
             if (chunks.length > 1) {
                 const audioBlobs = [firstChunkBlob];
 
-                const promises = chunks.slice(1).map(chunk => fetchAudioChunk(chunk, voice));
-                const remainingBlobs = await Promise.all(promises);
-                audioBlobs.push(...remainingBlobs);
+                const remainingChunks = await mapWithConcurrency(
+                    chunks.slice(1), MAX_PARALLEL_CHUNKS, chunk => fetchAudioChunk(chunk, voice, format)
+                );
+                audioBlobs.push(...remainingChunks.map(result => result.blob));
 
-                const fullAudioBlob = new Blob(audioBlobs, { type: 'audio/mpeg' });
+                const fullAudioBlob = await joinAudio(audioBlobs, format, formatInfo.mediaType);
                 const fullAudioUrl = URL.createObjectURL(fullAudioBlob);
 
                 // Generate filename from first few words
                 const words = textToConvert.split(/\s+/).slice(0, 3).join('_').replace(/[^a-zA-Z0-9_]/g, '');
-                const filename = words ? `lito_${words}.mp3` : "lito_audio.mp3";
+                const filename = words ? `lito_${words}.${formatInfo.extension}` : `lito_audio.${formatInfo.extension}`;
 
                 downloadBtn.onclick = () => {
                     const a = document.createElement('a');
@@ -251,7 +436,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 statusDiv.style.color = "#10b981";
             } else {
                 const words = textToConvert.split(/\s+/).slice(0, 3).join('_').replace(/[^a-zA-Z0-9_]/g, '');
-                const filename = words ? `lito_${words}.mp3` : "lito_audio.mp3";
+                const filename = words ? `lito_${words}.${formatInfo.extension}` : `lito_audio.${formatInfo.extension}`;
 
                 downloadBtn.onclick = () => {
                     const a = document.createElement('a');
@@ -0,0 +1,19 @@
+import pytest
+import api.index as index
+from api.audio_store import AudioStore
+from api.jobs import JobStore, JobWorkers
+
+@pytest.fixture(autouse=True)
+def isolated_audio_store(tmp_path, monkeypatch):
+    store = AudioStore(str(tmp_path / "audio"), 10 * 1024 * 1024)
+    monkeypatch.setattr(index, "audio_store", store)
+    return store
+
+@pytest.fixture(autouse=True)
+def isolated_jobs(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    workers = JobWorkers(store, lambda job: index.process_job(job), 1)
+    monkeypatch.setattr(index, "job_store", store)
+    monkeypatch.setattr(index, "job_workers", workers)
+    yield store
+    workers.stop(5)
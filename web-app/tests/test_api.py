@@ -37,3 +37,134 @@ def test_tts_invalid_voice():
     response = client.post("/api/tts", json={"text": "Hello", "voice": "invalid-voice"})
     assert response.status_code == 400
     assert "invalid voice" in response.json()["detail"].lower()
+
+def test_chunks_cjk_punctuation():
+    text = "这是第一句。" * 200
+    response = client.post("/api/chunks", json={"text": text})
+    assert response.status_code == 200
+    chunks = response.json()["chunks"]
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    assert all(c.endswith("。") for c in chunks)
+
+def test_chunks_over_limit():
+    response = client.post("/api/chunks", json={"text": "a" * (MAX_CHARS + 1)})
+    assert response.status_code == 400
+
+def test_extract_markdown_drops_code():
+    md = b"# Setup\n\nInstall it first.\n\n```\npip install lito\n```\n\n| a | b |\n|---|---|\n| 1 | 2 |\n"
+    response = client.post("/api/extract-text", files={"file": ("notes.md", md, "text/markdown")})
+    assert response.status_code == 200
+    assert response.json()["text"] == "Setup\nInstall it first."
+
+def test_tts_invalid_format():
+    response = client.post("/api/tts", json={"text": "Hello", "voice": "vi-VN-Standard-A", "format": "flac"})
+    assert response.status_code == 400
+    # The desktop app's mp3-low is a different output; the web's 16 kHz MP3 is mp3-16k
+    response = client.post("/api/tts", json={"text": "Hello", "voice": "vi-VN-Standard-A", "format": "mp3-low"})
+    assert response.status_code == 400 and "mp3-16k" in response.json()["detail"]
+
+def test_tts_opus_content_type(monkeypatch):
+    import api.index as index
+
+    async def fake_synthesize(text, voice, language_code, fmt="mp3"):
+        return b"OggS"
+
+    monkeypatch.setattr(index, "synthesize", fake_synthesize)
+    response = client.post("/api/tts", json={"text": "Hello", "voice": "vi-VN-Standard-A", "format": "opus"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/ogg"
+    assert response.headers["etag"] != client.post(
+        "/api/tts", json={"text": "Hello", "voice": "vi-VN-Standard-A", "format": "mp3"}
+    ).headers["etag"]
+
+def test_tts_concurrent_duplicates_share_one_call(monkeypatch):
+    import asyncio
+    import api.index as index
+    calls = []
+
+    async def slow_synthesize(text, voice, language_code, fmt="mp3"):
+        calls.append(text)
+        await asyncio.sleep(0.05)
+        return b"audio"
+
+    monkeypatch.setattr(index, "synthesize", slow_synthesize)
+
+    async def run():
+        request = index.TTSRequest(text="Same  demo text", voice="vi-VN-Standard-A")
+        http_request = type("FakeRequest", (), {"headers": {}, "client": None})()
+        return await asyncio.gather(*(index.text_to_speech(request, http_request) for _ in range(4)))
+
+    responses = asyncio.run(run())
+    assert all(r.body == b"audio" for r in responses)
+    assert calls == ["Same demo text"]
+
+def test_tts_bulk_streams_ndjson(monkeypatch):
+    import base64
+    import json
+    import api.index as index
+    calls = []
+
+    async def fake_synthesize(text, voice, language_code, fmt="mp3"):
+        calls.append(text)
+        return text.encode("utf-8")
+
+    monkeypatch.setattr(index, "synthesize", fake_synthesize)
+    items = [{"id": f"card-{i}", "text": f"Word {i}", "voice": "vi-VN-Standard-A"} for i in range(5)]
+    items.append({"id": "dup", "text": "Word  1", "voice": "vi-VN-Standard-A"})
+    items.append({"id": "bad", "text": "Hi", "voice": "xx-XX-Nobody"})
+    response = client.post("/api/tts/bulk", json={"items": items}, headers={"X-Lito-Client": "bulk-test"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = {r["id"]: r for r in map(json.loads, response.text.splitlines())}
+    assert len(results) == 7
+    assert base64.b64decode(results["card-3"]["audio"]) == b"Word 3"
+    assert results["dup"]["url"] == results["card-1"]["url"]
+    assert results["bad"]["error"] == "Invalid voice selected"
+    assert client.get(results["card-3"]["url"]).content == b"Word 3"
+    assert sorted(calls) == [f"Word {i}" for i in range(5)]
+
+def test_tts_bulk_rejects_oversized_batches():
+    import api.index as index
+    items = [{"id": str(i), "text": "x", "voice": "vi-VN-Standard-A"} for i in range(index.MAX_BULK_ITEMS + 1)]
+    assert client.post("/api/tts/bulk", json={"items": items}).status_code == 400
+
+def test_tts_rejects_bulk_priority():
+    response = client.post("/api/tts", json={"text": "Hello", "voice": "vi-VN-Standard-A", "priority": "bulk"})
+    assert response.status_code == 400
+
+def test_extract_text_prefetches_first_chunk(monkeypatch):
+    import api.index as index
+    calls = []
+
+    async def fake_synthesize(text, voice, language_code, fmt="mp3"):
+        calls.append((text, voice))
+        return b"audio"
+
+    monkeypatch.setattr(index, "synthesize", fake_synthesize)
+    with TestClient(app) as c:
+        response = c.post("/api/extract-text", files={"file": ("story.txt", b"Once upon a time.", "text/plain")},
+                          data={"voice": "vi-VN-Standard-B", "format": "mp3"})
+        assert response.status_code == 200
+        assert response.json()["prefetched"] is True
+        chunk = response.json()["chunks"][0]
+        audio = c.post("/api/tts", json={"text": chunk, "voice": "vi-VN-Standard-B", "format": "mp3"})
+    assert audio.content == b"audio"
+    assert calls == [("Once upon a time.", "vi-VN-Standard-B")]
+
+def test_extract_text_skips_prefetch_when_disabled(monkeypatch):
+    import api.index as index
+    monkeypatch.setattr(index, "SPECULATIVE_SYNTHESIS", False)
+    response = client.post("/api/extract-text", files={"file": ("story.txt", b"Once upon a time.", "text/plain")})
+    assert response.json()["prefetched"] is False
+
+def test_profiled_request_writes_report(tmp_path, monkeypatch):
+    import api.index as index
+    monkeypatch.setattr(index.profiler, "rate", 1.0)
+    monkeypatch.setattr(index.profiler, "directory", str(tmp_path))
+    assert client.get("/api/voices").status_code == 200
+    client.get("/")
+    reports = list(tmp_path.glob("*.txt"))
+    assert len(reports) == 1 and len(list(tmp_path.glob("*.prof"))) == 1
+    assert reports[0].read_text().startswith("GET /api/voices:")
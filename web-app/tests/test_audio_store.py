@@ -0,0 +1,69 @@
+from fastapi.testclient import TestClient
+import api.index as index
+from api.audio_store import AudioStore, parse_range
+
+client = TestClient(index.app)
+KEY = "a" * 64
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=0-500", 100) == (0, 99)
+    assert parse_range("bytes=100-", 100) is None
+    assert parse_range("bytes=5-1", 100) is None
+    assert parse_range("items=0-1", 100) is None
+
+def test_get_audio_range_and_etag(isolated_audio_store):
+    isolated_audio_store.put(KEY, ".mp3", bytes(range(200)))
+
+    full = client.get(f"/api/audio/{KEY}")
+    assert full.status_code == 200
+    assert full.headers["content-type"] == "audio/mpeg"
+    assert "immutable" in full.headers["cache-control"]
+    assert len(full.content) == 200
+
+    partial = client.get(f"/api/audio/{KEY}", headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == bytes(range(10, 20))
+    assert partial.headers["content-range"] == "bytes 10-19/200"
+
+    cached = client.get(f"/api/audio/{KEY}", headers={"If-None-Match": full.headers["etag"]})
+    assert cached.status_code == 304
+
+    unsatisfiable = client.get(f"/api/audio/{KEY}", headers={"Range": "bytes=500-"})
+    assert unsatisfiable.status_code == 416
+
+def test_get_audio_unknown_key():
+    assert client.get(f"/api/audio/{'b' * 64}").status_code == 404
+    assert client.get("/api/audio/not-a-key").status_code == 404
+
+def test_tts_replay_skips_synthesis(monkeypatch):
+    calls = []
+
+    async def fake_synthesize(text, voice, language_code, fmt="mp3"):
+        calls.append(text)
+        return b"audio"
+
+    monkeypatch.setattr(index, "synthesize", fake_synthesize)
+    body = {"text": "Hello", "voice": "vi-VN-Standard-A"}
+    first = client.post("/api/tts", json=body)
+    second = client.post("/api/tts", json=body)
+    assert first.content == second.content == b"audio"
+    assert len(calls) == 1
+    assert client.get(first.headers["content-location"]).content == b"audio"
+
+def test_store_prunes_oldest(tmp_path):
+    store = AudioStore(str(tmp_path), max_bytes=250)
+    for i in range(4):
+        store.put(f"{i:064x}", ".mp3", b"x" * 100)
+    assert store.find(f"{3:064x}")
+    assert not store.find(f"{0:064x}")
+
+def test_rewriting_a_key_counts_it_once(tmp_path):
+    store = AudioStore(str(tmp_path), max_bytes=210)
+    store.put("b" * 64, ".mp3", b"x" * 100)
+    for _ in range(3):
+        # Two workers racing on the same content store it again
+        store.put(KEY, ".mp3", b"y" * 100)
+    assert store.find("b" * 64) and store._size == 200
@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import pytest
+from fastapi.testclient import TestClient
+import api.index as index
+from api.chunking import plan_chunks
+from api.jobs import JobCancelled, JobStore, JobWorkers
+from api.ratelimit import QueueFull
+
+client = TestClient(index.app)
+
+def wait_for(job_id, status, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] == status:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job stuck at {job}")
+
+def test_store_claims_oldest_and_requeues_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    store = JobStore(path)
+    first = store.create("c", "one", "v", "mp3", 1)
+    second = store.create("c", "two", "v", "mp3", 1)
+    assert store.position(second) == 1
+    assert store.claim()["id"] == first
+    store.close()
+
+    # The running job was interrupted; it is queued again, still first in line
+    store = JobStore(path)
+    assert store.depth()["queued"] == 2
+    assert store.claim()["id"] == first
+
+def test_jobs_left_by_a_restart_resume_at_startup(tmp_path, monkeypatch):
+    async def fake_synthesize(text, voice, language_code, fmt="mp3"):
+        return text.encode("utf-8")
+
+    monkeypatch.setattr(index, "synthesize", fake_synthesize)
+    path = str(tmp_path / "restart.sqlite")
+    store = JobStore(path)
+    job_id = store.create("c", "Left over.", "vi-VN-Standard-A", "mp3", 1)
+    store.claim()
+    store.close()
+
+    # No new submission: startup alone must pick the job back up
+    monkeypatch.setattr(index, "job_store", JobStore(path))
+    monkeypatch.setattr(index, "job_workers", JobWorkers(index.job_store, lambda job: index.process_job(job), 1))
+    try:
+        with TestClient(index.app) as started:
+            deadline = time.time() + 5
+            while started.get(f"/api/jobs/{job_id}").json()["status"] != "done":
+                assert time.time() < deadline
+                time.sleep(0.02)
+    finally:
+        index.job_workers.stop(5)
+
+def test_cancelled_job_stops_reporting_progress(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    job_id = store.create("c", "text", "v", "mp3", 3)
+    store.claim()
+    assert store.cancel(job_id)
+    with pytest.raises(JobCancelled):
+        store.progress(job_id, 1)
+    assert store.get(job_id)["status"] == "cancelled"
+
+def test_long_document_job_end_to_end(monkeypatch):
+    calls = []
+
+    async def fake_synthesize(text, voice, language_code, fmt="mp3"):
+        calls.append(text)
+        return f"[{text}]".encode("utf-8")
+
+    monkeypatch.setattr(index, "synthesize", fake_synthesize)
+    monkeypatch.setattr(index, "JOB_CHUNK_MAX_BYTES", 40)
+    text = " ".join(f"Sentence number {i} is here." for i in range(60))
+    assert len(text) > index.MAX_CHARS
+
+    response = client.post("/api/jobs", json={"text": text, "voice": "vi-VN-Standard-A"})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["total_chunks"] > 1
+
+    done = wait_for(job["id"], "done")
+    assert done["done_chunks"] == done["total_chunks"] == len(calls)
+    result = client.get(f"/api/jobs/{job['id']}/result")
+    assert result.status_code == 200
+    # Chunks finish out of order but are joined in document order
+    assert result.content == b"".join(f"[{c}]".encode("utf-8") for c in plan_chunks(text, 40))
+    assert client.get(done["url"]).content == result.content
+
+    events = client.get(f"/api/jobs/{job['id']}/events").text
+    last = [line for line in events.splitlines() if line.startswith("data: ")][-1]
+    assert json.loads(last[len("data: "):])["status"] == "done"
+    assert client.get("/api/queue").json()["queued"] == 0
+
+def test_job_result_before_done_is_conflict(monkeypatch):
+    job_id = index.job_store.create("c", "text", "vi-VN-Standard-A", "mp3", 1)
+    assert client.get(f"/api/jobs/{job_id}/result").status_code == 409
+    assert client.get("/api/jobs/missing").status_code == 404
+
+def test_job_fails_when_the_queue_stays_full_and_charges_once(monkeypatch):
+    charged = []
+
+    async def fake_wait_for_budget(client_key, text):
+        charged.append(text)
+
+    async def always_full(*args, **kwargs):
+        raise QueueFull("c")
+
+    monkeypatch.setattr(index, "wait_for_budget", fake_wait_for_budget)
+    monkeypatch.setattr(index, "synthesize_shared", always_full)
+    monkeypatch.setattr(index, "JOB_CHUNK_ATTEMPTS", 3)
+    monkeypatch.setattr(index, "JOB_QUEUE_RETRY_SECONDS", 0)
+    response = client.post("/api/jobs", json={"text": "One short job.", "voice": "vi-VN-Standard-A"})
+    failed = wait_for(response.json()["id"], "failed")
+    assert "queue stayed full" in failed["error"]
+    assert charged == ["One short job."]
+
+def test_pruned_job_result_is_gone(monkeypatch):
+    async def fake_synthesize(text, voice, language_code, fmt="mp3"):
+        return b"audio"
+
+    monkeypatch.setattr(index, "synthesize", fake_synthesize)
+    job = client.post("/api/jobs", json={"text": "Soon pruned.", "voice": "vi-VN-Standard-A"}).json()
+    done = wait_for(job["id"], "done")
+    # The size-capped audio store pruned the result
+    os.remove(index.audio_store.find(done["url"].rsplit("/", 1)[1]))
+    result = client.get(f"/api/jobs/{job['id']}/result")
+    assert result.status_code == 410
+    expired = client.get(f"/api/jobs/{job['id']}").json()
+    assert expired["status"] == "expired" and "url" not in expired and "submit" in expired["error"]
@@ -0,0 +1,48 @@
+import struct
+from api import oggopus
+
+# CELT fullband, 20 ms per frame, one frame per packet
+TOC_20MS = bytes([(31 << 3) | 0])
+
+def opus_file(serial, frames, trim=0):
+    head = b"OpusHead" + bytes([1, 1]) + struct.pack("<HIhB", 312, 24000, 0, 0)
+    tags = b"OpusTags" + struct.pack("<I", 4) + b"test" + struct.pack("<I", 0)
+    audio = [TOC_20MS + bytes([n]) * 80 for n in frames]
+    pages = [oggopus._page(oggopus.FLAG_BOS, 0, serial, 0, [head]), oggopus._page(0, 0, serial, 1, [tags])]
+    pages.append(oggopus._page(oggopus.FLAG_EOS, 960 * len(audio) - trim, serial, 2, audio))
+    return b"".join(pages)
+
+def page_headers(data):
+    offset, headers = 0, []
+    while offset < len(data):
+        _, _, flags, granule, serial, sequence, crc, count = oggopus.HEADER.unpack_from(data, offset)
+        size = oggopus.HEADER.size + count + sum(data[offset + oggopus.HEADER.size:offset + oggopus.HEADER.size + count])
+        page = data[offset:offset + size]
+        assert crc == oggopus.ogg_crc(page[:22] + b"\0\0\0\0" + page[26:])
+        headers.append((flags, granule, serial, sequence))
+        offset += size
+    return headers
+
+def test_parts_become_one_logical_stream():
+    parts = [opus_file(11, range(3), trim=200), opus_file(22, range(3, 43)), opus_file(33, range(43, 45), trim=500)]
+    joined = oggopus.join(parts)
+
+    headers = page_headers(joined)
+    assert {serial for _, _, serial, _ in headers} == {11}
+    assert [sequence for _, _, _, sequence in headers] == list(range(len(headers)))
+    assert [flags for flags, _, _, _ in headers] == [oggopus.FLAG_BOS] + [0] * (len(headers) - 2) + [oggopus.FLAG_EOS]
+    granules = [granule for _, granule, _, _ in headers[2:]]
+    assert granules == sorted(granules)
+    # Only the last part's end trim survives
+    assert granules[-1] == 960 * 45 - 500
+
+    packets = oggopus.packets(joined)
+    assert packets[0].startswith(b"OpusHead") and packets[1].startswith(b"OpusTags")
+    assert [p[1] for p in packets[2:]] == list(range(45))
+
+def test_packet_durations():
+    assert oggopus.packet_samples(TOC_20MS) == 960
+    # SILK 60 ms, two frames
+    assert oggopus.packet_samples(bytes([(3 << 3) | 1])) == 2 * 2880
+    # CELT 2.5 ms, code 3 with five frames
+    assert oggopus.packet_samples(bytes([(16 << 3) | 3, 5])) == 5 * 120
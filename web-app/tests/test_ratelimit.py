@@ -0,0 +1,72 @@
+import asyncio
+from fastapi.testclient import TestClient
+import api.index as index
+from api.ratelimit import ClientRateLimiter, FairQueue, TokenBucket
+
+def test_token_bucket_refuses_then_reports_wait():
+    bucket = TokenBucket(capacity=100, rate=10)
+    assert bucket.consume(80) == 0
+    wait = bucket.consume(50)
+    assert 2.5 < wait <= 3.0
+    assert bucket.consume(500) == float("inf")
+
+def test_clients_have_separate_buckets():
+    limiter = ClientRateLimiter(capacity=100, rate=1)
+    assert limiter.consume("ip:1", 100) == 0
+    assert limiter.consume("ip:1", 10) > 0
+    assert limiter.consume("ip:2", 100) == 0
+
+def test_fair_queue_interleaves_clients():
+    queue = FairQueue(concurrency=1)
+    order = []
+
+    async def job(client, n):
+        async with queue.turn(client):
+            order.append((client, n))
+            await asyncio.sleep(0)
+
+    async def run():
+        await queue.acquire("holder")
+        tasks = [asyncio.create_task(job("greedy", i)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(job("polite", 0)))
+        await asyncio.sleep(0)
+        queue.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order[:2] == [("greedy", 0), ("polite", 0)]
+
+def test_tts_rate_limited(monkeypatch):
+    async def fake_synthesize(text, voice, language_code, fmt="mp3"):
+        return b"audio"
+
+    monkeypatch.setattr(index, "synthesize", fake_synthesize)
+    monkeypatch.setattr(index, "rate_limiter", ClientRateLimiter(capacity=8, rate=0.01))
+    client = TestClient(index.app)
+    headers = {"X-Lito-Client": "test-client"}
+
+    ok = client.post("/api/tts", json={"text": "Hello", "voice": "vi-VN-Standard-A"}, headers=headers)
+    assert ok.status_code == 200
+    limited = client.post("/api/tts", json={"text": "Howdy", "voice": "vi-VN-Standard-A"}, headers=headers)
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+
+def test_rotating_client_header_shares_the_ip_budget(monkeypatch):
+    import api.ratelimit as ratelimit
+
+    async def fake_synthesize(text, voice, language_code, fmt="mp3"):
+        return b"audio"
+
+    monkeypatch.setattr(index, "synthesize", fake_synthesize)
+    monkeypatch.setattr(index, "rate_limiter", ClientRateLimiter(capacity=8, rate=0.01))
+    monkeypatch.setattr(ratelimit, "issued_client_keys", frozenset({"partner"}))
+    client = TestClient(index.app)
+
+    ok = client.post("/api/tts", json={"text": "Hello", "voice": "vi-VN-Standard-A"}, headers={"X-Lito-Client": "a"})
+    assert ok.status_code == 200
+    rotated = client.post("/api/tts", json={"text": "Howdy", "voice": "vi-VN-Standard-A"}, headers={"X-Lito-Client": "b"})
+    assert rotated.status_code == 429
+    # An issued key gets a budget of its own
+    issued = client.post("/api/tts", json={"text": "Howdy", "voice": "vi-VN-Standard-A"}, headers={"X-Lito-Client": "partner"})
+    assert issued.status_code == 200
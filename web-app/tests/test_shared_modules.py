@@ -0,0 +1,31 @@
+import os
+import re
+import pytest
+
+API_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "api")
+DESKTOP_DIR = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "desktop-app")
+
+# Modules kept as identical copies in desktop-app/ and web-app/api/
+SHARED_MODULES = ["chunking", "concurrency", "hedging", "mdtext", "pdf_backends", "profiling", "scheduler", "singleflight"]
+
+pytestmark = pytest.mark.skipif(not os.path.isdir(DESKTOP_DIR), reason="desktop-app is not checked out alongside")
+
+def read(directory, name):
+    with open(os.path.join(directory, f"{name}.py"), "rb") as f:
+        return f.read()
+
+@pytest.mark.parametrize("name", SHARED_MODULES)
+def test_shared_module_copies_match(name):
+    assert read(API_DIR, name) == read(DESKTOP_DIR, name), (
+        f"desktop-app/{name}.py and web-app/api/{name}.py differ; apply the change to both"
+    )
+
+def test_every_shared_module_is_checked():
+    marked = set()
+    for directory in (API_DIR, DESKTOP_DIR):
+        for file_name in os.listdir(directory):
+            if file_name.endswith(".py"):
+                with open(os.path.join(directory, file_name), encoding="utf-8") as f:
+                    if re.search(r"^Shared with web-app/api/", f.read(), re.MULTILINE):
+                        marked.add(file_name[:-3])
+    assert marked == set(SHARED_MODULES)
@@ -0,0 +1,81 @@
+import json
+from fastapi.testclient import TestClient
+import api.index as index
+from api.usage import DISABLED, ENABLED, THROTTLED, ServiceSwitch, UsageMeter, voice_tier
+
+def make_meter(tmp_path, switch=None):
+    return UsageMeter(str(tmp_path / "usage.json"), switch or ServiceSwitch(), quotas={"standard": 1000})
+
+def test_voice_tier():
+    assert voice_tier("en-US-Neural2-C") == "premium"
+    assert voice_tier("vi-VN-Standard-A") == "standard"
+
+def test_thresholds_trip_switch(tmp_path):
+    meter = make_meter(tmp_path)
+    meter.record("standard", 600)
+    assert meter.switch.state == ENABLED
+    meter.record("standard", 100)
+    assert meter.switch.state == THROTTLED
+    meter.record("standard", 100)
+    assert meter.switch.state == DISABLED
+
+def test_manual_reenable_sticks_below_next_threshold(tmp_path):
+    meter = make_meter(tmp_path)
+    meter.record("standard", 700)
+    meter.switch.set(ENABLED, "admin")
+    meter.record("standard", 50)
+    assert meter.switch.state == ENABLED
+
+def test_flush_and_reload(tmp_path):
+    meter = make_meter(tmp_path)
+    meter.record("standard", 850)
+    meter.close()
+    saved = json.loads((tmp_path / "usage.json").read_text())
+    assert saved["totals"]["standard"] == 850
+
+    restarted = make_meter(tmp_path)
+    assert restarted.switch.state == DISABLED
+
+def test_kill_switch_applies_without_restart(monkeypatch):
+    monkeypatch.setattr(index, "service_switch", ServiceSwitch(enabled=False))
+    client = TestClient(index.app)
+    response = client.post("/api/tts", json={"text": "Hello", "voice": "vi-VN-Standard-A"})
+    assert response.status_code == 503
+
+def test_admin_requires_token(monkeypatch):
+    client = TestClient(index.app)
+    monkeypatch.setattr(index, "ADMIN_TOKEN", "")
+    assert client.get("/api/admin/usage").status_code == 404
+    monkeypatch.setattr(index, "ADMIN_TOKEN", "letmein")
+    assert client.get("/api/admin/usage", headers={"X-Admin-Token": "nope"}).status_code == 403
+    response = client.post("/api/admin/service", json={"state": "throttled"}, headers={"X-Admin-Token": "letmein"})
+    assert response.json() == {"state": "throttled"}
+    index.service_switch.set(ENABLED)
+
+def test_hedged_duplicates_are_metered(tmp_path, monkeypatch):
+    import time
+    import asyncio
+    from types import SimpleNamespace
+    from api.hedging import Hedger, LatencyTracker
+    tracker = LatencyTracker(min_samples=1)
+    tracker.record(0.01)
+    calls = []
+
+    def fake_synthesize_speech(**kwargs):
+        calls.append(kwargs)
+        # The first call stalls past the hedge delay; its duplicate answers at once
+        time.sleep(0.3 if len(calls) == 1 else 0)
+        return SimpleNamespace(audio_content=b"audio")
+
+    meter = make_meter(tmp_path)
+    monkeypatch.setattr(index, "usage_meter", meter)
+    monkeypatch.setattr(index, "hedger", Hedger(enabled=True, fraction=1.0, min_delay=0.01, tracker=tracker))
+    monkeypatch.setattr(index.client, "synthesize_speech", fake_synthesize_speech)
+
+    assert asyncio.run(index.synthesize("Hello", "vi-VN-Standard-A", "vi-VN")) == b"audio"
+    # The loser's thread finishes in the background; both calls are billed
+    deadline = time.time() + 2
+    while meter.snapshot()["totals"].get("standard", 0) < 10 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 2
+    assert meter.snapshot()["totals"]["standard"] == 10